@@ -0,0 +1,197 @@
+"""
+Offline end-to-end benchmark for CrawlerService.run_session.
+
+Serves a page corpus from a local stub site, answers LLM calls with a
+deterministic fake (configurable latency), stores into a throwaway SQLite file
+and runs whole crawl sessions at several directory sizes. Reports wall time,
+time to first card, LLM calls/tokens, page fetches and peak Python memory,
+and exits non-zero when a run regresses against the stored baseline.
+
+    cd backend
+    python benchmarks/crawl_session.py
+    python benchmarks/crawl_session.py --corpus benchmarks/corpus/example   # the bundled sample corpus
+    python benchmarks/crawl_session.py --update-baseline
+
+Counts (cards, LLM calls, fetches) must match the baseline exactly; times and
+memory may grow by --tolerance (default 50%) before the run fails. The
+professor delay (CRAWL_PROFESSOR_DELAY) is zeroed unless --keep-delay is set.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+import uuid
+
+import harness
+
+BACKEND_DIR = harness.BACKEND_DIR
+DEFAULT_BASELINE = os.path.join(BACKEND_DIR, "benchmarks", "baselines", "crawl_session.json")
+DEFAULT_SIZES = "5,15,40"
+
+# Compared exactly; everything else is a time/memory metric compared with --tolerance
+COUNT_METRICS = ("cards", "llm_calls", "fetches")
+TIMED_METRICS = ("wall_s", "first_card_s", "peak_mb")
+# Differences below these are noise on any machine
+ABSOLUTE_SLACK = {"wall_s": 0.25, "first_card_s": 0.25, "peak_mb": 2.0}
+
+
+async def run_once(crawler, site, fake, corpus, client, user_id: str) -> dict:
+    """One session over the corpus; returns its metrics."""
+    session_id = uuid.uuid4()
+    await client.table("scrape_sessions").insert({
+        "id": str(session_id),
+        "user_id": user_id,
+        "root_urls": [site.url(corpus.root)],
+        "status": "queued",
+    }).execute()
+    site.reset_counts()
+    fake.reset_counts()
+    first_card = None
+    started = time.perf_counter()
+
+    async def on_log(message: str):
+        nonlocal first_card
+        if first_card is None and json.loads(message).get("type") == "found_card":
+            first_card = time.perf_counter() - started
+
+    await crawler.run_session(session_id, [site.url(corpus.root)], on_log, major="Computer Science")
+    wall = time.perf_counter() - started
+    res = await client.table("professor_cards").select("id").eq("session_id", str(session_id)).execute()
+    return {
+        "wall_s": wall,
+        "first_card_s": first_card,
+        "cards": len(res.data or []),
+        "llm_calls": fake.total_calls,
+        "prompt_tokens": fake.prompt_tokens,
+        "completion_tokens": fake.completion_tokens,
+        "fetches": site.total_requests,
+    }
+
+
+async def bench_size(args, size: int) -> dict:
+    from services.crawler import CrawlerService
+    from services.supabase_client import get_async_supabase_client
+
+    corpus = harness.load_corpus(args.corpus) if args.corpus else harness.generate_corpus(size, padding_kb=args.padding_kb)
+    client = get_async_supabase_client()
+    user_id = str(uuid.uuid4())
+    await client.table("profiles").insert({"id": user_id, "name": "Benchmark User"}).execute()
+
+    crawler = CrawlerService()
+    fake = harness.FakeLLM(corpus, latency=args.llm_latency_ms / 1000, seconds_per_token=args.llm_ms_per_token / 1000)
+    harness.install_fake_llm(crawler.llm_service, fake)
+
+    runs = []
+    with harness.StubSite(corpus, latency=args.fetch_latency_ms / 1000) as site:
+        await run_once(crawler, site, fake, corpus, client, user_id)  # warm-up: imports, parser caches
+        for _ in range(args.repeat):
+            runs.append(await run_once(crawler, site, fake, corpus, client, user_id))
+        tracemalloc.start()
+        await run_once(crawler, site, fake, corpus, client, user_id)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    await crawler.write_buffer.close()
+
+    result = {key: runs[-1][key] for key in ("cards", "llm_calls", "prompt_tokens", "completion_tokens", "fetches")}
+    result["wall_s"] = round(statistics.median(r["wall_s"] for r in runs), 3)
+    first_cards = [r["first_card_s"] for r in runs if r["first_card_s"] is not None]
+    result["first_card_s"] = round(statistics.median(first_cards), 3) if first_cards else None
+    result["peak_mb"] = round(peak / 1024 / 1024, 2)
+    result["corpus_pages"] = len(corpus.pages)
+    result["corpus_kb"] = round(corpus.total_bytes / 1024, 1)
+    return result
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    failures = []
+    for name, current in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        for metric in COUNT_METRICS:
+            if current.get(metric) != expected.get(metric):
+                failures.append(f"{name}: {metric} {current.get(metric)} != baseline {expected.get(metric)}")
+        for metric in TIMED_METRICS:
+            now, before = current.get(metric), expected.get(metric)
+            if now is None or before is None:
+                if now != before:
+                    failures.append(f"{name}: {metric} {now} (baseline {before})")
+                continue
+            limit = max(before * (1 + tolerance), before + ABSOLUTE_SLACK[metric])
+            if now > limit:
+                failures.append(f"{name}: {metric} {now} > {limit:.3f} (baseline {before})")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="professors per generated directory (comma separated)")
+    parser.add_argument("--corpus", help="replay a corpus directory (manifest.json) instead of generating one")
+    parser.add_argument("--padding-kb", type=int, default=40, help="extra markup per generated directory page")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per size (median is reported)")
+    parser.add_argument("--llm-latency-ms", type=float, default=50)
+    parser.add_argument("--llm-ms-per-token", type=float, default=0.2)
+    parser.add_argument("--fetch-latency-ms", type=float, default=5)
+    parser.add_argument("--keep-delay", action="store_true", help="keep CRAWL_PROFESSOR_DELAY between professors")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--db", help="SQLite file to use (default: a temp file)")
+    args = parser.parse_args()
+
+    harness.use_local_backends(args.db)
+    import logging
+    logging.disable(logging.WARNING)
+    from services import crawler
+
+    if not args.keep_delay:
+        crawler.PROFESSOR_DELAY_SECONDS = 0
+
+    names = [os.path.basename(args.corpus.rstrip("/"))] if args.corpus else [f"professors_{s}" for s in args.sizes.split(",")]
+    sizes = [0] if args.corpus else [int(s) for s in args.sizes.split(",")]
+
+    async def run_all():
+        # One loop for every size: the storage client and write buffers are bound to it
+        return {name: await bench_size(args, size) for name, size in zip(names, sizes)}
+
+    results = asyncio.run(run_all())
+
+    print(f"{'run':<18}{'cards':>6}{'llm':>6}{'tokens':>9}{'fetch':>7}{'wall s':>9}{'1st card':>10}{'peak MB':>9}{'corpus KB':>11}")
+    for name, r in results.items():
+        first = f"{r['first_card_s']:.3f}" if r["first_card_s"] is not None else "-"
+        print(f"{name:<18}{r['cards']:>6}{r['llm_calls']:>6}{r['prompt_tokens'] + r['completion_tokens']:>9}"
+              f"{r['fetches']:>7}{r['wall_s']:>9.3f}{first:>10}{r['peak_mb']:>9.2f}{r['corpus_kb']:>11.1f}")
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline to create one")
+        return 0
+    with open(args.baseline) as f:
+        failures = compare(results, json.load(f), args.tolerance)
+    if failures:
+        print("\nREGRESSIONS:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("\nOK: within baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,471 @@
+"""
+Shared pieces for the offline benchmarks: a page corpus (generated, or
+recorded from real sites), a local HTTP stub site that serves it, a
+deterministic fake LLM that plugs into LLMService, resume PDFs, and
+settings that point storage at a throwaway SQLite file.
+
+Nothing here touches the network except `record`, which captures a real
+faculty directory (and the profile pages it links to) into a corpus directory
+the benchmarks can replay:
+
+    cd backend
+    python benchmarks/harness.py record https://cs.example.edu/people/faculty --out benchmarks/corpus/cs-example
+
+benchmarks/corpus/example is a small sanitised sample in that format, committed
+so the replay path always has something to run against.
+"""
+import argparse
+import asyncio
+import hashlib
+import html
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+from urllib.parse import urljoin, urlsplit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def use_local_backends(db_path: Optional[str] = None) -> str:
+    """
+    Point the services at local stand-ins. Must run before anything under
+    services/ is imported (the storage backend is chosen at import time).
+    """
+    db_path = db_path or os.path.join(tempfile.mkdtemp(prefix="labmatch-bench-"), "bench.db")
+    os.environ["STORAGE_BACKEND"] = "sqlite"
+    os.environ["SQLITE_PATH"] = db_path
+    os.environ.setdefault("LLM_API_KEY", "benchmark")
+    os.environ["EVENT_BROKER_URL"] = "memory://"
+    os.environ.pop("SESSION_CACHE_URL", None)
+    # The stub site is on loopback; never route it through a proxy
+    os.environ["NO_PROXY"] = ",".join(filter(None, [os.environ.get("NO_PROXY"), "127.0.0.1", "localhost"]))
+    return db_path
+
+
+# ==============================================================================
+# CORPUS
+# ==============================================================================
+
+FIRST_NAMES = ["Ada", "Alan", "Barbara", "Claude", "Donald", "Edsger", "Frances", "Grace", "Hedy", "Ivan",
+               "Jean", "Katherine", "Leslie", "Margaret", "Niklaus", "Radia", "Shafi", "Tim", "Vint", "Yoshua"]
+LAST_NAMES = ["Abernathy", "Bhattacharya", "Castellanos", "Dubois", "Eriksen", "Fujimoto", "Gallagher",
+              "Haddad", "Ishikawa", "Jovanovic", "Kowalczyk", "Lindqvist", "Mbeki", "Nakamura", "Okonkwo",
+              "Petrov", "Quintero", "Rasmussen", "Sandoval", "Tanaka", "Urquhart", "Vasquez", "Whitfield"]
+TOPICS = ["machine learning", "computer vision", "natural language processing", "robotics", "databases",
+          "computer security", "quantum computing", "human-computer interaction", "computational biology",
+          "distributed systems", "programming languages", "computer architecture"]
+TITLES = ["Professor", "Associate Professor", "Assistant Professor", "Research Professor"]
+
+# Markup around the content, so parsing cost resembles a real university CMS page
+PAGE_CHROME = """<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>{title}</title>
+<link rel="stylesheet" href="/static/site.css">
+<script>window.dataLayer = window.dataLayer || []; function gtag(){{dataLayer.push(arguments);}}</script>
+<style>.card{{display:flex;gap:1rem}} .nav a{{padding:4px}}</style></head>
+<body><header class="site-header"><a href="/">Department of Computer Science</a>
+<nav class="nav"><a href="/about">About</a><a href="/news">News</a><a href="/events">Events</a>
+<a href="/admissions/undergraduate">Undergraduate</a><a href="/alumni">Alumni</a></nav></header>
+<main id="content"><h1>{title}</h1>
+{body}
+</main>
+<footer><p>Copyright University. <a href="/accessibility">Accessibility</a> <a href="/login">Login</a></p></footer>
+<script src="/static/analytics.js"></script></body></html>
+"""
+
+
+@dataclass
+class Page:
+    path: str
+    html: str
+    kind: str = "other"                      # directory | profile | lab | other
+    answer: Optional[Dict[str, Any]] = None  # What a good LLM would return for this page
+
+
+@dataclass
+class Corpus:
+    name: str
+    root: str
+    pages: Dict[str, Page] = field(default_factory=dict)
+
+    def add(self, page: Page) -> None:
+        self.pages[page.path] = page
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(len(p.html.encode()) for p in self.pages.values())
+
+    def count(self, kind: str) -> int:
+        return sum(1 for p in self.pages.values() if p.kind == kind)
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+def _filler(rng: random.Random, words: int) -> str:
+    vocab = ("research students laboratory methods results systems data analysis theory experiments "
+             "publications funding collaboration undergraduate graduate seminar course model").split()
+    return " ".join(rng.choice(vocab) for _ in range(words))
+
+
+def generate_corpus(professors: int = 15, per_page: int = 25, seed: int = 0, padding_kb: int = 0,
+                    lab_sites: bool = True) -> Corpus:
+    """
+    A synthetic department: a faculty directory split over ceil(professors /
+    per_page) pages, one home page per professor (/~name, which the
+    directory-link heuristic leaves for the investigation phase) and
+    (optionally) a lab site for every third professor. `padding_kb` bloats
+    every directory page with extra markup to model heavy CMS pages.
+    """
+    rng = random.Random(seed)
+    names = []
+    while len(names) < professors:
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        if name not in names:
+            names.append(name)
+        elif len(names) >= len(FIRST_NAMES) * len(LAST_NAMES):
+            break
+
+    corpus = Corpus(name=f"generated-{professors}", root="/people/faculty")
+    # Pages the header links to (the directory-link heuristic follows them)
+    corpus.add(Page("/", PAGE_CHROME.format(title="Department of Computer Science", body=f"<p>{_filler(rng, 200)}</p>")))
+    corpus.add(Page("/about", PAGE_CHROME.format(title="About", body=f"<p>{_filler(rng, 300)}</p>")))
+    pages = [names[i:i + per_page] for i in range(0, len(names), per_page)] or [[]]
+    for page_index, page_names in enumerate(pages):
+        path = corpus.root if page_index == 0 else f"/people/faculty/page-{page_index + 1}"
+        cards, answer = [], []
+        for name in page_names:
+            topic = rng.choice(TOPICS)
+            title = rng.choice(TITLES)
+            profile = f"/~{_slug(name)}"
+            cards.append(
+                f'<div class="card"><img src="/img/{_slug(name)}.jpg" alt="">'
+                f'<h3><a href="{profile}">{html.escape(name)}</a></h3>'
+                f'<p class="title">{title}</p><p class="area">Research: {topic}</p>'
+                f'<a href="mailto:{_slug(name)}@example.edu">Email</a></div>'
+            )
+            answer.append({"name": name, "profile_url": profile, "title": title,
+                           "email": f"{_slug(name)}@example.edu", "snippet": f"Research in {topic}"})
+        more = [f'<a href="/people/faculty/page-{i + 1}">Faculty directory page {i + 1}</a>'
+                for i in range(1, len(pages)) if i != page_index]
+        padding = ""
+        if padding_kb:
+            block = f'<div class="promo"><p>{_filler(rng, 40)}</p></div>\n'
+            padding = block * max(1, padding_kb * 1024 // len(block))
+        body = "\n".join(cards) + '\n<nav class="pager">' + " ".join(more) + "</nav>\n" + padding
+        corpus.add(Page(path, PAGE_CHROME.format(title="Faculty Directory", body=body), "directory",
+                        {"page_type": "Faculty Directory", "confidence": 0.95, "professors": answer}))
+
+    for index, name in enumerate(names):
+        topic = TOPICS[index % len(TOPICS)]
+        links = [{"label": "Google Scholar", "url": f"https://scholar.google.com/citations?user={_slug(name)}"}]
+        lab_path = f"/labs/{_slug(name)}"
+        if lab_sites and index % 3 == 0:
+            links.insert(0, {"label": "Lab Website", "url": lab_path})
+            corpus.add(Page(lab_path, PAGE_CHROME.format(
+                title=f"{name} Lab", body=f"<p>The {html.escape(name)} group studies {topic}. {_filler(rng, 300)}</p>"), "lab"))
+        link_html = "".join(f'<li><a href="{html.escape(l["url"])}">{l["label"]}</a></li>' for l in links)
+        body = (f"<h2>{html.escape(name)}</h2><p>{rng.choice(TITLES)}, Department of Computer Science</p>"
+                f"<p>{html.escape(name)} works on {topic}. {_filler(rng, 250)}</p><ul>{link_html}</ul>")
+        score = int(hashlib.sha256(name.encode()).hexdigest(), 16) % 101
+        corpus.add(Page(f"/~{_slug(name)}", PAGE_CHROME.format(title=name, body=body), "profile", {
+            "professor_name": name, "title": "Professor", "department": "Computer Science",
+            "school": "Example University", "email": f"{_slug(name)}@example.edu",
+            "summary": f"{name} leads research in {topic}, with projects open to undergraduates.",
+            "keywords": [topic.title(), "Algorithms", "Undergraduate Research"],
+            "links": links, "match_score": score,
+            "match_reasoning": f"Works on {topic}.", "confidence": 0.9,
+        }))
+    return corpus
+
+
+def save_corpus(corpus: Corpus, directory: str) -> None:
+    os.makedirs(directory, exist_ok=True)
+    manifest = {"name": corpus.name, "root": corpus.root, "pages": {}}
+    for index, page in enumerate(corpus.pages.values()):
+        filename = f"{index:04d}-{_slug(page.path) or 'index'}.html"
+        with open(os.path.join(directory, filename), "w", encoding="utf-8") as f:
+            f.write(page.html)
+        manifest["pages"][page.path] = {"file": filename, "kind": page.kind, "answer": page.answer}
+    with open(os.path.join(directory, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def load_corpus(directory: str) -> Corpus:
+    """A corpus directory: manifest.json ({"root", "pages": {path: {"file", "kind", "answer"}}}) plus HTML files."""
+    with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    corpus = Corpus(name=manifest.get("name") or os.path.basename(directory.rstrip("/")), root=manifest["root"])
+    for path, entry in manifest["pages"].items():
+        with open(os.path.join(directory, entry["file"]), encoding="utf-8", errors="replace") as f:
+            corpus.add(Page(path, f.read(), entry.get("kind", "other"), entry.get("answer")))
+    return corpus
+
+
+# ==============================================================================
+# STUB SITE
+# ==============================================================================
+
+class StubSite:
+    """
+    Serves a corpus on 127.0.0.1 from a background thread, with optional
+    per-request latency. Counts requests per path; unknown paths get a 404 page.
+    """
+
+    def __init__(self, corpus: Corpus, latency: float = 0.0):
+        self.corpus = corpus
+        self.latency = latency
+        self.requests: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, path: str) -> str:
+        return self.base_url + path
+
+    @property
+    def total_requests(self) -> int:
+        return sum(self.requests.values())
+
+    def reset_counts(self) -> None:
+        with self._lock:
+            self.requests.clear()
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = urlsplit(self.path).path.rstrip("/") or "/"
+                with site._lock:
+                    site.requests[path] = site.requests.get(path, 0) + 1
+                if site.latency:
+                    time.sleep(site.latency)
+                page = site.corpus.pages.get(path)
+                body = (page.html if page else "<html><body><h1>Not Found</h1></body></html>").encode()
+                self.send_response(200 if page else 404)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self) -> "StubSite":
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="stub-site", daemon=True).start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+# ==============================================================================
+# FAKE LLM
+# ==============================================================================
+
+NAME_LINK = re.compile(r'<a[^>]+href="([^"#]+)"[^>]*>\s*((?:[A-Z][a-zA-Z.\'-]+\s+){1,3}[A-Z][a-zA-Z\'-]+)\s*</a>')
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class FakeLLM:
+    """
+    Drop-in for AsyncOpenAI's chat.completions.create (plain and streamed).
+    Answers come from the corpus: a page's recorded answer when it has one,
+    otherwise professors are read off the page's name-like links. Latency is
+    `latency` seconds to the first token plus `seconds_per_token` per
+    completion token; token counts are estimated as chars / 4.
+    """
+
+    def __init__(self, corpus: Corpus, latency: float = 0.05, seconds_per_token: float = 0.0005,
+                 chunk_chars: int = 24):
+        self.corpus = corpus
+        self.latency = latency
+        self.seconds_per_token = seconds_per_token
+        self.chunk_chars = chunk_chars
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        self.reset_counts()
+
+    def reset_counts(self) -> None:
+        self.calls: Dict[str, int] = {}
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    @staticmethod
+    def _variable(content: str, label: str) -> Optional[str]:
+        match = re.search(rf"^{re.escape(label)}:\n(.*)$", content, re.MULTILINE)
+        return match.group(1).strip() if match else None
+
+    def _answer(self, messages: List[Dict[str, str]]) -> (str, Dict[str, Any]):
+        content = messages[-1]["content"]
+        if self._variable(content, "Profile URL") is not None:
+            url, name = self._variable(content, "Profile URL"), self._variable(content, "Professor Name") or "Unknown"
+            page = self.corpus.pages.get(urlsplit(url).path.rstrip("/") or "/")
+            if page is not None and page.kind == "profile" and page.answer:
+                return "profile", page.answer
+            # Deep-dive re-extractions pass the directory URL; answer from the name alone
+            score = int(hashlib.sha256(name.encode()).hexdigest(), 16) % 101
+            return "profile", {"professor_name": name, "summary": f"{name} is a faculty researcher.",
+                               "keywords": ["Research"], "links": [], "match_score": score, "confidence": 0.8}
+        if self._variable(content, "URL") is not None:
+            page = self.corpus.pages.get(urlsplit(self._variable(content, "URL")).path.rstrip("/") or "/")
+            if page is None:
+                return "discovery", {"page_type": "Other", "professors": []}
+            if page.answer and "professors" in page.answer:
+                return "discovery", page.answer
+            if page.kind in ("profile", "lab"):
+                return "discovery", {"page_type": "Other", "confidence": 0.9, "professors": []}
+            professors = [{"name": name.strip(), "profile_url": href, "title": "Professor"}
+                          for href, name in NAME_LINK.findall(page.html)]
+            return "discovery", {"page_type": "Faculty Directory" if professors else "Other",
+                                 "confidence": 0.9, "professors": professors}
+        return "resume", {"keywords": ["Machine Learning", "Python"], "summary": "Student interested in research."}
+
+    async def create(self, model: str, messages: List[Dict[str, str]], stream: bool = False, **kwargs):
+        kind, answer = self._answer(messages)
+        text = json.dumps(answer)
+        prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+        completion_tokens = estimate_tokens(text)
+        self.calls[kind] = self.calls.get(kind, 0) + 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+        await asyncio.sleep(self.latency)
+        if not stream:
+            await asyncio.sleep(completion_tokens * self.seconds_per_token)
+            message = SimpleNamespace(content=text)
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+        async def chunks():
+            for start in range(0, len(text), self.chunk_chars):
+                piece = text[start:start + self.chunk_chars]
+                await asyncio.sleep(estimate_tokens(piece) * self.seconds_per_token)
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))], usage=None)
+            if (kwargs.get("stream_options") or {}).get("include_usage"):
+                # Like OpenAI: streamed usage only on request, on a final chunk with no choices
+                yield SimpleNamespace(choices=[], usage=usage)
+
+        return chunks()
+
+
+def install_fake_llm(llm_service, fake: FakeLLM) -> None:
+    """Route an LLMService's requests to `fake`, with a one-model tier so every call is a single attempt."""
+    llm_service.client = fake
+    llm_service.model_tiers = {"small": ["fake-small"], "large": ["fake-large"]}
+    llm_service.current_model_index = {tier: 0 for tier in llm_service.model_tiers}
+    llm_service.rate_limit_time = {tier: 0 for tier in llm_service.model_tiers}
+    llm_service.usage = {tier: {"calls": 0, "failures": 0, "prompt_tokens": 0, "completion_tokens": 0}
+                         for tier in llm_service.model_tiers}
+
+
+def make_pdf(text: str) -> bytes:
+    """A one-page PDF with `text` as lines of Helvetica, readable by pypdf (for resume uploads)."""
+    lines = [line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in text.splitlines()]
+    stream = "BT /F1 11 Tf 14 TL 56 760 Td " + " ".join(f"({line}) '" for line in lines) + " ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = "%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out.encode("latin-1")))
+        out += f"{number} 0 obj\n{body}\nendobj\n"
+    xref = len(out.encode("latin-1"))
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    return out.encode("latin-1", errors="replace")
+
+
+# ==============================================================================
+# RECORDING
+# ==============================================================================
+
+def record(urls: List[str], out: str, max_profiles: int = 30) -> Corpus:
+    """Fetch directory pages and the profile pages they link to into a replayable corpus (paths only)."""
+    import requests
+
+    headers = {"User-Agent": "Mozilla/5.0 (LabMatch benchmark recorder)"}
+    corpus = Corpus(name=os.path.basename(out.rstrip("/")), root=urlsplit(urls[0]).path or "/")
+    profiles = []
+    for url in urls:
+        response = requests.get(url, headers=headers, timeout=15)
+        response.raise_for_status()
+        path = urlsplit(url).path.rstrip("/") or "/"
+        # Make the host's own links relative so they resolve on the stub site
+        base = f"{urlsplit(url).scheme}://{urlsplit(url).netloc}"
+        page_html = response.text.replace(f'href="{base}/', 'href="/')
+        corpus.add(Page(path, page_html, "directory"))
+        for href, _ in NAME_LINK.findall(page_html):
+            target = urljoin(url, href)
+            if urlsplit(target).netloc == urlsplit(url).netloc and target not in profiles:
+                profiles.append(target)
+    for url in profiles[:max_profiles]:
+        try:
+            response = requests.get(url, headers=headers, timeout=15)
+        except requests.RequestException as e:
+            print(f"skip {url}: {e}")
+            continue
+        if response.ok:
+            corpus.add(Page(urlsplit(url).path.rstrip("/") or "/", response.text, "profile"))
+    save_corpus(corpus, out)
+    print(f"Recorded {len(corpus.pages)} pages ({corpus.total_bytes / 1024:.0f} KB) into {out}")
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("record", help="capture real pages into a corpus directory")
+    rec.add_argument("urls", nargs="+")
+    rec.add_argument("--out", required=True)
+    rec.add_argument("--max-profiles", type=int, default=30)
+    gen = sub.add_parser("generate", help="write a generated corpus to a directory")
+    gen.add_argument("--out", required=True)
+    gen.add_argument("--professors", type=int, default=15)
+    gen.add_argument("--padding-kb", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record(args.urls, args.out, args.max_profiles)
+    else:
+        corpus = generate_corpus(args.professors, padding_kb=args.padding_kb)
+        save_corpus(corpus, args.out)
+        print(f"Wrote {len(corpus.pages)} pages ({corpus.total_bytes / 1024:.0f} KB) into {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
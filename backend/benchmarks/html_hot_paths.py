@@ -0,0 +1,227 @@
+"""
+Micro-benchmarks for the HTML hot paths run on every crawled page and every
+discovered candidate:
+
+    links      CrawlerService._extract_directory_links
+    discovery  services.llm.discovery_text   (text sent with discover_professors)
+    profile    services.llm.profile_text     (text sent with extract_profile)
+    stubs      CrawlerService._build_stub    (name validation, per candidate)
+
+Each function runs over directory pages of 100 KB - 5 MB (generated, or a
+recorded corpus) and reports throughput (pages/s, MB/s; candidates/s for
+stubs) and the allocation high-water mark per call. Output digests and sizes
+(links found, characters of prompt text, stubs accepted) are compared with the
+baseline so a parser or matcher change that alters what the LLM sees is
+caught; generated pages end with research-group links, so the link count also
+shows the whole page was parsed. Throughput is reported relative to the
+baseline and only fails with --check-throughput (below baseline / (1 +
+--tolerance)), and only against a baseline recorded on the same machine.
+
+    cd backend
+    python benchmarks/html_hot_paths.py
+    python benchmarks/html_hot_paths.py --only links,stubs --sizes-kb 100,1000
+    python benchmarks/html_hot_paths.py --corpus benchmarks/corpus/example
+    python benchmarks/html_hot_paths.py --update-baseline
+    python benchmarks/html_hot_paths.py --check-throughput   # after --update-baseline on this machine
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import harness
+
+BACKEND_DIR = harness.BACKEND_DIR
+DEFAULT_BASELINE = os.path.join(BACKEND_DIR, "benchmarks", "baselines", "html_hot_paths.json")
+DEFAULT_SIZES_KB = "100,500,1000,5000"
+FUNCTIONS = ("links", "discovery", "profile", "stubs")
+
+# Candidates a real discovery answer mixes in with the professors; all must be rejected
+NOISE_CANDIDATES = [
+    {"name": "Unknown"}, {"name": "Faculty"}, {"name": "John Doe"},
+    {"name": "Department of Computer Science"}, {"name": "Center for Data Science"},
+    {"name": "Institute for Robotics"}, {"name": "Graduate Admissions Office"},
+    {"name": "Pat Morgan", "title": "Associate Dean for Research"},
+    {"name": "Sam Lee", "title": "Academic Advisor"}, {"name": "Cher"},
+]
+
+
+def machine_id() -> str:
+    """Where a throughput baseline was recorded; other machines only get ratios."""
+    return f"{platform.node()}/{platform.machine()}/{os.cpu_count()} cpus/Python {platform.python_version()}"
+
+
+def build_pages(args):
+    """(name, html, candidates) per benchmark page."""
+    if args.corpus:
+        corpus = harness.load_corpus(args.corpus)
+        pages = []
+        for page in corpus.pages.values():
+            if page.kind != "directory":
+                continue
+            if page.answer and page.answer.get("professors"):
+                candidates = page.answer["professors"]
+            else:
+                candidates = [{"name": n.strip(), "profile_url": h} for h, n in harness.NAME_LINK.findall(page.html)]
+            pages.append((page.path, page.html, candidates + NOISE_CANDIDATES))
+        return pages
+
+    pages = []
+    for index, size_kb in enumerate(int(s) for s in args.sizes_kb.split(",")):
+        # Directory listing roughly proportional to the page, capped like a large department
+        professors = min(400, max(25, size_kb // 4))
+        corpus = harness.generate_corpus(professors, per_page=professors, seed=index,
+                                         padding_kb=max(0, size_kb - professors // 2), lab_sites=False)
+        page = corpus.pages[corpus.root]
+        # Research-group links after the padding: all of them are found only if the whole page was parsed
+        groups = "".join(f'<li><a href="/research-groups/{i}">Research group {i}</a></li>' for i in range(professors // 5))
+        html = page.html.replace("</main>", f'<ul class="groups">{groups}</ul>\n</main>')
+        pages.append((f"{size_kb}kb", html, page.answer["professors"] + NOISE_CANDIDATES))
+    return pages
+
+
+def output_size(value) -> int:
+    """Links or stubs returned, or characters of prompt text."""
+    return len(value)
+
+
+def digest(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def measure(fn, repeat: int, min_seconds: float):
+    """Best per-call time over `repeat` rounds of at least `min_seconds`, plus the result and peak allocation."""
+    result = fn()
+    best = float("inf")
+    for _ in range(repeat):
+        calls, started = 0, time.perf_counter()
+        while True:
+            fn()
+            calls += 1
+            elapsed = time.perf_counter() - started
+            if elapsed >= min_seconds:
+                break
+        best = min(best, elapsed / calls)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-kb", default=DEFAULT_SIZES_KB, help="generated directory page sizes (comma separated)")
+    parser.add_argument("--corpus", help="use the directory pages of a recorded corpus instead")
+    parser.add_argument("--only", default=",".join(FUNCTIONS), help="functions to run (comma separated)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--min-seconds", type=float, default=0.2, help="minimum duration of one timing round")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument("--check-throughput", action="store_true",
+                        help="fail when pages/s drops below baseline / (1 + --tolerance) (same machine only)")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    harness.use_local_backends()
+    import logging
+    logging.disable(logging.WARNING)
+    from services.crawler import CrawlerService
+    from services.llm import discovery_text, profile_text
+
+    crawler = CrawlerService()
+    base_url = "https://cs.example.edu/people/faculty"
+    functions = {
+        "links": lambda html, candidates: crawler._extract_directory_links(html, base_url),
+        "discovery": lambda html, candidates: discovery_text(html),
+        "profile": lambda html, candidates: profile_text(html),
+        "stubs": lambda html, candidates: [
+            stub for stub in (crawler._build_stub(c, base_url, set()) for c in candidates) if stub
+        ],
+    }
+    selected = [name for name in args.only.split(",") if name]
+    unknown = set(selected) - set(functions)
+    if unknown:
+        parser.error(f"unknown functions: {', '.join(sorted(unknown))}")
+
+    baseline = {}
+    if not args.update_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    print(f"{'function':<11}{'page':<22}{'KB':>8}{'per call ms':>13}{'pages/s':>10}{'vs base':>9}{'MB/s':>9}"
+          f"{'items/s':>11}{'peak KB':>10}{'output':>9}  digest")
+    for page_name, html, candidates in build_pages(args):
+        size_mb = len(html.encode()) / 1024 / 1024
+        for name in selected:
+            fn = functions[name]
+            output, seconds, peak = measure(lambda: fn(html, candidates), args.repeat, args.min_seconds)
+            # Stub validation runs per candidate (fresh dedup set per page), so report candidates/s too
+            items_per_s = len(candidates) / seconds if name == "stubs" else None
+            key = f"{name}/{page_name}"
+            results[key] = {
+                "kb": round(size_mb * 1024, 1),
+                "ms_per_call": round(seconds * 1000, 3),
+                "pages_per_s": round(1 / seconds, 2),
+                "mb_per_s": round(size_mb / seconds, 2),
+                "items_per_s": round(items_per_s) if items_per_s is not None else None,
+                "peak_kb": round(peak / 1024, 1),
+                "output": output_size(output),
+                "digest": digest(output),
+            }
+            r = results[key]
+            items = f"{r['items_per_s']:>11}" if items_per_s is not None else f"{'-':>11}"
+            before = baseline.get(key, {}).get("pages_per_s")
+            ratio = f"{r['pages_per_s'] / before:>8.2f}x" if before else f"{'-':>9}"
+            print(f"{name:<11}{page_name[:21]:<22}{r['kb']:>8.0f}{r['ms_per_call']:>13.3f}{r['pages_per_s']:>10.1f}"
+                  f"{ratio}{r['mb_per_s']:>9.2f}{items}{r['peak_kb']:>10.0f}{r['output']:>9}  {r['digest']}")
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        baseline["_machine"] = machine_id()
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if not baseline:
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline to create one")
+        return 0
+    check_throughput = args.check_throughput
+    if check_throughput and baseline.get("_machine") != machine_id():
+        print(f"\nThroughput baseline was recorded on {baseline.get('_machine') or 'another machine'}; "
+              f"run --update-baseline here to compare throughput (outputs are still checked)")
+        check_throughput = False
+    failures = []
+    for key, current in results.items():
+        expected = baseline.get(key)
+        if expected is None:
+            continue
+        if current["digest"] != expected["digest"] or current["output"] != expected.get("output", current["output"]):
+            failures.append(f"{key}: output changed ({current['output']} items, digest {current['digest']}; "
+                            f"baseline {expected.get('output')} items, digest {expected['digest']})")
+        floor = expected["pages_per_s"] / (1 + args.tolerance)
+        if check_throughput and current["pages_per_s"] < floor:
+            failures.append(f"{key}: {current['pages_per_s']} pages/s < {floor:.2f} (baseline {expected['pages_per_s']})")
+    if failures:
+        print("\nREGRESSIONS:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("\nOK: outputs match" + (" and throughput is within baseline" if check_throughput else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,393 @@
+"""
+Localhost load test for the API: N concurrent crawl sessions with their SSE
+streams held open, GET /sessions/{id} polling and resume uploads.
+
+The API runs in a child process with the stub site, fake LLM and SQLite store
+from harness.py, so crawls do real work (fetching, parsing, card writes,
+event fan-out) without leaving the machine. The child stamps every published
+event with its send time and samples its own event-loop lag; the load
+generator reports:
+
+  - request latency percentiles (create, stream connect, poll, resume)
+  - event delivery lag (publish -> client receipt, includes the SSE batch window)
+  - event-loop lag of the API process
+  - API memory growth per open session/stream
+
+    cd backend
+    python benchmarks/load_test.py --sessions 50
+    python benchmarks/load_test.py --sessions 200 --crawl-concurrency 50 --resumes 20 --max-loop-lag-ms 100
+
+Exits 1 if any request failed or a --max-* limit was exceeded.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict, deque
+
+import harness
+
+BACKEND_DIR = harness.BACKEND_DIR
+STATS_PATH = "/__loadtest/stats"
+LAG_INTERVAL = 0.02
+
+
+def percentiles(values, points=(50, 95, 99)) -> dict:
+    if not values:
+        return {f"p{p}": None for p in points} | {"max": None, "count": 0}
+    ordered = sorted(values)
+    out = {f"p{p}": round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))], 2) for p in points}
+    out["max"] = round(ordered[-1], 2)
+    out["count"] = len(ordered)
+    return out
+
+
+def rss_kb() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+# ==============================================================================
+# API PROCESS
+# ==============================================================================
+
+class LoopLagMonitor:
+    """Sleeps `interval` in a loop and records how late each wake-up was (ms)."""
+
+    def __init__(self, interval: float = LAG_INTERVAL):
+        self.interval = interval
+        self.samples: deque = deque(maxlen=200_000)
+
+    async def run(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - expected) * 1000)
+
+    def start(self) -> None:
+        asyncio.get_running_loop().create_task(self.run())
+
+    def summary(self, reset: bool = False) -> dict:
+        out = percentiles(list(self.samples))
+        if reset:
+            self.samples.clear()
+        return out
+
+
+def serve(args) -> None:
+    harness.use_local_backends()
+    os.environ["CRAWL_CONCURRENCY"] = str(args.crawl_concurrency)
+    os.environ["CRAWL_QUEUE_MAX"] = str(max(100, args.sessions * 2))
+    import logging
+    logging.disable(logging.WARNING)
+
+    corpus = harness.generate_corpus(args.professors)
+    site = harness.StubSite(corpus, latency=args.fetch_latency_ms / 1000).__enter__()
+
+    import uvicorn
+    import main
+    from services import crawler
+    from services.event_bus import SessionEventBus
+
+    crawler.PROFESSOR_DELAY_SECONDS = args.professor_delay
+    fake = harness.FakeLLM(corpus, latency=args.llm_latency_ms / 1000, seconds_per_token=args.llm_ms_per_token / 1000)
+    harness.install_fake_llm(main.container.llm, fake)
+
+    # Stamp events with their publish time so the client can measure delivery lag
+    publish = SessionEventBus.publish
+
+    async def stamped_publish(self, message):
+        if isinstance(message, str) and message.startswith("{"):
+            message = json.loads(message)
+        if isinstance(message, dict):
+            message = {**message, "_sent": time.time()}
+        return await publish(self, message)
+
+    SessionEventBus.publish = stamped_publish
+
+    monitor = LoopLagMonitor()
+
+    @main.app.get(STATS_PATH)
+    async def loadtest_stats(reset: bool = False):
+        return {
+            "rss_kb": rss_kb(),
+            "loop_lag_ms": monitor.summary(reset),
+            "event_buses": len(main.container.event_buses),
+            "llm_calls": fake.total_calls,
+            "fetches": site.total_requests,
+        }
+
+    async def run():
+        # The monitor shares the server's event loop
+        monitor.start()
+        await uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=args.port, log_level="warning")).serve()
+
+    print(json.dumps({"root_url": site.url(corpus.root)}), flush=True)
+    asyncio.run(run())
+
+
+# ==============================================================================
+# LOAD GENERATOR
+# ==============================================================================
+
+class LoadRun:
+    def __init__(self, args, base_url: str, root_url: str):
+        self.args = args
+        self.base_url = base_url
+        self.root_url = root_url
+        self.latency = defaultdict(list)  # operation -> ms
+        self.errors = defaultdict(int)
+        self.event_lag: list = []
+        self.events = 0
+        self.open_streams = 0
+        self.peak_streams = 0
+        self.peak_rss_kb = 0
+
+    async def timed(self, operation: str, request):
+        started = time.perf_counter()
+        try:
+            response = await request
+        except Exception as e:
+            self.errors[f"{operation}: {type(e).__name__}"] += 1
+            return None
+        self.latency[operation].append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            self.errors[f"{operation}: HTTP {response.status_code}"] += 1
+            return None
+        return response
+
+    async def session(self, client, index: int) -> None:
+        await asyncio.sleep(self.args.ramp * index / max(1, self.args.sessions))
+        response = await self.timed("create", client.post("/sessions", json={
+            "user_id": str(uuid.uuid4()), "root_urls": [self.root_url], "major": "Computer Science",
+        }))
+        if response is None:
+            return
+        session_id = response.json()["session"]["id"]
+        done = asyncio.Event()
+        poller = asyncio.create_task(self.poll(client, session_id, done))
+        try:
+            await self.stream(client, session_id)
+        finally:
+            done.set()
+            await poller
+
+    async def stream(self, client, session_id: str) -> None:
+        params = {"verbosity": self.args.verbosity}
+        if self.args.batch_ms is not None:
+            params["batch_ms"] = self.args.batch_ms
+        started = time.perf_counter()
+        try:
+            async with client.stream("GET", f"/sessions/{session_id}/stream", params=params) as response:
+                self.latency["stream_connect"].append((time.perf_counter() - started) * 1000)
+                if response.status_code >= 400:
+                    self.errors[f"stream: HTTP {response.status_code}"] += 1
+                    return
+                self.open_streams += 1
+                self.peak_streams = max(self.peak_streams, self.open_streams)
+                try:
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        received = time.time()
+                        payload = json.loads(line[5:])
+                        for event in payload.get("events", [payload]) if payload.get("type") == "batch" else [payload]:
+                            self.events += 1
+                            if "_sent" in event:
+                                self.event_lag.append((received - event["_sent"]) * 1000)
+                            if event.get("type") == "end":
+                                return
+                finally:
+                    self.open_streams -= 1
+        except Exception as e:
+            self.errors[f"stream: {type(e).__name__}"] += 1
+
+    async def poll(self, client, session_id: str, done: asyncio.Event) -> None:
+        while not done.is_set():
+            await self.timed("poll", client.get(f"/sessions/{session_id}"))
+            try:
+                await asyncio.wait_for(done.wait(), self.args.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def resume(self, client, index: int) -> None:
+        await asyncio.sleep(self.args.ramp * index / max(1, self.args.resumes))
+        # Unique text per upload so the parse cache doesn't answer for the LLM
+        pdf = harness.make_pdf(f"Load Test Student {index}\nComputer Science, class of 2027\n"
+                               f"Skills: Python, machine learning, robotics\nRun {uuid.uuid4()}")
+        await self.timed("resume", client.post("/parse-resume", files={"file": (f"resume-{index}.pdf", pdf, "application/pdf")}))
+
+    async def sample_memory(self, client, stop: asyncio.Event) -> None:
+        while not stop.is_set():
+            try:
+                stats = (await client.get(STATS_PATH)).json()
+                self.peak_rss_kb = max(self.peak_rss_kb, stats["rss_kb"])
+            except Exception:
+                pass
+            try:
+                await asyncio.wait_for(stop.wait(), 0.5)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def generate_load(args, base_url: str, root_url: str) -> dict:
+    import httpx
+
+    run = LoadRun(args, base_url, root_url)
+    connections = args.sessions * 2 + args.resumes + 10
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    timeout = httpx.Timeout(args.timeout, read=None)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        idle = (await client.get(STATS_PATH, params={"reset": True})).json()
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(run.sample_memory(client, stop))
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(run.session(client, i) for i in range(args.sessions)),
+            *(run.resume(client, i) for i in range(args.resumes)),
+        )
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await sampler
+        final = (await client.get(STATS_PATH)).json()
+
+    growth_kb = max(0, run.peak_rss_kb - idle["rss_kb"])
+    return {
+        "sessions": args.sessions,
+        "resumes": args.resumes,
+        "elapsed_s": round(elapsed, 2),
+        "latency_ms": {op: percentiles(values) for op, values in run.latency.items()},
+        "event_lag_ms": percentiles(run.event_lag),
+        "events": run.events,
+        "loop_lag_ms": final["loop_lag_ms"],
+        "peak_streams": run.peak_streams,
+        "rss_idle_mb": round(idle["rss_kb"] / 1024, 1),
+        "rss_peak_mb": round(run.peak_rss_kb / 1024, 1),
+        "kb_per_session": round(growth_kb / max(1, args.sessions), 1),
+        "llm_calls": final["llm_calls"],
+        "fetches": final["fetches"],
+        "errors": dict(run.errors),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_api(args, port: int):
+    command = [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port),
+               "--sessions", str(args.sessions), "--crawl-concurrency", str(args.crawl_concurrency),
+               "--professors", str(args.professors), "--professor-delay", str(args.professor_delay),
+               "--llm-latency-ms", str(args.llm_latency_ms), "--llm-ms-per-token", str(args.llm_ms_per_token),
+               "--fetch-latency-ms", str(args.fetch_latency_ms)]
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, stdout=subprocess.PIPE, text=True)
+    info = json.loads(process.stdout.readline() or "{}")
+    if "root_url" not in info:
+        process.kill()
+        raise RuntimeError("API process did not start")
+
+    import httpx
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}{STATS_PATH}", timeout=1).status_code == 200:
+                return process, info["root_url"]
+        except httpx.HTTPError:
+            pass
+        if process.poll() is not None:
+            break
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("API process did not become ready")
+
+
+def print_report(report: dict) -> None:
+    print(f"{report['sessions']} sessions + {report['resumes']} resume uploads in {report['elapsed_s']}s "
+          f"({report['events']} events, {report['llm_calls']} LLM calls, {report['fetches']} fetches)\n")
+    print(f"{'':<22}{'count':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}   (ms)")
+    rows = list(report["latency_ms"].items()) + [("event delivery lag", report["event_lag_ms"]),
+                                                 ("event-loop lag", report["loop_lag_ms"])]
+    for name, p in rows:
+        cells = "".join(f"{'-' if p[k] is None else p[k]:>9}" for k in ("p50", "p95", "p99", "max"))
+        print(f"{name:<22}{p['count']:>7}{cells}")
+    print(f"\nAPI memory: {report['rss_idle_mb']} MB idle, {report['rss_peak_mb']} MB peak "
+          f"({report['peak_streams']} streams open at once), ~{report['kb_per_session']} KB per session")
+    if report["errors"]:
+        print("\nERRORS:")
+        for error, count in sorted(report["errors"].items()):
+            print(f"  {count} x {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent crawl sessions (each with an SSE stream and a poller)")
+    parser.add_argument("--resumes", type=int, default=5, help="concurrent resume uploads")
+    parser.add_argument("--ramp", type=float, default=1.0, help="seconds over which clients start")
+    parser.add_argument("--crawl-concurrency", type=int, default=8, help="CRAWL_CONCURRENCY for the API process")
+    parser.add_argument("--professors", type=int, default=5, help="professors in the stub directory")
+    parser.add_argument("--professor-delay", type=float, default=0.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=100)
+    parser.add_argument("--llm-ms-per-token", type=float, default=0.5)
+    parser.add_argument("--fetch-latency-ms", type=float, default=20)
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--verbosity", default="info")
+    parser.add_argument("--batch-ms", type=int, help="SSE batch window (default: the API's SSE_BATCH_WINDOW_MS)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="connect/write timeout per request")
+    parser.add_argument("--max-loop-lag-ms", type=float, help="fail if event-loop lag p99 exceeds this")
+    parser.add_argument("--max-p99-ms", type=float, help="fail if any request type's p99 exceeds this")
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return 0
+
+    port = free_port()
+    process, root_url = start_api(args, port)
+    try:
+        report = asyncio.run(generate_load(args, f"http://127.0.0.1:{port}", root_url))
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failures = []
+    if report["errors"]:
+        failures.append(f"{sum(report['errors'].values())} failed requests")
+    if args.max_loop_lag_ms is not None and (report["loop_lag_ms"]["p99"] or 0) > args.max_loop_lag_ms:
+        failures.append(f"event-loop lag p99 {report['loop_lag_ms']['p99']} ms > {args.max_loop_lag_ms} ms")
+    if args.max_p99_ms is not None:
+        for op, p in report["latency_ms"].items():
+            if (p["p99"] or 0) > args.max_p99_ms:
+                failures.append(f"{op} p99 {p['p99']} ms > {args.max_p99_ms} ms")
+    if failures:
+        print("\nFAILED: " + "; ".join(failures))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
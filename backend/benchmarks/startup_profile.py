@@ -0,0 +1,160 @@
+"""
+Import-time and cold-start profile for the API.
+
+1. Imports main in a fresh interpreter with `python -X importtime` and lists
+   the modules with the largest cumulative and self import times.
+2. Starts uvicorn in a fresh process (SQLite store, no network) and measures
+   time until the first 200 from GET /, then first vs. repeat latency of a
+   few endpoints, i.e. what an autoscaled instance's first users see.
+
+    cd backend
+    python benchmarks/startup_profile.py
+    python benchmarks/startup_profile.py --top 40 --max-import-ms 800
+
+Exits 1 if importing main takes longer than --max-import-ms.
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+FIRST_REQUESTS = [
+    ("GET", "/"),
+    ("GET", "/metrics"),
+    ("GET", "/llm/usage"),
+    ("GET", f"/sessions/{uuid.uuid4()}"),
+]
+
+
+def local_env() -> dict:
+    env = dict(os.environ)
+    env.update({
+        "STORAGE_BACKEND": "sqlite",
+        "SQLITE_PATH": os.path.join(tempfile.mkdtemp(prefix="labmatch-startup-"), "startup.db"),
+        "LLM_API_KEY": env.get("LLM_API_KEY", "startup-profile"),
+        "EVENT_BROKER_URL": "memory://",
+        "PYTHONPATH": BACKEND_DIR,
+    })
+    return env
+
+
+def import_profile(env: dict):
+    """(total ms, [(module, self ms, cumulative ms, depth)]) for `import main`."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import main failed:\n{result.stderr[-2000:]}")
+    modules = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(self_us) / 1000, int(cumulative_us) / 1000, len(indent) // 2))
+    total = sum(m[1] for m in modules)
+    return total, modules
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def cold_start(env: dict, timeout: float = 60.0) -> dict:
+    import httpx
+
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+                                "--port", str(port), "--log-level", "warning"],
+                               cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        ready = None
+        while time.perf_counter() - started < timeout:
+            try:
+                if httpx.get(base + "/", timeout=5).status_code == 200:
+                    ready = time.perf_counter() - started
+                    break
+            except httpx.HTTPError:
+                pass
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited:\n{process.stderr.read()[-2000:]}")
+            time.sleep(0.02)
+        if ready is None:
+            raise RuntimeError("uvicorn did not answer in time")
+
+        latencies = {}
+        with httpx.Client(base_url=base, timeout=30) as client:
+            for attempt in ("first", "repeat"):
+                for method, path in FIRST_REQUESTS:
+                    t = time.perf_counter()
+                    client.request(method, path)
+                    latencies.setdefault(path, {})[attempt] = round((time.perf_counter() - t) * 1000, 1)
+        return {"ready_ms": round(ready * 1000, 1), "requests_ms": latencies}
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=25, help="modules to list")
+    parser.add_argument("--max-import-ms", type=float, help="fail if importing main takes longer")
+    parser.add_argument("--skip-server", action="store_true", help="only profile imports")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    env = local_env()
+    total, modules = import_profile(env)
+    main_module = next((m for m in modules if m[0] == "main"), None)
+    import_ms = main_module[2] if main_module else total
+
+    print(f"import main: {import_ms:.0f} ms ({len(modules)} modules)\n")
+    print(f"{'cumulative ms':>14}{'self ms':>10}  module")
+    top_level = [m for m in modules if m[3] == 1]  # imported directly by main
+    for name, self_ms, cumulative_ms, _ in sorted(top_level, key=lambda m: -m[2])[:args.top]:
+        print(f"{cumulative_ms:>14.1f}{self_ms:>10.1f}  {name}")
+    print(f"\n{'self ms':>14}  slowest modules by own time")
+    for name, self_ms, _, _ in sorted(modules, key=lambda m: -m[1])[:10]:
+        print(f"{self_ms:>14.1f}  {name}")
+
+    report = {
+        "import_ms": round(import_ms, 1),
+        "modules": len(modules),
+        "top": [{"module": n, "self_ms": round(s, 1), "cumulative_ms": round(c, 1)}
+                for n, s, c, _ in sorted(top_level, key=lambda m: -m[2])[:args.top]],
+    }
+
+    if not args.skip_server:
+        server = cold_start(env)
+        report.update(server)
+        print(f"\nuvicorn cold start: first 200 from GET / after {server['ready_ms']} ms")
+        print(f"{'first ms':>10}{'repeat ms':>11}  request")
+        for path, times in server["requests_ms"].items():
+            print(f"{times['first']:>10}{times['repeat']:>11}  GET {path}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        print(f"\nFAILED: import main took {import_ms:.0f} ms > {args.max_import_ms:.0f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
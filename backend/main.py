@@ -1,20 +1,45 @@
-from fastapi import FastAPI, BackgroundTasks, HTTPException, UploadFile, File
-from fastapi.responses import StreamingResponse
-from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
+
+# Before the service imports: their settings are read from the environment at import time
+load_dotenv()
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, UploadFile, File, Header, Request
+from fastapi.responses import StreamingResponse, Response
+from fastapi.middleware.cors import CORSMiddleware
+from pydantic import ValidationError
 import uuid
-from typing import List
+from typing import Optional
 import logging
 import asyncio
 import json
+import zlib
 
-from models import CreateSessionRequest, SessionResponse, ScrapeSessionResponse, ProfessorCardResponse
-from services.crawler import CrawlerService
-from services.supabase_client import get_supabase_client
+from models import CreateSessionRequest, SessionResponse, ScrapeSessionResponse, ProfessorCardResponse, ProfessorCardListItem, CardPageResponse, IngestArtifact, IngestBatchResponse, SwipeRequest, SwipeResponse
+from services.container import get_service_container
+from services.session_cache import etag_matches
+from services.event_bus import format_sse_batch, VERBOSITY_LEVELS, DEFAULT_VERBOSITY, BATCH_WINDOW
+from services.job_queue import QueueFull, CRAWL_POLL_SECONDS, FINAL_STATUSES
+from services.refresh import RefreshConflict
+from services.resume_parser import ResumeParseError
+from services.ingest import ArtifactBatchWriter, IngestTooLarge, iter_ndjson_lines
+from services.tracing import active_trace, span_totals, to_chrome_trace
+from services.metrics import get_metrics_registry, SESSIONS, EVENT_BUSES, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from services.pagination import CARD_LIST_COLUMNS, CARD_CURSOR_COLUMNS, FEED_CURSOR_COLUMNS, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor, decode_cursor
 
-load_dotenv()
+# Storage, crawler, queue and parsers are created on first use and owned by the lifespan
+container = get_service_container()
 
-app = FastAPI(title="LabMatch Backend")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Start the crawl pool and warm pools/parsers in the background, so the
+    # first requests don't pay for imports and connection setup
+    await container.start()
+    yield
+    await container.aclose()
+
+app = FastAPI(title="LabMatch Backend", lifespan=lifespan)
 
 origins = [
     "*",  # Allow all for development
@@ -28,55 +53,67 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global dictionary to store event queues for each session
-session_queues = {}
-
-crawler_service = CrawlerService()
-supabase = get_supabase_client()
+# Columns needed for ScrapeSessionResponse
+SESSION_COLUMNS = ["id", "user_id", "root_urls", "status", "blocked_reason", "blocked_url", "created_at", "finished_at", "refreshed_at"]
 
 @app.get("/")
-def read_root():
+async def read_root():
     try:
         # Simple health check for Supabase
-        supabase.table("scrape_sessions").select("id").limit(1).execute()
+        await container.supabase.table("scrape_sessions").select("id").limit(1).execute()
         return {"message": "Welcome to LabMatch API", "status": "healthy"}
     except Exception as e:
         logging.error(f"Health check failed: {e}")
         # Return 503 so frontend knows service is degraded
         raise HTTPException(status_code=503, detail="Supabase is down")
 
+@app.get("/llm/usage")
+def get_llm_usage():
+    """Per-tier LLM calls/tokens and model cascade escalation rates."""
+    return container.llm.get_usage_report()
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus scrape endpoint: stage latency histograms, LLM/cache counters, session gauges."""
+    try:
+        # Cached snapshot shared with admission and queue positions
+        jobs = await container.job_queue.snapshot()
+        for status in ("queued", "running"):
+            SESSIONS.set(sum(1 for j in jobs if j["status"] == status), status=status)
+    except Exception as e:
+        logging.warning(f"Could not read crawl queue for metrics: {e}")
+    EVENT_BUSES.set(len(container.event_buses))
+    return Response(content=get_metrics_registry().render(), media_type=METRICS_CONTENT_TYPE)
+
 @app.post("/parse-resume")
 async def parse_resume(file: UploadFile = File(...)):
     """
     Parses a PDF resume and returns keywords/summary.
     """
     try:
-        from pypdf import PdfReader
-        from io import BytesIO
-        
-        contents = await file.read()
-        pdf_file = BytesIO(contents)
-        reader = PdfReader(pdf_file)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() or ""
-            
-        if not text.strip():
-            raise HTTPException(status_code=400, detail="Could not extract text from PDF")
-            
-        # Analyze with LLM
-        result = await crawler_service.llm_service.parse_resume(text)
-        return result
-        
-    except ImportError:
-        raise HTTPException(status_code=500, detail="pypdf not installed")
+        # Read one byte past the cap so oversized uploads are rejected without buffering them whole
+        contents = await file.read(container.resume_parser.max_bytes + 1)
+        return await container.resume_parser.parse(contents, container.llm)
+    except ResumeParseError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         logging.error(f"Resume parsing error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/sessions", response_model=SessionResponse)
-async def create_session(request: CreateSessionRequest, background_tasks: BackgroundTasks):
-    # 1. Create Session in Supabase
+async def create_session(request: CreateSessionRequest):
+    # 0. Admission control: refuse with an ETA when the queue is saturated
+    try:
+        await container.job_queue.admit(request.user_id)
+    except QueueFull as e:
+        eta = int(e.eta_seconds)
+        raise HTTPException(status_code=429, detail={"message": str(e), "eta_seconds": eta},
+                            headers={"Retry-After": str(eta)})
+    except Exception as e:
+        # Don't turn away users because the queue couldn't be inspected
+        logging.error(f"Queue admission check failed: {e}")
+
+    # 1. Create Session in Supabase (status queued = enqueued for the worker pool)
     data = {
         "user_id": str(request.user_id),
         "root_urls": request.root_urls,
@@ -87,15 +124,13 @@ async def create_session(request: CreateSessionRequest, background_tasks: Backgr
     }
     
     try:
-        response = supabase.table("scrape_sessions").insert(data).execute()
+        response = await container.supabase.table("scrape_sessions").insert(data).execute()
         new_session = response.data[0]
         session_id = uuid.UUID(new_session['id'])
         
-        # Initialize event queue for this session
-        session_queues[session_id] = asyncio.Queue()
-        
-        # 2. Trigger crawler in background
-        background_tasks.add_task(run_crawler_task, session_id, request.root_urls, request.major, request.custom_prompt)
+        # 2. Let the in-process pool pick it up right away (the event bus is created on claim)
+        container.job_queue.invalidate()
+        container.wake_crawl_pool()
         
         # 3. Return initial state using Pydantic models
         session_model = ScrapeSessionResponse(**new_session)
@@ -105,40 +140,88 @@ async def create_session(request: CreateSessionRequest, background_tasks: Backgr
         logging.error(f"Error creating session: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def dead_stream():
+    yield f"data: {json.dumps({'type': 'end', 'message': 'Session finished or connection lost'})}\n\n"
+
+
+async def wait_for_crawl(session_id: uuid.UUID):
+    """
+    Yield (frame, bus) pairs: `queue` position frames while the session waits
+    for a worker, then (None, bus) once its event bus is reachable, or
+    (None, None) if the crawl can't be followed from this worker.
+    """
+    last_position, misses = None, 0
+    while True:
+        bus = container.event_buses.get(session_id)
+        if bus is not None:
+            yield None, bus
+            return
+        position = await container.job_queue.position(session_id)
+        if position is not None:
+            misses = 0
+            if position != last_position:
+                last_position = position
+                message = f"Waiting for a crawler: #{position['position']} in line (~{position['eta_seconds']}s)"
+                # No id: queue updates don't move the client's Last-Event-ID
+                yield f"data: {json.dumps({'type': 'queue', 'message': message, **position})}\n\n", None
+        else:
+            bus = await container.event_buses.attach(session_id)
+            if bus is not None:
+                yield None, bus
+                return
+            # Just claimed here and the bus is a moment away, or gone for good
+            misses += 1
+            if misses > 2:
+                yield None, None
+                return
+        await asyncio.sleep(CRAWL_POLL_SECONDS)
+
+
 @app.get("/sessions/{session_id}/stream")
-async def stream_session_logs(session_id: uuid.UUID):
-    if session_id not in session_queues:
-        # Check against DB to see if it's a valid session that just finished or server restarted
+async def stream_session_logs(session_id: uuid.UUID, last_event_id: Optional[str] = Header(None), resume_from: Optional[int] = None,
+                              verbosity: str = DEFAULT_VERBOSITY, batch_ms: Optional[int] = None):
+    """
+    SSE log stream. Each frame carries an `id:`; reconnecting clients send
+    Last-Event-ID (or ?resume_from=) to resume after the last event they saw.
+    `verbosity` is progress, info or debug. Events arriving within `batch_ms`
+    (default SSE_BATCH_WINDOW_MS, 0 disables) are sent as one `batch` frame.
+    """
+    if verbosity not in VERBOSITY_LEVELS:
+        raise HTTPException(status_code=422, detail=f"verbosity must be one of {', '.join(VERBOSITY_LEVELS)}")
+    window = BATCH_WINDOW if batch_ms is None else max(0, min(batch_ms, 2000)) / 1000
+
+    bus = container.event_buses.get(session_id)
+    if bus is None:
+        # Not crawling in this worker. Check against DB: queued sessions wait for a
+        # worker, a live crawl elsewhere is mirrored through the event broker;
+        # otherwise it finished or the server restarted
         try:
-            res = supabase.table("scrape_sessions").select("status").eq("id", str(session_id)).execute()
-            if res.data:
-                # Session exists, but no queue. It's likely finished or server restarted.
-                async def dead_stream():
-                     yield f"data: {json.dumps({'type': 'end', 'message': 'Session finished or connection lost'})}\n\n"
-                return StreamingResponse(dead_stream(), media_type="text/event-stream")
+            res = await container.supabase.table("scrape_sessions").select("status").eq("id", str(session_id)).execute()
         except Exception as e:
             logging.error(f"Error checking DB for stream {session_id}: {e}")
+            res = None
+        if not res or not res.data:
+            raise HTTPException(status_code=404, detail="Session stream not found or session expired")
+        if res.data[0].get("status") in FINAL_STATUSES:
+            return StreamingResponse(dead_stream(), media_type="text/event-stream")
 
-        raise HTTPException(status_code=404, detail="Session stream not found or session expired")
+    cursor = resume_from
+    if last_event_id and last_event_id.strip().isdigit():
+        cursor = int(last_event_id.strip())
 
     async def event_generator():
-        queue = session_queues[session_id]
+        stream_bus = bus
         try:
-            while True:
-                # Wait for next log
-                message = await queue.get()
-                
-                # Check for special 'DONE' message to close stream
-                if message == "STREAM_DONE":
-                    yield f"data: {json.dumps({'type': 'end', 'message': 'Crawling finished'})}\n\n"
-                    break
-                
-                # Check if it's already a JSON event string
-                if isinstance(message, str) and message.strip().startswith('{'):
-                     yield f"data: {message}\n\n"
-                else:
-                     # Wraps plain text logs
-                     yield f"data: {json.dumps({'type': 'log', 'message': message})}\n\n"
+            if stream_bus is None:
+                async for frame, stream_bus in wait_for_crawl(session_id):
+                    if frame:
+                        yield frame
+                if stream_bus is None:
+                    async for frame in dead_stream():
+                        yield frame
+                    return
+            async for batch in stream_bus.subscribe_batches(cursor, level=verbosity, window=window):
+                yield format_sse_batch(batch)
         except asyncio.CancelledError:
             # Client disconnected
             pass
@@ -163,43 +246,110 @@ async def ingest_artifact(artifact: dict):
         session_id = artifact.get("session_id")
         if not session_id:
             raise HTTPException(status_code=400, detail="Missing session_id")
+        try:
+            parsed = IngestArtifact.model_validate(artifact)
+        except ValidationError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        logging.info(f"Ingesting artifact from {parsed.url}")
+        writer = ArtifactBatchWriter(container.supabase)
+        await writer.add(parsed)
+        await writer.flush()
+        await resume_sessions(writer.sessions)
 
-        data = {
-            "session_id": session_id,
-            "source": "chrome_extension",
-            "url": artifact.get("url"),
-            "title": artifact.get("title"),
-            "extracted_text": artifact.get("content"),
-            "raw_metadata": {"html_snippet": artifact.get("html")[:2000] if artifact.get("html") else ""}
-        }
-        
-        logging.info(f"Ingesting artifact from {data['url']}")
-        supabase.table("scrape_artifacts").insert(data).execute()
-        
         return {"status": "success", "message": "Artifact ingested"}
-        
+
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error ingesting artifact: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def resume_sessions(session_ids):
+    """
+    New captures arrived: blocked sessions go back in the queue. Running crawls
+    need nothing, their page source reads new artifacts on a lookup miss.
+    """
+    if not session_ids:
+        return
+    try:
+        resumed = await container.job_queue.resume_blocked(session_ids)
+    except Exception as e:
+        logging.error(f"Could not resume sessions {session_ids}: {e}")
+        return
+    if resumed:
+        logging.info(f"Resuming blocked sessions with new captures: {resumed}")
+        await container.session_cache.invalidate(resumed)
+        container.wake_crawl_pool()
+
+@app.post("/ingest/batch", response_model=IngestBatchResponse)
+async def ingest_batch(request: Request, content_encoding: Optional[str] = Header(None)):
+    """
+    Bulk capture upload from the Chrome Extension: NDJSON, one IngestArtifact
+    per line, optionally gzip-compressed (Content-Encoding: gzip). Lines are
+    validated and deduplicated as they stream in and written in bulk inserts;
+    invalid lines are reported, not fatal.
+    """
+    writer = ArtifactBatchWriter(container.supabase)
+    gzipped = (content_encoding or "").lower() == "gzip"
+    try:
+        async for line_no, line in iter_ndjson_lines(request.stream(), gzipped):
+            await writer.add_line(line_no, line)
+        await writer.flush()
+    except IngestTooLarge as e:
+        await writer.flush()
+        await resume_sessions(writer.sessions)
+        raise HTTPException(status_code=413, detail={"message": str(e), **writer.summary()})
+    except zlib.error as e:
+        raise HTTPException(status_code=400, detail=f"Invalid gzip body: {e}")
+    except Exception as e:
+        logging.error(f"Error ingesting artifact batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    logging.info(f"Ingested batch: {writer.stats}")
+    await resume_sessions(writer.sessions)
+    return writer.summary()
+
 @app.get("/sessions/{session_id}", response_model=SessionResponse)
-def get_session(session_id: str):
+async def get_session(session_id: str, view: str = "full", if_none_match: Optional[str] = Header(None)):
+    """
+    view=full returns every card column; view=list returns the lightweight
+    projection (no evidence_snippets/recent_papers/links/summary).
+    Responses are cached (invalidated on card/status writes) and carry a strong
+    ETag; a matching If-None-Match gets 304 Not Modified.
+    """
+    view = "list" if view == "list" else "full"
+    cached = await container.session_cache.get(session_id, view)
+    if cached:
+        body, etag = cached
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+        return Response(content=body, media_type="application/json", headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+    # Read before the DB so a write landing during the reads isn't cached over
+    generation = container.session_cache.generation(session_id)
     try:
-        # Fetch session
-        session_res = supabase.table("scrape_sessions").select("*").eq("id", session_id).execute()
+        # Fetch session and cards concurrently
+        columns = CARD_LIST_COLUMNS if view == "list" else "*"
+        session_res, cards_res = await asyncio.gather(
+            container.supabase.table("scrape_sessions").select(SESSION_COLUMNS).eq("id", session_id).execute(),
+            container.supabase.table("professor_cards").select(columns).eq("session_id", session_id).is_("retired_at", None).order("created_at").order("id").execute()
+        )
         if not session_res.data:
             raise HTTPException(status_code=404, detail="Session not found")
         
         session_data = session_res.data[0]
-        
-        # Fetch cards
-        cards_res = supabase.table("professor_cards").select("*").eq("session_id", session_id).execute()
         cards_data = cards_res.data if cards_res.data else []
         
-        return SessionResponse(
+        response = SessionResponse(
             session=ScrapeSessionResponse(**session_data),
             cards=[ProfessorCardResponse(**c) for c in cards_data]
         )
+        body = response.model_dump_json().encode("utf-8")
+        etag = await container.session_cache.set(session_id, view, body, response.session.status, generation)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+        return Response(content=body, media_type="application/json", headers={"ETag": etag, "Cache-Control": "no-cache"})
     except Exception as e:
         # If it's the 404 we raised, re-raise it
         if isinstance(e, HTTPException):
@@ -207,25 +357,161 @@ def get_session(session_id: str):
         logging.error(f"Error fetching session: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-async def run_crawler_task(session_id: uuid.UUID, root_urls: List[str], major: str = None, custom_prompt: str = None):
-    logging.info(f"Starting crawl for {session_id} on {root_urls}")
-    
-    # helper for emitting logs
-    async def log_callback(message: str):
-        if session_id in session_queues:
-            await session_queues[session_id].put(message)
+@app.post("/sessions/{session_id}/refresh", status_code=202)
+async def refresh_session(session_id: uuid.UUID):
+    """
+    Re-crawl a finished session incrementally: only pages whose content hash
+    changed are re-analysed, and only the card changes are written (new,
+    updated and retired cards). Progress streams on /sessions/{id}/stream.
+    """
+    try:
+        res = await container.supabase.table("scrape_sessions").select("status,refreshed_at").eq("id", str(session_id)).execute()
+    except Exception as e:
+        logging.error(f"Error loading session {session_id} for refresh: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if not res.data:
+        raise HTTPException(status_code=404, detail="Session not found")
+    status = res.data[0].get("status")
+    if status != "done" or session_id in container.event_buses:
+        raise HTTPException(status_code=409, detail=f"Only finished sessions can be refreshed (status: {status})")
+    try:
+        # Claimed like the scheduler does, so a scheduled refresh elsewhere can't run it twice
+        claimed = await container.refresher.claim(session_id, res.data[0].get("refreshed_at"))
+    except Exception as e:
+        logging.error(f"Error claiming session {session_id} for refresh: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if not claimed:
+        raise HTTPException(status_code=409, detail="Session is already refreshing")
+    try:
+        container.refresher.start(session_id, container.event_buses)
+    except RefreshConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"status": "refreshing", "session_id": str(session_id)}
+
+@app.get("/sessions/{session_id}/profile")
+async def get_session_profile(session_id: uuid.UUID, format: str = "json"):
+    """
+    Span timeline of a crawl: format=json (spans plus per-stage totals and any
+    sampled CPU profile) or format=chrome (trace events for chrome://tracing,
+    Perfetto or speedscope). Crawls still running in this process are served live.
+    """
+    if format not in ("json", "chrome"):
+        raise HTTPException(status_code=422, detail="format must be json or chrome")
+    trace = active_trace(session_id)
+    if trace is not None:
+        doc = trace.to_dict()
+    else:
+        try:
+            res = await container.supabase.table("session_traces").select("trace").eq("session_id", str(session_id)).execute()
+        except Exception as e:
+            logging.error(f"Error fetching trace for {session_id}: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+        if not res.data:
+            raise HTTPException(status_code=404, detail="No trace recorded for this session")
+        doc = res.data[0]["trace"]
+
+    if format == "chrome":
+        return to_chrome_trace(doc)
+    return {**doc, "totals": span_totals(doc)}
+
+@app.get("/sessions/{session_id}/cards", response_model=CardPageResponse)
+async def list_session_cards(session_id: str, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None, view: str = "list", count: str = None):
+    """
+    Cursor-paged cards for a session, oldest first.
+    Pass the returned next_cursor to get the following page; count=exact|estimated adds a total.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    try:
+        after = decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if count not in (None, "exact", "estimated", "planned"):
+        raise HTTPException(status_code=400, detail="count must be exact, estimated or planned")
+
+    try:
+        columns = CARD_LIST_COLUMNS if view == "list" else "*"
+        query = container.supabase.table("professor_cards").select(columns).eq("session_id", session_id)\
+            .is_("retired_at", None).keyset(after, CARD_CURSOR_COLUMNS).limit(limit)
+        if count:
+            query = query.count(count)
+        res = await query.execute()
+        rows = res.data or []
+
+        next_cursor = None
+        if len(rows) == limit:
+            last = rows[-1]
+            next_cursor = encode_cursor([last.get(c) for c in CARD_CURSOR_COLUMNS])
+
+        model = ProfessorCardListItem if view == "list" else ProfessorCardResponse
+        return CardPageResponse(
+            cards=[model(**r) for r in rows],
+            next_cursor=next_cursor,
+            total=res.count
+        )
+    except Exception as e:
+        logging.error(f"Error listing cards for {session_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/swipes", response_model=SwipeResponse)
+async def record_swipe(request: SwipeRequest):
+    """Record a like/pass and drop the professor from the user's feed."""
     try:
-        await log_callback(f"Starting crawl session for: {', '.join(root_urls)}")
-        await crawler_service.run_session(session_id, root_urls, log_callback, major, custom_prompt)
-        await log_callback("Crawl task finished successfully.")
+        card_res = await container.supabase.table("professor_cards").select("id,session_id,professor_name,match_score")\
+            .eq("id", str(request.professor_card_id)).execute()
+        if not card_res.data:
+            raise HTTPException(status_code=404, detail="Card not found")
+
+        res = await container.supabase.table("swipes").insert({
+            "user_id": str(request.user_id),
+            "professor_card_id": str(request.professor_card_id),
+            "decision": request.decision,
+        }).execute()
+        await container.feed_indexer.mark_swiped(request.user_id, card_res.data[0])
+        return SwipeResponse(**res.data[0])
+    except HTTPException:
+        raise
     except Exception as e:
-        await log_callback(f"Crawl task failed: {str(e)}")
-    finally:
-        # Signal stream end
-        if session_id in session_queues:
-            await session_queues[session_id].put("STREAM_DONE")
-            # Wait a bit for stream to flush before cleaning up
-            await asyncio.sleep(60)
-            del session_queues[session_id]
-        logging.info(f"Crawl task finished for {session_id}")
+        logging.error(f"Error recording swipe: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/users/{user_id}/feed", response_model=CardPageResponse)
+async def get_user_feed(user_id: str, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None, view: str = "list"):
+    """
+    Unswiped cards from all of the user's sessions, one per professor, best
+    score first. Served from the precomputed user_feed ranking; pass the
+    returned next_cursor to get the following page.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    try:
+        after = decode_cursor(cursor, FEED_CURSOR_COLUMNS)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    try:
+        if after is None:
+            # Catch up on cards written by other processes since this one last looked
+            await container.feed_indexer.index_user(user_id)
+        res = await container.supabase.table("user_feed").select(list(FEED_CURSOR_COLUMNS)).eq("user_id", user_id)\
+            .is_("swiped_at", None).keyset(after, FEED_CURSOR_COLUMNS, desc=True).limit(limit).execute()
+        rows = res.data or []
+
+        cards = {}
+        if rows:
+            columns = CARD_LIST_COLUMNS if view == "list" else "*"
+            cards_res = await container.supabase.table("professor_cards").select(columns)\
+                .in_("id", [r["professor_card_id"] for r in rows]).execute()
+            cards = {str(c["id"]): c for c in cards_res.data or []}
+
+        next_cursor = None
+        if len(rows) == limit:
+            last = rows[-1]
+            next_cursor = encode_cursor([last.get(c) for c in FEED_CURSOR_COLUMNS])
+
+        model = ProfessorCardListItem if view == "list" else ProfessorCardResponse
+        return CardPageResponse(
+            cards=[model(**cards[str(r["professor_card_id"])]) for r in rows if str(r["professor_card_id"]) in cards],
+            next_cursor=next_cursor
+        )
+    except Exception as e:
+        logging.error(f"Error building feed for {user_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,10 @@
+-- Migration: Content hashes for extension artifacts
+-- Run this in your Supabase SQL Editor.
+-- /ingest/batch stores a SHA-256 of each capture's text and skips content
+-- the session already has.
+
+ALTER TABLE public.scrape_artifacts
+ADD COLUMN IF NOT EXISTS content_hash text;
+
+CREATE INDEX IF NOT EXISTS scrape_artifacts_session_hash_idx
+  ON public.scrape_artifacts (session_id, content_hash);
@@ -0,0 +1,59 @@
+-- Migration: Secondary indexes for the hot query paths
+-- Run this in the Supabase SQL Editor last: after schema.sql and every other
+-- migration_*.sql, since it indexes columns they add.
+-- The SQL Editor wraps scripts in a transaction, so CONCURRENTLY is not used here;
+-- on a large live database run each statement separately with CREATE INDEX CONCURRENTLY.
+-- Verify with: python benchmarks/explain_indexes.py (see that file for details)
+
+-- professor_cards: every session read filters by session_id and skips retired
+-- cards; (created_at, id) also serves the ordered/keyset-paged card list
+-- without a sort step. It replaces the unfiltered index of the same columns.
+CREATE INDEX IF NOT EXISTS professor_cards_session_live_idx
+  ON public.professor_cards (session_id, created_at, id)
+  WHERE retired_at IS NULL;
+DROP INDEX IF EXISTS public.professor_cards_session_created_idx;
+
+-- professor_cards: keyword / theme search (keywords @> '{...}', && etc.)
+CREATE INDEX IF NOT EXISTS professor_cards_keywords_gin_idx
+  ON public.professor_cards USING gin (keywords);
+CREATE INDEX IF NOT EXISTS professor_cards_research_themes_gin_idx
+  ON public.professor_cards USING gin (research_themes);
+
+-- scrape_artifacts: extension ingest is read back per session
+CREATE INDEX IF NOT EXISTS scrape_artifacts_session_idx
+  ON public.scrape_artifacts (session_id, captured_at);
+
+-- scrape_sessions: lookups by id use the primary key; per-user history and the
+-- queued/running work list need their own indexes
+CREATE INDEX IF NOT EXISTS scrape_sessions_user_created_idx
+  ON public.scrape_sessions (user_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS scrape_sessions_active_status_idx
+  ON public.scrape_sessions (status, created_at)
+  WHERE status IN ('queued', 'running');
+
+-- swipes: looked up by user (feed filtering) and by (user, card) to skip already-swiped cards
+CREATE INDEX IF NOT EXISTS swipes_user_card_idx
+  ON public.swipes (user_id, professor_card_id);
+CREATE INDEX IF NOT EXISTS swipes_user_created_idx
+  ON public.swipes (user_id, created_at DESC);
+
+-- email_drafts: listed per user
+CREATE INDEX IF NOT EXISTS email_drafts_user_idx
+  ON public.email_drafts (user_id, created_at DESC);
+
+-- Embeddings (pgvector) for similarity ranking of cards against a user's profile
+ALTER TABLE public.professor_cards
+ADD COLUMN IF NOT EXISTS embedding vector(384);
+
+ALTER TABLE public.profiles
+ADD COLUMN IF NOT EXISTS embedding vector(384);
+
+COMMENT ON COLUMN public.professor_cards.embedding IS 'Research-summary embedding (384 dims, cosine distance)';
+
+CREATE INDEX IF NOT EXISTS professor_cards_embedding_hnsw_idx
+  ON public.professor_cards USING hnsw (embedding vector_cosine_ops);
+
+ANALYZE public.professor_cards;
+ANALYZE public.scrape_artifacts;
+ANALYZE public.scrape_sessions;
+ANALYZE public.swipes;
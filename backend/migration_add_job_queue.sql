@@ -0,0 +1,30 @@
+-- Migration: Crawl job queue bookkeeping on scrape_sessions
+-- Run this in your Supabase SQL Editor (before migration_add_indexes.sql, which runs last).
+-- 'queued' rows are the job queue; workers claim them by flipping status to
+-- 'running' and heartbeat while they crawl (see services/job_queue.py).
+
+ALTER TABLE public.scrape_sessions
+ADD COLUMN IF NOT EXISTS worker_id text;
+
+ALTER TABLE public.scrape_sessions
+ADD COLUMN IF NOT EXISTS started_at timestamp with time zone;
+
+ALTER TABLE public.scrape_sessions
+ADD COLUMN IF NOT EXISTS heartbeat_at timestamp with time zone;
+
+ALTER TABLE public.scrape_sessions
+ADD COLUMN IF NOT EXISTS attempts integer DEFAULT 0;
+
+-- Finding running jobs whose worker stopped heartbeating
+CREATE INDEX IF NOT EXISTS scrape_sessions_running_heartbeat_idx
+  ON public.scrape_sessions (heartbeat_at)
+  WHERE status = 'running';
+
+-- A session whose crawl raises ends as 'failed', which the original status
+-- CHECK rejected; recreate the constraint with it
+ALTER TABLE public.scrape_sessions
+DROP CONSTRAINT IF EXISTS scrape_sessions_status_check;
+
+ALTER TABLE public.scrape_sessions
+ADD CONSTRAINT scrape_sessions_status_check
+  CHECK (status IN ('queued', 'running', 'done', 'error', 'blocked', 'failed'));
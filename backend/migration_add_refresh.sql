@@ -0,0 +1,37 @@
+-- Migration: Incremental session refresh
+-- Run this in your Supabase SQL Editor.
+-- Crawls keep a content hash of every directory and profile page they read
+-- (crawl_pages). A refresh (POST /sessions/{id}/refresh, or scheduled with
+-- REFRESH_INTERVAL_HOURS) re-runs LLM work only for pages whose hash changed,
+-- updates changed cards in place and retires cards of professors no longer
+-- listed instead of deleting them (see services/refresh.py).
+
+CREATE TABLE IF NOT EXISTS public.crawl_pages (
+  session_id uuid REFERENCES public.scrape_sessions(id) ON DELETE CASCADE NOT NULL,
+  url text NOT NULL,
+  kind text CHECK (kind IN ('directory', 'profile')) NOT NULL,
+  content_hash text NOT NULL,
+  professor_key text,
+  professors jsonb,
+  checked_at timestamp with time zone DEFAULT timezone('utc'::text, now()) NOT NULL,
+  PRIMARY KEY (session_id, url)
+);
+
+ALTER TABLE public.scrape_sessions
+ADD COLUMN IF NOT EXISTS refreshed_at timestamp with time zone;
+
+-- Sessions finished before this migration are due from when they finished
+UPDATE public.scrape_sessions
+SET refreshed_at = coalesce(finished_at, created_at)
+WHERE status = 'done' AND refreshed_at IS NULL;
+
+ALTER TABLE public.professor_cards
+ADD COLUMN IF NOT EXISTS updated_at timestamp with time zone;
+
+ALTER TABLE public.professor_cards
+ADD COLUMN IF NOT EXISTS retired_at timestamp with time zone;
+
+-- Finding finished sessions due for a scheduled refresh
+CREATE INDEX IF NOT EXISTS scrape_sessions_refresh_due_idx
+  ON public.scrape_sessions (refreshed_at)
+  WHERE status = 'done';
@@ -0,0 +1,10 @@
+-- Migration: Per-session crawl traces
+-- Run this in your Supabase SQL Editor.
+-- Each crawl stores its span timeline (and, when SESSION_PROFILER_HZ is set,
+-- sampled CPU stacks) here; GET /sessions/{id}/profile serves it.
+
+CREATE TABLE IF NOT EXISTS public.session_traces (
+  session_id uuid PRIMARY KEY REFERENCES public.scrape_sessions(id) ON DELETE CASCADE,
+  trace jsonb NOT NULL,
+  created_at timestamp with time zone DEFAULT timezone('utc'::text, now()) NOT NULL
+);
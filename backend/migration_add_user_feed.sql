@@ -0,0 +1,27 @@
+-- Migration: Precomputed swipe feed
+-- Run this in your Supabase SQL Editor.
+-- One row per (user, professor) with the best-scored card across the user's
+-- sessions. Rows are upserted as cards are written and flagged with
+-- swiped_at once the user swipes, so GET /users/{id}/feed is a single
+-- index range scan.
+
+CREATE TABLE IF NOT EXISTS public.user_feed (
+  user_id uuid REFERENCES public.profiles(id) NOT NULL,
+  professor_key text NOT NULL,
+  professor_card_id uuid REFERENCES public.professor_cards(id) NOT NULL,
+  session_id uuid REFERENCES public.scrape_sessions(id),
+  score real NOT NULL DEFAULT 0,
+  ranked_at timestamp with time zone DEFAULT timezone('utc'::text, now()),
+  swiped_at timestamp with time zone,
+  PRIMARY KEY (user_id, professor_key)
+);
+
+-- Feed pages: WHERE user_id = ? AND swiped_at IS NULL ORDER BY score DESC, professor_card_id DESC
+CREATE INDEX IF NOT EXISTS user_feed_rank_idx
+  ON public.user_feed (user_id, score DESC, professor_card_id DESC)
+  WHERE swiped_at IS NULL;
+
+-- Created_at of each session's newest card folded into user_feed, so indexing
+-- resumes from there after a restart or in another process
+ALTER TABLE public.scrape_sessions
+ADD COLUMN IF NOT EXISTS feed_indexed_through timestamp with time zone;
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional, Any, Dict
+from pydantic import BaseModel, Field
+from typing import List, Optional, Any, Dict, Literal
 from uuid import UUID
 from datetime import datetime
 
@@ -12,6 +12,21 @@ class CreateSessionRequest(BaseModel):
     major: Optional[str] = None
     custom_prompt: Optional[str] = None
 
+class IngestArtifact(BaseModel):
+    """One line of a /ingest/batch NDJSON upload from the browser extension."""
+    session_id: UUID
+    url: str = Field(min_length=1, max_length=2048)
+    title: Optional[str] = Field(default=None, max_length=1000)
+    content: Optional[str] = None  # Visible page text
+    html: Optional[str] = None
+    out_links: List[str] = []
+    captured_at: Optional[datetime] = None
+
+class SwipeRequest(BaseModel):
+    user_id: UUID
+    professor_card_id: UUID
+    decision: Literal["like", "pass"]
+
 # --- Responses / DB Models ---
 
 class ProfessorCardResponse(BaseModel):
@@ -33,6 +48,7 @@ class ProfessorCardResponse(BaseModel):
     match_score: Optional[float] = 0.0
     match_reasoning: Optional[str] = None
     created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None  # Last changed by a refresh
 
 class ScrapeSessionResponse(BaseModel):
     id: UUID
@@ -43,7 +59,41 @@ class ScrapeSessionResponse(BaseModel):
     blocked_url: Optional[str] = None
     created_at: Optional[datetime] = None
     finished_at: Optional[datetime] = None
+    refreshed_at: Optional[datetime] = None  # Pages last read (crawl or refresh)
 
 class SessionResponse(BaseModel):
     session: ScrapeSessionResponse
     cards: List[ProfessorCardResponse] = []
+
+class ProfessorCardListItem(BaseModel):
+    """Lightweight card projection for list views."""
+    id: Optional[UUID] = None
+    session_id: Optional[UUID] = None
+    professor_name: Optional[str] = None
+    title: Optional[str] = None
+    department: Optional[str] = None
+    school: Optional[str] = None
+    primary_url: Optional[str] = None
+    keywords: List[str] = []
+    match_score: Optional[float] = 0.0
+    created_at: Optional[datetime] = None
+
+class CardPageResponse(BaseModel):
+    cards: List[Any] = []  # ProfessorCardResponse or ProfessorCardListItem, depending on view
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+class IngestBatchResponse(BaseModel):
+    received: int
+    inserted: int
+    duplicates: int
+    invalid: int
+    batches: int
+    errors: List[Dict[str, Any]] = []
+
+class SwipeResponse(BaseModel):
+    id: UUID
+    user_id: UUID
+    professor_card_id: UUID
+    decision: str
+    created_at: Optional[datetime] = None
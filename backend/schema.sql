@@ -20,7 +20,7 @@ create table public.scrape_sessions (
   objective_prompt text,
   major text,
   custom_prompt text,
-  status text check (status in ('queued', 'running', 'done', 'error', 'blocked')) default 'queued',
+  status text check (status in ('queued', 'running', 'done', 'error', 'blocked', 'failed')) default 'queued',
   blocked_reason text,
   blocked_url text,
   created_at timestamp with time zone default timezone('utc'::text, now()) not null,
@@ -0,0 +1,99 @@
+import html as html_lib
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Set
+
+from services.ingest import canonical_url
+
+logger = logging.getLogger(__name__)
+
+# A lookup miss checks for newly captured artifacts at most this often, so pages
+# captured while the crawl runs are picked up without any signalling
+ARTIFACT_REFRESH_SECONDS = float(os.environ.get("ARTIFACT_REFRESH_SECONDS", "5"))
+
+
+def artifact_page(row: Dict) -> Optional[str]:
+    """HTML to crawl for an artifact row: the captured HTML, else its text wrapped as a page."""
+    meta = row.get("raw_metadata") or {}
+    if meta.get("html"):
+        return meta["html"]
+    text = row.get("extracted_text") or ""
+    if text.strip():
+        title = html_lib.escape(row.get("title") or "")
+        return f"<html><head><title>{title}</title></head><body><pre>{html_lib.escape(text)}</pre></body></html>"
+    # Old single-artifact ingests kept only a 2000-char HTML snippet
+    return meta.get("html_snippet") or None
+
+
+class ArtifactPageSource:
+    """
+    Pages the browser extension captured for one session, keyed by canonical
+    URL. The crawler asks here before going to the network, so sites that
+    block the backend (403/429) can still be crawled from the user's captures.
+
+    After the first load, a lookup miss reads only artifacts captured at or
+    after the newest one already read; a capture stamped earlier than that
+    (extension clock skew) is left for the next crawl of the session.
+    """
+
+    def __init__(self, client, session_id, refresh_interval: float = ARTIFACT_REFRESH_SECONDS):
+        self.client = client
+        self.session_id = str(session_id)
+        self.refresh_interval = refresh_interval
+        self._pages: Dict[str, str] = {}
+        self._order: List[str] = []
+        self._loaded_at = 0.0
+        # Newest captured_at read so far, and the ids read at exactly that time
+        self._captured_through: Optional[str] = None
+        self._ids_at_mark: Set[str] = set()
+        self.hits = 0
+
+    async def load(self) -> int:
+        """Read artifacts captured since the last load (all of them the first time)."""
+        query = self.client.table("scrape_artifacts") \
+            .select("id,url,title,extracted_text,raw_metadata,captured_at") \
+            .eq("session_id", self.session_id).eq("source", "chrome_extension")
+        if self._captured_through is not None:
+            # gte, not gt: rows stored later with the same captured_at are skipped by id
+            query = query.gte("captured_at", self._captured_through)
+        try:
+            res = await query.order("captured_at").execute()
+        except Exception as e:
+            logger.error(f"Could not load artifacts for session {self.session_id}: {e}")
+            return len(self._pages)
+        self._loaded_at = time.monotonic()
+        for row in res.data or []:
+            if row["captured_at"] == self._captured_through and row["id"] in self._ids_at_mark:
+                continue
+            if row["captured_at"] != self._captured_through:
+                self._captured_through = row["captured_at"]
+                self._ids_at_mark = set()
+            self._ids_at_mark.add(row["id"])
+            page = artifact_page(row)
+            if not row.get("url") or not page:
+                continue
+            url = canonical_url(row["url"])
+            if url not in self._pages:
+                self._order.append(url)
+            # Later captures of the same page win
+            self._pages[url] = page
+        return len(self._pages)
+
+    @property
+    def urls(self) -> List[str]:
+        """Captured URLs, oldest capture first."""
+        return list(self._order)
+
+    async def get(self, url: str) -> Optional[str]:
+        key = canonical_url(url)
+        page = self._pages.get(key)
+        if page is None and time.monotonic() - self._loaded_at >= self.refresh_interval:
+            await self.load()
+            page = self._pages.get(key)
+        if page is not None:
+            self.hits += 1
+        return page
+
+    def __len__(self) -> int:
+        return len(self._pages)
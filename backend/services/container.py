@@ -0,0 +1,200 @@
+import asyncio
+import importlib
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Warm pools and parsers in the background after startup ("false" to skip)
+SERVICE_WARMUP = os.environ.get("SERVICE_WARMUP", "true").lower() == "true"
+
+WARMUP_HTML = "<html><body><nav>Menu</nav><main><h1>Faculty</h1><a href='/people/a'>Ada Lovelace</a></main></body></html>"
+
+_UNSET = object()
+
+
+class ServiceContainer:
+    """
+    The API's long-lived services. Each is created (and its module imported)
+    on first use, so importing main stays cheap; the app lifespan calls
+    start() to launch the crawl pool and warm connection pools, the LLM client
+    and the parsers in the background, and aclose() to shut down whatever was
+    created, in dependency order.
+    """
+
+    def __init__(self, warmup: bool = SERVICE_WARMUP):
+        self.warmup = warmup
+        self.warmup_ms: Dict[str, float] = {}
+        self._crawler = None
+        self._event_buses = None
+        self._job_queue = None
+        self._crawl_pool = _UNSET
+        self._refresher = None
+        self._refresh_scheduler = None
+        self._session_cache = None
+        self._resume_parser = None
+        self._background: Optional[asyncio.Task] = None
+
+    @property
+    def supabase(self):
+        from services.supabase_client import get_async_supabase_client
+        return get_async_supabase_client()
+
+    @property
+    def crawler(self):
+        if self._crawler is None:
+            from services.crawler import CrawlerService
+            self._crawler = CrawlerService(session_cache=self.session_cache)
+        return self._crawler
+
+    @property
+    def llm(self):
+        return self.crawler.llm_service
+
+    @property
+    def event_buses(self):
+        if self._event_buses is None:
+            from services.event_broker import get_event_broker
+            from services.event_bus import EventBusRegistry
+            # Per-session SSE event buses (bounded replay ring, multi-subscriber)
+            self._event_buses = EventBusRegistry(broker=get_event_broker())
+        return self._event_buses
+
+    @property
+    def job_queue(self):
+        if self._job_queue is None:
+            from services.job_queue import CrawlJobQueue
+            self._job_queue = CrawlJobQueue(self.supabase)
+        return self._job_queue
+
+    @property
+    def crawl_pool(self):
+        """The in-process worker pool, or None when crawls run in worker.py processes."""
+        if self._crawl_pool is _UNSET:
+            from services.job_queue import CRAWL_WORKER_MODE, create_crawl_pool
+            self._crawl_pool = None
+            if CRAWL_WORKER_MODE == "inprocess":
+                self._crawl_pool = create_crawl_pool(self.job_queue, self.crawler, self.event_buses)
+        return self._crawl_pool
+
+    @property
+    def refresher(self):
+        if self._refresher is None:
+            from services.refresh import SessionRefresher
+            self._refresher = SessionRefresher(self.crawler)
+        return self._refresher
+
+    @property
+    def session_cache(self):
+        if self._session_cache is None:
+            from services.session_cache import SESSION_CACHE_URL, SessionCache
+            # Invalidations reach the other workers through the event broker
+            self._session_cache = SessionCache(redis_url=SESSION_CACHE_URL, broker=self.event_buses.broker)
+        return self._session_cache
+
+    @property
+    def resume_parser(self):
+        if self._resume_parser is None:
+            from services.resume_parser import get_resume_parser
+            self._resume_parser = get_resume_parser()
+        return self._resume_parser
+
+    @property
+    def feed_indexer(self):
+        from services.feed import get_feed_indexer
+        return get_feed_indexer()
+
+    def wake_crawl_pool(self) -> None:
+        """Let the pool claim new work now; a pool that isn't up yet picks it up when it starts."""
+        if self._crawl_pool is not _UNSET and self._crawl_pool is not None:
+            self._crawl_pool.wake()
+
+    async def start(self) -> None:
+        # Building the crawler imports the LLM/HTML stack, so the pool starts in
+        # the background and the server accepts requests right away
+        self._background = asyncio.get_running_loop().create_task(self._start_background())
+
+    async def _start_background(self) -> None:
+        try:
+            await self.session_cache.start()
+            # Import off the event loop; construct on it (buffers and locks belong to the loop)
+            await self._step("crawler_import", lambda: asyncio.to_thread(importlib.import_module, "services.crawler"))
+            pool = self.crawl_pool
+            if pool is not None:
+                pool.start()
+                self._start_refresh_scheduler()
+            if self.warmup:
+                await self.warm_up()
+        except Exception as e:
+            logger.error(f"Service startup failed: {e}")
+
+    def _start_refresh_scheduler(self) -> None:
+        """Scheduled refreshes run where crawls run (worker.py starts its own in external mode)."""
+        from services.refresh import REFRESH_INTERVAL_HOURS, RefreshScheduler
+        if REFRESH_INTERVAL_HOURS > 0:
+            self._refresh_scheduler = RefreshScheduler(self.refresher, self.event_buses)
+            self._refresh_scheduler.start()
+
+    async def _step(self, name: str, run) -> None:
+        started = time.perf_counter()
+        try:
+            await run()
+        except Exception as e:
+            logger.warning(f"Warm-up step {name} failed: {e}")
+            return
+        self.warmup_ms[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    async def warm_up(self) -> Dict[str, float]:
+        """Open the storage pool, build the LLM client and load the HTML and PDF parsers."""
+        from services.llm import discovery_text
+
+        await self._step("database", lambda: self.supabase.table("scrape_sessions").select("id").limit(1).execute())
+        await self._step("llm_client", self._warm_llm_client)
+        await self._step("html_parser", lambda: asyncio.to_thread(discovery_text, WARMUP_HTML))
+        await self._step("resume_parser", self.resume_parser.warm)
+        logger.info(f"Services warm: {self.warmup_ms}")
+        return self.warmup_ms
+
+    async def _warm_llm_client(self) -> None:
+        # Only the slow openai import runs in a thread; the client is built on the loop it serves
+        await asyncio.to_thread(importlib.import_module, "openai")
+        self.llm.client
+
+    async def aclose(self) -> None:
+        # Hand running crawls back to the queue, write out buffered cards,
+        # then release pooled keep-alive connections
+        if self._background is not None and not self._background.done():
+            self._background.cancel()
+            try:
+                await self._background
+            except asyncio.CancelledError:
+                pass
+        if self._refresh_scheduler is not None:
+            await self._refresh_scheduler.stop()
+        if self._refresher is not None:
+            await self._refresher.aclose()
+        if self._crawl_pool is not _UNSET and self._crawl_pool is not None:
+            await self._crawl_pool.stop()
+        if self._crawler is not None:
+            await self._crawler.write_buffer.close()
+        if self._session_cache is not None:
+            await self._session_cache.aclose()
+        if self._event_buses is not None:
+            await self._event_buses.shutdown()
+        if self._resume_parser is not None:
+            # Joins the parser processes (bounded), so off the loop
+            await asyncio.to_thread(self._resume_parser.close)
+        from services.supabase_client import aclose_async_supabase_client
+        await aclose_async_supabase_client()
+
+
+_container: Optional[ServiceContainer] = None
+
+
+def get_service_container() -> ServiceContainer:
+    global _container
+    if _container is None:
+        _container = ServiceContainer()
+    return _container
@@ -1,34 +1,220 @@
 import requests
-from requests.exceptions import Timeout, ConnectionError, RequestException
-from bs4 import BeautifulSoup
 from uuid import UUID
-import uuid
 import logging
 import asyncio
 import json
+import os
+import math
 import time
+from collections import deque
+from datetime import datetime, timezone
 from typing import List, Optional, Dict, Any
 from models import ProfessorCardResponse
-from services.supabase_client import get_supabase_client
+from services.supabase_client import get_async_supabase_client
 from services.llm import LLMService
+from services.write_buffer import WriteBehindBuffer
+from services.feed import get_feed_indexer, professor_key
+from services.artifact_source import ArtifactPageSource
+from services.ingest import canonical_url
+from services.job_queue import FINAL_STATUSES
+from services.refresh import page_record, save_crawl_pages, stub_summary
+from services.metrics import FETCH_SECONDS, FETCH_BLOCKED, PARSE_SECONDS, cache_result, url_host
+from services.tracing import SessionTrace, save_trace, span
 
 logger = logging.getLogger(__name__)
 
+# Pause between professors in the investigation phase (LLM rate limits)
+PROFESSOR_DELAY_SECONDS = float(os.environ.get("CRAWL_PROFESSOR_DELAY", "0.5"))
+# Professors investigated at once; investigation runs alongside discovery
+INVESTIGATION_CONCURRENCY = int(os.environ.get("CRAWL_INVESTIGATION_CONCURRENCY", "1"))
+# Discovery page budget: a fair share per root URL, capped for the whole session
+DISCOVERY_PAGES_PER_ROOT = int(os.environ.get("CRAWL_DISCOVERY_PAGES_PER_ROOT", "5"))
+DISCOVERY_MAX_PAGES = int(os.environ.get("CRAWL_DISCOVERY_MAX_PAGES", "15"))
+# Discovery fetches in flight per host (roots on different sites are scanned in parallel;
+# roots on the same host share this, so at 1 they take turns page by page)
+DISCOVERY_HOST_CONCURRENCY = int(os.environ.get("CRAWL_DISCOVERY_HOST_CONCURRENCY", "1"))
+
+BLOCKED_MESSAGE = ("This site blocks automated access. Open the faculty directory with the LabMatch "
+                   "browser extension and capture it; the scan resumes automatically.")
+
+
+class FetchBlocked(Exception):
+    """The site refused the backend (403/429); a browser capture is needed."""
+
+
+class DiscoveryRoot:
+    """One root URL's discovery worker state: its page queue and yield."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.queue: List[Dict[str, Any]] = [{"url": url, "depth": 0}]
+        self.pages = 0
+        self.found = 0
+        self.status = "exhausted"  # exhausted | enough | budget | timeout
+
+    def report(self) -> Dict[str, Any]:
+        return {"root": self.url, "pages": self.pages, "found": self.found, "status": self.status}
+
+
+class DiscoveryBudget:
+    """
+    Global discovery page budget split evenly across roots. A root past its
+    share takes pages left over by roots that finished early, and waits while
+    a root still scanning might leave some.
+    """
+
+    def __init__(self, roots: List[str], total: int):
+        self.share = {root: total // len(roots) + (1 if i < total % len(roots) else 0)
+                      for i, root in enumerate(roots)} if roots else {}
+        self.used = {root: 0 for root in roots}
+        self.spare = 0
+        self.active = set(roots)
+        self._changed = asyncio.Condition()
+
+    async def take(self, root: str) -> bool:
+        async with self._changed:
+            while True:
+                if self.used[root] < self.share[root]:
+                    self.used[root] += 1
+                    self._changed.notify_all()
+                    return True
+                if self.spare > 0:
+                    self.spare -= 1
+                    self.used[root] += 1
+                    self._changed.notify_all()
+                    return True
+                if not any(r != root and self.used[r] < self.share[r] for r in self.active):
+                    return False
+                await self._changed.wait()
+
+    async def give_back(self, root: str) -> None:
+        """A page taken by `root` wasn't read: a page beyond its share returns to the spare pool."""
+        async with self._changed:
+            if self.used[root] > self.share[root]:
+                self.spare += 1
+            self.used[root] -= 1
+            self._changed.notify_all()
+
+    async def release(self, root: str) -> None:
+        """`root` is done: its unused share goes to the others."""
+        async with self._changed:
+            if root in self.active:
+                self.active.discard(root)
+                self.spare += max(0, self.share[root] - self.used[root])
+                self.share[root] = self.used[root]
+            self._changed.notify_all()
+
+
+class InvestigationQueue:
+    """
+    Stubs waiting for investigation while discovery is still adding to them,
+    handed out round-robin across their roots (each root in discovery order).
+    Nothing is handed out before `start_after` stubs were queued, so a session
+    that fails the low-yield check never starts investigating.
+    """
+
+    def __init__(self, roots: List[str], start_after: int = 1):
+        self.pending: Dict[str, deque] = {root: deque() for root in roots}
+        self.total = 0
+        self.start_after = start_after
+        self.closed = False
+        self._turn = 0
+        self._changed = asyncio.Condition()
+
+    async def put(self, stub: Dict[str, Any]) -> None:
+        async with self._changed:
+            self.pending.setdefault(stub.get("root"), deque()).append(stub)
+            self.total += 1
+            self._changed.notify_all()
+
+    async def close(self) -> None:
+        """Discovery is over: `get` returns None once the queue is drained."""
+        async with self._changed:
+            self.closed = True
+            self._changed.notify_all()
+
+    async def get(self) -> Optional[Dict[str, Any]]:
+        async with self._changed:
+            while True:
+                if self.total >= self.start_after or self.closed:
+                    roots = list(self.pending)
+                    for i in range(len(roots)):
+                        root = roots[(self._turn + i) % len(roots)]
+                        if self.pending[root]:
+                            self._turn = (self._turn + i + 1) % len(roots)
+                            return self.pending[root].popleft()
+                    if self.closed:
+                        return None
+                await self._changed.wait()
+
+# ========== STUB NAME VALIDATION ==========
+# Known placeholder names
+PLACEHOLDER_NAMES = {"john smith", "jane doe", "john doe", "jane smith", "john t. smith", "jane m. doe", "test user", "sample professor"}
+
+# Names that are clearly not people (LLM hallucinations)
+NON_PERSON_TERMS = {
+    "digital", "agriculture", "tinnitus", "communications", "network",
+    "committee", "research", "innovation", "advisory", "oversight",
+    "bic", "bil", "bcnn", "roi", "ceo", "cto", "cfo", "vp",
+    "group", "team", "staff", "faculty", "personnel"
+}
+
+# Names that look like organizations/places
+ORGANIZATION_KEYWORDS = [
+    "lab", "center", "institute", "university", "department", "school", 
+    "program", "office", "facility", "college", "services", "administration",
+    "bureau", "reach", "alliance", "consortium", "initiative", "committee",
+    "board", "council", "foundation", "society", "network", "group"
+]
+
+# Administrative (non-research) titles
+ADMIN_TITLES = [
+    "vice chancellor", "chancellor", "provost", "president", "vice president",
+    "dean", "associate dean", "vice dean", "assistant dean",
+    "director", "executive director", "assistant director", "associate director",
+    "coordinator", "manager", "administrator", "specialist", "analyst",
+    "counselor", "advisor", "secretary", "assistant to"
+]
+
 class CrawlerService:
-    def __init__(self):
-        self.supabase = get_supabase_client()
+    def __init__(self, session_cache=None):
+        self.supabase = get_async_supabase_client()
+        self.session_cache = session_cache  # SessionCache of the process serving GET /sessions, if any
+        self.write_buffer = WriteBehindBuffer(self.supabase, on_write=self._on_rows_written)
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         }
         self.llm_service = LLMService()
 
+    async def _on_rows_written(self, session_ids, card_session_ids=None) -> None:
+        # Cached GET /sessions responses are dropped once new rows/status are
+        # written, and new cards are ranked into their users' feeds (status-only
+        # flushes skip that; without card_session_ids every session may have cards)
+        if self.session_cache is not None:
+            await self.session_cache.invalidate(session_ids)
+        card_session_ids = session_ids if card_session_ids is None else card_session_ids
+        if card_session_ids:
+            await get_feed_indexer().index_sessions(card_session_ids)
+
     async def run_session(self, session_id: UUID, root_urls: List[str], log_callback=None, major: str = None, custom_prompt: str = None):
         """
         Two-Phase Intelligent Crawler:
         Phase 1: Discovery - Find professor names and profile URLs quickly
         Phase 2: Investigation - Deep dive into each profile for full details
+                 (starts on the first stubs while discovery is still running)
+
+        The run is traced as nested spans and the trace is stored with the
+        session (served by /sessions/{id}/profile).
         """
-        await self._update_session_status(session_id, "running")
+        trace = SessionTrace(session_id)
+        try:
+            with trace.activate():
+                await self._crawl(session_id, root_urls, log_callback, major, custom_prompt)
+        finally:
+            await save_trace(self.supabase, trace)
+
+    async def _crawl(self, session_id: UUID, root_urls: List[str], log_callback=None, major: str = None, custom_prompt: str = None):
+        # The claim already set status=running
         if log_callback: 
             await log_callback(json.dumps({
                 "type": "phase", 
@@ -36,13 +222,27 @@ class CrawlerService:
                 "message": "Starting intelligent discovery..."
             }))
         
+        # Pages captured by the browser extension are read instead of fetched
+        page_source = ArtifactPageSource(self.supabase, session_id)
+        captured = await page_source.load()
+        if captured and log_callback:
+            await log_callback(json.dumps({
+                "type": "info",
+                "message": f"📎 Using {captured} page(s) captured by the browser extension"
+            }))
+        blocked_urls = []
+        crawled_pages = []  # Content hashes of the pages read, for later refreshes
+        # A job re-run after its worker died or was stopped keeps the cards it already saved
+        saved_professors = await self._saved_professor_keys(session_id)
+        kept_cards = 0
+
         all_cards = []
         visited_urls = set()
-        seen_professors = set()  # Deduplication by name
+        seen_professors = set()  # Deduplication by name (lowercased)
         professor_stubs = []  # Candidates to investigate
         
         MAX_PROFESSORS = 15
-        MAX_DISCOVERY_PAGES = 30  # Increased to allow finding deep directories
+        MIN_CANDIDATES = 3  # Fewer than this after discovery: suggest a better link instead
         TIMEOUT_SECONDS = 180  # More time for deep investigation
         start_time = time.time()
         
@@ -51,406 +251,331 @@ class CrawlerService:
             # ═══════════════════════════════════════════════════════════════
             # PHASE 1: DISCOVERY - Find professors quickly (FAIL FAST)
             # ═══════════════════════════════════════════════════════════════
-            # REDESIGN: Max depth 1 (Shallow), Max 5 pages. Rely on user for good link.
-            discovery_queue = [{"url": url, "depth": 0} for url in root_urls]
+            # Each root (department) is scanned by its own worker, concurrently with
+            # the others but one page at a time per host. Roots get an equal share
+            # of the page budget; what a root leaves unused goes to the others.
+            roots: Dict[str, DiscoveryRoot] = {}
             for url in root_urls:
-                visited_urls.add(url)
+                if url not in visited_urls:
+                    roots[url] = DiscoveryRoot(url)
+                    visited_urls.add(url)
+            # Captured pages the roots don't cover are scanned too (it's why the user captured them),
+            # by the root on the same site if there is one
+            root_keys = {canonical_url(url) for url in root_urls}
+            for url in page_source.urls:
+                if url not in root_keys and url not in visited_urls:
+                    owner = next((r for r in roots.values() if url_host(r.url) == url_host(url)), None)
+                    if owner is None:
+                        owner = roots[url] = DiscoveryRoot(url)
+                    else:
+                        owner.queue.append({"url": url, "depth": 0})
+                    visited_urls.add(url)
             
             pages_scanned = 0
-            MAX_PAGES_FAIL_FAST = 5
-            
-            while discovery_queue and pages_scanned < MAX_PAGES_FAIL_FAST:
-                # ... (time check logic is fine)
-                if time.time() - start_time > TIMEOUT_SECONDS / 2:
-                    break
+            budget = DiscoveryBudget(list(roots), min(DISCOVERY_MAX_PAGES, DISCOVERY_PAGES_PER_ROOT * max(1, len(roots))))
+            # Stubs are investigated as discovery streams them in, round-robin across roots
+            investigation_queue = InvestigationQueue(list(roots), start_after=MIN_CANDIDATES)
+
+            def stub_share() -> int:
+                """Candidates each still-scanning root should find: an equal split of what finished roots left."""
+                left = MAX_PROFESSORS * 2 - sum(r.found for url, r in roots.items() if url not in budget.active)
+                return math.ceil(left / max(1, len(budget.active)))
+            host_locks: Dict[str, asyncio.Semaphore] = {}  # Fetches in flight per host
 
-                current = discovery_queue.pop(0)
+            async def scan_page(root: "DiscoveryRoot", current: Dict[str, Any]) -> bool:
+                """Fetch and analyse one page for `root`; False if it couldn't be fetched."""
+                nonlocal pages_scanned
                 url = current["url"]
                 depth = current["depth"]
-                
-                # REDESIGN: Stop if depth > 1
-                if depth > 1:
-                    continue
-                
-                if log_callback:
-                    await log_callback(json.dumps({
-                        "type": "scanning",
-                        "url": url,
-                        "depth": depth,
-                        "pages_crawled": pages_scanned,
-                        "found": len(professor_stubs)
-                    }))
-                
-                # ... (fetch logic) ...
-                try:
-                    html_content = await self._async_fetch(url)
-                except Exception as e:
+                with span("discovery_page", url=url, depth=depth):
                     if log_callback:
-                        await log_callback(json.dumps({"type": "error", "message": f"Could not access: {url}"}))
-                    continue
-                
-                pages_scanned += 1
-                
-                # Extract potential links first for agentic navigation
-                candidate_links_raw = self._extract_directory_links(html_content, url)
+                        await log_callback(json.dumps({
+                            "type": "scanning",
+                            "url": url,
+                            "root": root.url,
+                            "depth": depth,
+                            "pages_crawled": pages_scanned,
+                            "found": len(professor_stubs)
+                        }))
                 
-                # Quick discovery scan
-                discovery_result = await self.llm_service.discover_professors(
-                    html_content, url, log_callback, major, candidate_links_raw
-                )
+                    # ... (fetch logic) ...
+                    try:
+                        async with host_locks.setdefault(url_host(url), asyncio.Semaphore(DISCOVERY_HOST_CONCURRENCY)):
+                            html_content = await self._fetch_page(url, page_source, blocked_urls)
+                    except Exception as e:
+                        if log_callback:
+                            await log_callback(json.dumps({"type": "error", "message": f"Could not access: {url}"}))
+                        return False
                 
-                # ... (profile extraction log logic is fine) ...
+                    pages_scanned += 1
+                    root.pages += 1
                 
-                # Handle Discovery Result
-                if discovery_result.get("is_profile_page"):
-                     # ... (profile logic is fine) ...
-                     prof_data = await self.llm_service.extract_profile(html_content, url, professor_name="Unknown", on_log=log_callback)
-                     if prof_data and prof_data.get("professor_name") != "Unknown":
-                         professor_stubs.append({"name": prof_data["professor_name"], "profile_url": url, "full_data": prof_data})
+                    # Extract potential links first for agentic navigation
+                    candidate_links_raw = self._extract_directory_links(html_content, url)
                 
-                else:
-                    # Directory page - collect stubs
-                    found_profs = discovery_result.get("professors", [])
-                    
-                    if log_callback and found_profs:
-                         await log_callback(json.dumps({"type": "discovery", "count": len(found_profs)}))
-                    
-                    # Store found professors
-                    seen_professors = set(p["name"].lower() for p in professor_stubs)
-                    
-                    for prof in found_profs:
-                        name = prof.get("name", "").strip()
-                        title = prof.get("title", "").strip().lower()
-                        
-                        if not name or name.lower() == "unknown":
-                            continue
-                        
-                        # ========== NAME VALIDATION ==========
-                        # Must look like a real human name (first + last name minimum)
-                        name_parts = name.split()
-                        if len(name_parts) < 2:
-                            continue
-                        
-                        # Reject known placeholder names
-                        placeholder_names = ["john smith", "jane doe", "john doe", "jane smith", "john t. smith", "jane m. doe", "test user", "sample professor"]
-                        if name.lower() in placeholder_names:
-                            continue
-                        
-                        # Reject names that are clearly not people (LLM hallucinations)
-                        non_person_terms = [
-                            "digital", "agriculture", "tinnitus", "communications", "network",
-                            "committee", "research", "innovation", "advisory", "oversight",
-                            "bic", "bil", "bcnn", "roi", "ceo", "cto", "cfo", "vp",
-                            "group", "team", "staff", "faculty", "personnel"
-                        ]
-                        if name.lower() in non_person_terms or any(term == name.lower() for term in non_person_terms):
-                            continue
-                        
-                        # Safety Filter: Reject names that look like organizations/places
-                        bad_keywords = [
-                            "lab", "center", "institute", "university", "department", "school", 
-                            "program", "office", "facility", "college", "services", "administration",
-                            "bureau", "reach", "alliance", "consortium", "initiative", "committee",
-                            "board", "council", "foundation", "society", "network", "group"
-                        ]
-                        if any(k in name.lower() for k in bad_keywords):
-                            continue
-                        
-                        # Safety Filter: Reject administrative titles
-                        admin_titles = [
-                            "vice chancellor", "chancellor", "provost", "president", "vice president",
-                            "dean", "associate dean", "vice dean", "assistant dean",
-                            "director", "executive director", "assistant director", "associate director",
-                            "coordinator", "manager", "administrator", "specialist", "analyst",
-                            "counselor", "advisor", "secretary", "assistant to"
-                        ]
-                        if any(admin in title for admin in admin_titles):
-                            continue
+                    # Quick discovery scan (streamed: stubs are validated and
+                    # queued as soon as each professor element is generated)
+                    streamed_count = 0
+
+                    async def on_professor(prof, source_url=url):
+                        """Returns False if the name filter rejected the professor."""
+                        nonlocal streamed_count
+                        if isinstance(prof, dict) and (prof.get("name") or "").strip().lower() in seen_professors:
+                            return True  # Already queued
+                        stub = self._build_stub(prof, source_url, seen_professors)
+                        if not stub:
+                            return False
+                        streamed_count += 1
+                        stub["root"] = root.url
+                        root.found += 1
+                        professor_stubs.append(stub)
+                        await investigation_queue.put(stub)
 
-                        if name.lower() in seen_professors:
-                            continue
-                        seen_professors.add(name.lower())
-                        
-                        profile_url = prof.get("profile_url")
-                        
-                        # Resolve relative URLs
-                        if profile_url and not profile_url.startswith("http"):
-                            profile_url = requests.compat.urljoin(url, profile_url)
-                        
-                        # Skip if profile URL is same as current page (no unique profile found)
-                        if profile_url and profile_url == url:
-                            profile_url = None
-                        
-                        # Add professor stub
-                        professor_stubs.append({
-                            "name": name,
-                            "profile_url": profile_url,
-                            "source_url": url,
-                            "title": prof.get("title"),
-                            "email": prof.get("email"),
-                            "snippet": prof.get("snippet")
-                        })
-                        
                         if log_callback:
+                            profile_url = stub["profile_url"]
                             await log_callback(json.dumps({
                                 "type": "info",
-                                "message": f"📋 Found: {name}" + (f" ({profile_url[:40]}...)" if profile_url else " (no profile link)")
+                                "message": f"📋 Found: {stub['name']}" + (f" ({profile_url[:40]}...)" if profile_url else " (no profile link)")
                             }))
+                        return True
+
+                    discovery_result = await self.llm_service.discover_professors(
+                        html_content, url, log_callback, major, candidate_links_raw,
+                        on_professor=on_professor, accept_professor=self._is_valid_professor
+                    )
+                
+                    # ... (profile extraction log logic is fine) ...
                 
+                    # Handle Discovery Result
+                    if discovery_result.get("is_profile_page"):
+                         # ... (profile logic is fine) ...
+                         prof_data = await self.llm_service.extract_profile(html_content, url, professor_name="Unknown", on_log=log_callback)
+                         if prof_data and prof_data.get("professor_name") != "Unknown":
+                             name = prof_data["professor_name"]
+                             if name.strip().lower() not in seen_professors:
+                                 seen_professors.add(name.strip().lower())
+                                 stub = {"name": name, "profile_url": url, "full_data": prof_data, "root": root.url}
+                                 professor_stubs.append(stub)
+                                 root.found += 1
+                                 await investigation_queue.put(stub)
+                             crawled_pages.append(page_record(url, "profile", html_content, professor=name))
                 
-                # NAVIGATION: Use heuristic-based link extraction (fast, no LLM needed)
-                # REDESIGN: Only depth 0 allowed (Shallow Discovery)
-                if depth == 0:
-                    new_links = self._extract_directory_links(html_content, url)
-                    added_links = 0
-                    for link in new_links[:8]:  # Take top 8 highest-priority links
-                        if link not in visited_urls:
-                            visited_urls.add(link)
-                            discovery_queue.append({"url": link, "depth": depth + 1})
-                            added_links += 1
+                    else:
+                        # Directory page - pick up anything the stream did not deliver
+                        # (e.g. non-streamed fallback); duplicates are skipped by name
+                        for prof in discovery_result.get("professors", []):
+                            await on_professor(prof)
+                        crawled_pages.append(page_record(url, "directory", html_content, professors=[
+                            stub_summary(s) for s in professor_stubs if s.get("source_url") == url
+                        ]))
                     
-                    if added_links > 0 and log_callback:
-                        await log_callback(json.dumps({
-                            "type": "info",
-                            "message": f"🔗 Found {added_links} faculty directory links to explore"
-                        }))
+                        if log_callback and streamed_count:
+                             await log_callback(json.dumps({"type": "discovery", "count": streamed_count}))
                 
-                # Stop if we have enough candidates
-                if len(professor_stubs) >= MAX_PROFESSORS * 2:
-                    break
-            
-            # ═══════════════════════════════════════════════════════════════
-            # FAIL FAST CHECK
-            # ═══════════════════════════════════════════════════════════════
-            if len(professor_stubs) < 3:
-                msg = f"Only found {len(professor_stubs)} potential candidates. Please provide a direct link to the 'Faculty Directory'."
-                if log_callback:
-                    await log_callback(json.dumps({
-                        "type": "suggestion", 
-                        "title": "Low Yield Warning",
-                        "message": msg
-                    }))
                 
-                # Abort session
-                await self._update_session_status(session_id, "error", blocked_reason=msg)
-                return
-            
-            if log_callback:
-                await log_callback(json.dumps({
-                    "type": "phase",
-                    "phase": "investigation",
-                    "message": f"Discovery complete. Investigating {min(len(professor_stubs), MAX_PROFESSORS)} professors..."
-                }))
-            
+                    # NAVIGATION: Use heuristic-based link extraction (fast, no LLM needed)
+                    # REDESIGN: Only depth 0 allowed (Shallow Discovery)
+                    if depth == 0:
+                        new_links = self._extract_directory_links(html_content, url)
+                        added_links = 0
+                        for link in new_links[:8]:  # Take top 8 highest-priority links
+                            if link not in visited_urls:
+                                visited_urls.add(link)
+                                root.queue.append({"url": link, "depth": depth + 1})
+                                added_links += 1
+                    
+                        if added_links > 0 and log_callback:
+                            await log_callback(json.dumps({
+                                "type": "info",
+                                "message": f"🔗 Found {added_links} faculty directory links to explore"
+                            }))
+                return True
+
+            async def discover_root(root: "DiscoveryRoot") -> None:
+                try:
+                    while root.queue:
+                        # Enough candidates (this root's share, or overall), or out of time
+                        if root.found >= stub_share() or len(professor_stubs) >= MAX_PROFESSORS * 2:
+                            root.status = "enough"
+                            break
+                        if time.time() - start_time > TIMEOUT_SECONDS / 2:
+                            root.status = "timeout"
+                            break
+                        current = root.queue.pop(0)
+                        # REDESIGN: Stop if depth > 1
+                        if current["depth"] > 1:
+                            continue
+                        if not await budget.take(root.url):
+                            root.status = "budget"
+                            break
+                        if not await scan_page(root, current):
+                            await budget.give_back(root.url)  # Only pages actually read count
+                except Exception as e:
+                    # One department failing doesn't stop the others
+                    logger.error(f"Discovery failed for {root.url}: {e}")
+                    root.status = "error"
+                    if log_callback:
+                        await log_callback(json.dumps({"type": "error", "message": f"Discovery failed for {root.url}: {e}"}))
+                finally:
+                    await budget.release(root.url)
+                if log_callback:
+                    await log_callback(json.dumps({"type": "root_done", **root.report()}))
+
             # ═══════════════════════════════════════════════════════════════
             # PHASE 2: INVESTIGATION - Deep dive into each professor
             # ═══════════════════════════════════════════════════════════════
-            
-            for i, stub in enumerate(professor_stubs[:MAX_PROFESSORS]):
-                if time.time() - start_time > TIMEOUT_SECONDS:
-                    if log_callback:
+            # Investigators take stubs from the queue while discovery is still
+            # running, so the first cards arrive before every root is scanned
+            investigated = 0
+            time_limit_logged = False
+
+            async def investigate_stubs() -> None:
+                nonlocal investigated, pages_scanned, time_limit_logged, kept_cards
+                while True:
+                    stub = await investigation_queue.get()
+                    if stub is None or investigated >= MAX_PROFESSORS:
+                        return
+                    if professor_key(stub["name"]) in saved_professors:
+                        investigated += 1
+                        kept_cards += 1
+                        if log_callback:
+                            await log_callback(json.dumps({"type": "info", "message": f"✅ Already saved: {stub['name']}"}))
+                        continue
+                    if time.time() - start_time > TIMEOUT_SECONDS:
+                        if log_callback and not time_limit_logged:
+                            time_limit_logged = True
+                            await log_callback(json.dumps({
+                                "type": "info",
+                                "message": "Time limit reached. Saving collected data..."
+                            }))
+                        return
+                    investigated += 1
+                    if investigated == 1 and log_callback:
                         await log_callback(json.dumps({
-                            "type": "info",
-                            "message": "Time limit reached. Saving collected data..."
+                            "type": "phase",
+                            "phase": "investigation",
+                            "message": f"Investigating up to {MAX_PROFESSORS} professors as they are found..."
                         }))
-                    break
-                
-                name = stub["name"]
-                profile_url = stub.get("profile_url")
-                
-                if log_callback:
-                    await log_callback(json.dumps({
-                        "type": "investigating",
-                        "name": name,
-                        "step": "profile",
-                        "progress": f"{i+1}/{min(len(professor_stubs), MAX_PROFESSORS)}",
-                        "message": f"🔍 Investigating: {name} ({(profile_url or '')[:30]}...)"
-                    }))
-                
-                # If we already have full data from discovery phase
-                if stub.get("full_data"):
-                    prof_data = stub["full_data"]
-                elif profile_url and profile_url not in visited_urls:
-                    visited_urls.add(profile_url)
-                    
-                    try:
-                        html_content = await self._async_fetch(profile_url)
-                        
+
+                    with span("investigate", professor=stub["name"]):
+                        name = stub["name"]
+                        profile_url = stub.get("profile_url")
+
                         if log_callback:
                             await log_callback(json.dumps({
-                                "type": "scanning",
-                                "url": profile_url,
-                                "depth": 1,
-                                "pages_crawled": pages_scanned,
-                                "found": len(all_cards)
+                                "type": "investigating",
+                                "name": name,
+                                "step": "profile",
+                                "progress": f"{investigated}/{min(investigation_queue.total, MAX_PROFESSORS)}",
+                                "message": f"🔍 Investigating: {name} ({(profile_url or '')[:30]}...)"
                             }))
-                        
-                        pages_scanned += 1
-                        
-                        # Deep extraction - Unified Method
-                        user_search_context = custom_prompt or f"Research in {major}" if major else None
-                        
-                        prof_data = await self.llm_service.extract_profile(
-                            html_content, 
-                            profile_url, 
-                            name, 
-                            log_callback,
-                            user_prompt=user_search_context
-                        )
-
-                        if prof_data.get("error"):
-                            logger.info(f"Failed to analyze {name}: {prof_data['error']}")
-                            if log_callback:
-                                await log_callback(json.dumps({
-                                    "type": "info",
-                                    "message": f"   → Using directory info (analysis failed: {prof_data['error']})"
-                                }))
-                            # Fallback to simple stub data so we don't lose the professor
-                            prof_data = {"professor_name": name}
-                            profile_url = None
-
-                        
-                    except Exception as e:
-                        logger.warning(f"Failed to fetch profile for {name}: {e}")
-                        prof_data = {"professor_name": name}
-                        profile_url = None
-                else:
-                    # No profile URL, create minimal card from stub
-                    prof_data = {"professor_name": name}
-
-                # MERGE: If deep extraction failed or returned little, use Stub data
-                if not prof_data.get("title") and stub.get("title"):
-                    prof_data["title"] = stub["title"]
-                if not prof_data.get("summary") and stub.get("snippet"):
-                    prof_data["summary"] = stub["snippet"]
-                if not prof_data.get("school") and "illinois" in (profile_url or "").lower():
-                    prof_data["school"] = "University of Illinois Urbana-Champaign"
-                
-                # Resolve any relative URLs in links
-                resolved_links = []
-                base_url = profile_url or stub.get("source_url", "")
-                for link_obj in prof_data.get("links", []):
-                    if isinstance(link_obj, dict) and link_obj.get("url"):
-                        link_url = link_obj["url"]
-                        if not link_url.startswith("http"):
-                            link_url = requests.compat.urljoin(base_url, link_url)
-                        resolved_links.append({
-                            "label": link_obj.get("label", "Link"),
-                            "url": link_url
-                        })
-                
-                # ═══════════════════════════════════════════════════════════════
-                # DEEP INVESTIGATION: Visit Lab/Personal Website if found
-                # ═══════════════════════════════════════════════════════════════
-                external_url = None
-                for link in resolved_links:
-                    label = link.get("label", "").lower()
-                    if "lab" in label or "personal" in label or "research group" in label or "homepage" in label:
-                        # Validate it's not the same as profile_url
-                        if link["url"] != profile_url and "scholar.google" not in link["url"]:
-                            external_url = link["url"]
-                            break
-                
-                if external_url and log_callback:
-                    await log_callback(json.dumps({
-                        "type": "info",
-                        "message": f"🕵️ Deep Dive: Investigating external site: {external_url}"
-                    }))
-                    
-                    try:
-                        # Fetch external site
-                        external_html = await self._async_fetch(external_url)
-                        
-                        # Combine contexts: Profile + External Site
-                        combined_content = html_content + "\n\n<!-- ================= EXTERNAL LAB WEBSITE CONTENT ================= -->\n\n" + external_html
-                        
-                        # Re-extract with richer context
-                        deep_data = await self.llm_service.extract_profile(
-                            combined_content, 
-                            url, # Keep original URL as primary ID 
-                            name, 
-                            log_callback,
-                            user_prompt=user_search_context
-                        )
-                        
-                        if deep_data and not deep_data.get("error"):
-                            # Merge deep data into prof_data
-                            # Prefer deep data for summary, keywords, and extra links
-                            if deep_data.get("summary") and len(deep_data["summary"]) > len(prof_data.get("summary", "")):
-                                prof_data["summary"] = deep_data["summary"]
-                            
-                            prof_data["keywords"] = list(set(prof_data.get("keywords", []) + deep_data.get("keywords", [])))
-                            
-                            # Add new links found on lab site
-                            for new_link in deep_data.get("links", []):
-                                if isinstance(new_link, dict) and new_link.get("url"):
-                                    # Check duplicates
-                                    if not any(l["url"] == new_link["url"] for l in resolved_links):
-                                        resolved_links.append(new_link)
-                            
-                            if log_callback:
-                                await log_callback(json.dumps({
-                                    "type": "info",
-                                    "message": "   ✅ Deep investigation successful. Updated profile data."
-                                }))
-                                
-                    except Exception as e:
-                        logger.warning(f"Deep investigation failed for {external_url}: {e}")
+
+                        html_content = None
+                        if not stub.get("full_data") and profile_url and profile_url not in visited_urls:
+                            visited_urls.add(profile_url)
+                            try:
+                                html_content = await self._fetch_page(profile_url, page_source, blocked_urls)
+
+                                if log_callback:
+                                    await log_callback(json.dumps({
+                                        "type": "scanning",
+                                        "url": profile_url,
+                                        "depth": 1,
+                                        "pages_crawled": pages_scanned,
+                                        "found": len(all_cards)
+                                    }))
+
+                                pages_scanned += 1
+                                crawled_pages.append(page_record(profile_url, "profile", html_content, professor=name))
+                            except Exception as e:
+                                logger.warning(f"Failed to fetch profile for {name}: {e}")
+                                stub = {**stub, "profile_url": None}
+
+                        card = await self._investigate(session_id, stub, html_content, page_source, blocked_urls,
+                                                       log_callback, major, custom_prompt)
+                        key = professor_key(card.professor_name)
+                        if key in saved_professors:
+                            continue  # Same professor under another name, already carded
+                        if key:
+                            saved_professors.add(key)
+                        await self._save_card(session_id, card)
+                        all_cards.append(card)
+
                         if log_callback:
                             await log_callback(json.dumps({
-                                "type": "info", 
-                                "message": f"   ⚠️ Could not access external site: {str(e)[:50]}"
+                                "type": "found_card",
+                                "name": card.professor_name,
+                                "department": card.department or "Unknown",
+                                "title": card.title or "",
+                                "links_count": len(card.links),
+                                "summary": (card.summary or "")[:100]
                             }))
 
-                # Log links found
-                if log_callback and resolved_links:
-                    labels = [l["label"] for l in resolved_links[:4]]
-                    await log_callback(json.dumps({
-                        "type": "info",
-                        "message": f"   → Found links: {', '.join(labels)}"
-                    }))
-                
-                # Create and save card
-                card = ProfessorCardResponse(
-                    session_id=session_id,
-                    professor_name=prof_data.get("professor_name", name),
-                    title=prof_data.get("title"),
-                    department=prof_data.get("department"),
-                    school=prof_data.get("school"),
-                    primary_url=profile_url or stub.get("source_url"),
-                    links=resolved_links,
-                    summary=prof_data.get("summary"),
-                    keywords=prof_data.get("keywords", []),
-                    match_score=prof_data.get("match_score", 0.0)
-                )
-                
-                self._save_card(session_id, card)
-                all_cards.append(card)
-                
-                if log_callback:
+                    # Small delay to avoid rate limits
+                    await asyncio.sleep(PROFESSOR_DELAY_SECONDS)
+
+            investigators = [asyncio.create_task(investigate_stubs()) for _ in range(max(1, INVESTIGATION_CONCURRENCY))]
+            try:
+                await asyncio.gather(*(discover_root(root) for root in roots.values()))
+                if log_callback and len(roots) > 1:
                     await log_callback(json.dumps({
-                        "type": "found_card",
-                        "name": card.professor_name,
-                        "department": card.department or "Unknown",
-                        "title": card.title or "",
-                        "links_count": len(card.links),
-                        "summary": (card.summary or "")[:100]
+                        "type": "discovery_summary",
+                        "roots": [root.report() for root in roots.values()],
+                        "pages_crawled": pages_scanned,
+                        "found": len(professor_stubs)
                     }))
-                
-                # Small delay to avoid rate limits
-                await asyncio.sleep(0.5)
+
+                # ═══════════════════════════════════════════════════════════════
+                # FAIL FAST CHECK (investigation hasn't started below MIN_CANDIDATES)
+                # ═══════════════════════════════════════════════════════════════
+                if len(professor_stubs) < MIN_CANDIDATES and blocked_urls:
+                    # Not the link's fault: the site refused us. Wait for a browser capture
+                    if log_callback:
+                        await log_callback(json.dumps({
+                            "type": "suggestion",
+                            "title": "Site Blocked",
+                            "message": BLOCKED_MESSAGE,
+                            "url": blocked_urls[0]
+                        }))
+                    await self._update_session_status(session_id, "blocked", blocked_reason=BLOCKED_MESSAGE, blocked_url=blocked_urls[0])
+                    return
+
+                if len(professor_stubs) < MIN_CANDIDATES:
+                    msg = f"Only found {len(professor_stubs)} potential candidates. Please provide a direct link to the 'Faculty Directory'."
+                    if log_callback:
+                        await log_callback(json.dumps({
+                            "type": "suggestion", 
+                            "title": "Low Yield Warning",
+                            "message": msg
+                        }))
+
+                    # Abort session
+                    await self._update_session_status(session_id, "error", blocked_reason=msg)
+                    return
+
+                await investigation_queue.close()
+                await asyncio.gather(*investigators)
+            finally:
+                for task in investigators:
+                    task.cancel()
             
             # ═══════════════════════════════════════════════════════════════
             # COMPLETE
             # ═══════════════════════════════════════════════════════════════
+            await save_crawl_pages(self.supabase, session_id, crawled_pages)
+            self.write_buffer.defer_status(str(session_id), {"refreshed_at": datetime.now(timezone.utc).isoformat()})
             await self._update_session_status(session_id, "done")
             
             if log_callback:
+                await log_callback(json.dumps({
+                    "type": "llm_usage",
+                    "usage": self.llm_service.get_usage_report()
+                }))
                 await log_callback(json.dumps({
                     "type": "complete",
-                    "total_cards": len(all_cards),
+                    "total_cards": len(all_cards) + kept_cards,
                     "pages_crawled": pages_scanned,
-                    "message": f"Investigation complete! Found {len(all_cards)} professors."
+                    "message": f"Investigation complete! Found {len(all_cards) + kept_cards} professors."
                 }))
             
             # Send suggestions via log_callback instead of yield
@@ -474,6 +599,244 @@ class CrawlerService:
             if log_callback:
                 await log_callback(json.dumps({"type": "error", "message": str(e)}))
 
+    async def _investigate(self, session_id: UUID, stub: Dict[str, Any], html_content: Optional[str],
+                           page_source: Optional[ArtifactPageSource], blocked_urls: List[str],
+                           log_callback=None, major: str = None, custom_prompt: str = None) -> ProfessorCardResponse:
+        """
+        Build a professor's card from a discovery stub and their fetched profile
+        page (None if there is none), visiting their lab site if one is linked.
+        """
+        name = stub["name"]
+        profile_url = stub.get("profile_url")
+        user_search_context = custom_prompt or f"Research in {major}" if major else None
+
+        # If we already have full data from discovery phase
+        if stub.get("full_data"):
+            prof_data = dict(stub["full_data"])
+        elif html_content is not None:
+            try:
+                # Deep extraction - Unified Method
+                prof_data = await self.llm_service.extract_profile(
+                    html_content, 
+                    profile_url, 
+                    name, 
+                    log_callback,
+                    user_prompt=user_search_context
+                )
+            except Exception as e:
+                logger.warning(f"Failed to analyze profile for {name}: {e}")
+                prof_data = {"error": str(e)}
+
+            if prof_data.get("error"):
+                logger.info(f"Failed to analyze {name}: {prof_data['error']}")
+                if log_callback:
+                    await log_callback(json.dumps({
+                        "type": "info",
+                        "message": f"   → Using directory info (analysis failed: {prof_data['error']})"
+                    }))
+                # Fallback to simple stub data so we don't lose the professor
+                prof_data = {"professor_name": name}
+                profile_url = None
+        else:
+            # No profile page, create minimal card from stub
+            prof_data = {"professor_name": name}
+
+        # MERGE: If deep extraction failed or returned little, use Stub data
+        if not prof_data.get("title") and stub.get("title"):
+            prof_data["title"] = stub["title"]
+        if not prof_data.get("summary") and stub.get("snippet"):
+            prof_data["summary"] = stub["snippet"]
+        if not prof_data.get("school") and "illinois" in (profile_url or "").lower():
+            prof_data["school"] = "University of Illinois Urbana-Champaign"
+    
+        # Resolve any relative URLs in links
+        resolved_links = []
+        base_url = profile_url or stub.get("source_url", "")
+        for link_obj in prof_data.get("links", []):
+            if isinstance(link_obj, dict) and link_obj.get("url"):
+                link_url = link_obj["url"]
+                if not link_url.startswith("http"):
+                    link_url = requests.compat.urljoin(base_url, link_url)
+                resolved_links.append({
+                    "label": link_obj.get("label", "Link"),
+                    "url": link_url
+                })
+    
+        # ═══════════════════════════════════════════════════════════════
+        # DEEP INVESTIGATION: Visit Lab/Personal Website if found
+        # ═══════════════════════════════════════════════════════════════
+        external_url = None
+        for link in resolved_links:
+            label = link.get("label", "").lower()
+            if "lab" in label or "personal" in label or "research group" in label or "homepage" in label:
+                # Validate it's not the same as profile_url
+                if link["url"] != profile_url and "scholar.google" not in link["url"]:
+                    external_url = link["url"]
+                    break
+    
+        if external_url and log_callback:
+            await log_callback(json.dumps({
+                "type": "info",
+                "message": f"🕵️ Deep Dive: Investigating external site: {external_url}"
+            }))
+        
+            with span("deep_dive", url=external_url):
+                try:
+                    # Fetch external site
+                    external_html = await self._fetch_page(external_url, page_source, blocked_urls)
+            
+                    # Combine contexts: Profile + External Site
+                    combined_content = (html_content or "") + "\n\n<!-- ================= EXTERNAL LAB WEBSITE CONTENT ================= -->\n\n" + external_html
+            
+                    # Re-extract with richer context
+                    deep_data = await self.llm_service.extract_profile(
+                        combined_content, 
+                        profile_url or stub.get("source_url", ""),
+                        name, 
+                        log_callback,
+                        user_prompt=user_search_context
+                    )
+            
+                    if deep_data and not deep_data.get("error"):
+                        # Merge deep data into prof_data
+                        # Prefer deep data for summary, keywords, and extra links
+                        if deep_data.get("summary") and len(deep_data["summary"]) > len(prof_data.get("summary", "")):
+                            prof_data["summary"] = deep_data["summary"]
+                
+                        prof_data["keywords"] = list(set(prof_data.get("keywords", []) + deep_data.get("keywords", [])))
+                
+                        # Add new links found on lab site
+                        for new_link in deep_data.get("links", []):
+                            if isinstance(new_link, dict) and new_link.get("url"):
+                                # Check duplicates
+                                if not any(l["url"] == new_link["url"] for l in resolved_links):
+                                    resolved_links.append(new_link)
+                
+                        if log_callback:
+                            await log_callback(json.dumps({
+                                "type": "info",
+                                "message": "   ✅ Deep investigation successful. Updated profile data."
+                            }))
+                    
+                except Exception as e:
+                    logger.warning(f"Deep investigation failed for {external_url}: {e}")
+                    if log_callback:
+                        await log_callback(json.dumps({
+                            "type": "info", 
+                            "message": f"   ⚠️ Could not access external site: {str(e)[:50]}"
+                        }))
+
+        # Log links found
+        if log_callback and resolved_links:
+            labels = [l["label"] for l in resolved_links[:4]]
+            await log_callback(json.dumps({
+                "type": "info",
+                "message": f"   → Found links: {', '.join(labels)}"
+            }))
+    
+        # Create the card
+        card = ProfessorCardResponse(
+            session_id=session_id,
+            professor_name=prof_data.get("professor_name", name),
+            title=prof_data.get("title"),
+            department=prof_data.get("department"),
+            school=prof_data.get("school"),
+            primary_url=profile_url or stub.get("source_url"),
+            links=resolved_links,
+            summary=prof_data.get("summary"),
+            keywords=prof_data.get("keywords", []),
+            match_score=prof_data.get("match_score", 0.0)
+        )
+        return card
+
+    def _is_valid_professor(self, prof: Dict[str, Any]) -> bool:
+        """Name filter for a discovered professor (no side effects, duplicates are not checked)."""
+        if not isinstance(prof, dict):
+            return False
+
+        name = (prof.get("name") or "").strip()
+        title = (prof.get("title") or "").strip().lower()
+        
+        if not name or name.lower() == "unknown":
+            return False
+        
+        # ========== NAME VALIDATION ==========
+        # Must look like a real human name (first + last name minimum)
+        name_parts = name.split()
+        if len(name_parts) < 2:
+            return False
+        
+        # Reject known placeholder names
+        if name.lower() in PLACEHOLDER_NAMES:
+            return False
+        
+        # Reject names that are clearly not people (LLM hallucinations)
+        if name.lower() in NON_PERSON_TERMS:
+            return False
+        
+        # Safety Filter: Reject names that look like organizations/places
+        if any(k in name.lower() for k in ORGANIZATION_KEYWORDS):
+            return False
+        
+        # Safety Filter: Reject administrative titles
+        if any(admin in title for admin in ADMIN_TITLES):
+            return False
+        return True
+
+    def _build_stub(self, prof: Dict[str, Any], source_url: str, seen_professors: set) -> Optional[Dict[str, Any]]:
+        """
+        Validate one discovered professor and turn it into an investigation stub.
+        Returns None for rejected or duplicate names; accepted names are added to
+        `seen_professors`.
+        """
+        if not self._is_valid_professor(prof):
+            return None
+
+        name = prof["name"].strip()
+        if name.lower() in seen_professors:
+            return None
+        seen_professors.add(name.lower())
+        
+        profile_url = prof.get("profile_url")
+        
+        # Resolve relative URLs
+        if profile_url and not profile_url.startswith("http"):
+            profile_url = requests.compat.urljoin(source_url, profile_url)
+        
+        # Skip if profile URL is same as current page (no unique profile found)
+        if profile_url and profile_url == source_url:
+            profile_url = None
+        
+        return {
+            "name": name,
+            "profile_url": profile_url,
+            "source_url": source_url,
+            "title": prof.get("title"),
+            "email": prof.get("email"),
+            "snippet": prof.get("snippet")
+        }
+
+    async def _fetch_page(self, url: str, page_source: Optional[ArtifactPageSource], blocked_urls: List[str] = None) -> str:
+        """A captured copy of the page if the extension sent one, else the network (always, without a page source)."""
+        with span("fetch", url=url) as fetch_span:
+            page = None
+            if page_source is not None:
+                page = await page_source.get(url)
+                cache_result("artifact", page is not None)
+            if page is not None:
+                logger.info(f"Using captured artifact for {url}")
+                fetch_span.set(source="artifact", bytes=len(page))
+                return page
+            fetch_span.set(source="network")
+            try:
+                html = await self._async_fetch(url)
+            except FetchBlocked:
+                if blocked_urls is not None:
+                    blocked_urls.append(url)
+                raise
+            fetch_span.set(bytes=len(html))
+            return html
+
     async def _async_fetch(self, url: str) -> str:
         """Async wrapper for fetching a URL."""
         loop = asyncio.get_event_loop()
@@ -482,7 +845,10 @@ class CrawlerService:
 
     def _extract_directory_links(self, html: str, base_url: str) -> List[str]:
         """Extract links that likely lead to more faculty/directory pages."""
-        soup = BeautifulSoup(html, 'html.parser')
+        from bs4 import BeautifulSoup
+
+        with PARSE_SECONDS.time(stage="links"), span("parse", stage="links"):
+            soup = BeautifulSoup(html, 'html.parser')
         links = []
         
         # HIGH PRIORITY keywords (Faculty directories)
@@ -534,17 +900,33 @@ class CrawlerService:
             if base_url.split('/')[2] in full_url:  # Same domain
                 links.append((priority, full_url))
         
-        # Sort by priority (highest first) and deduplicate
-        links = sorted(set(links), key=lambda x: -x[0])
-        return [url for _, url in links]
+        # Deduplicate keeping each URL's best priority, then sort by priority
+        # (highest first); the sort is stable, so ties stay in page order
+        best = {}
+        for priority, url in links:
+            best[url] = max(priority, best.get(url, 0))
+        return sorted(best, key=lambda url: -best[url])
 
     def _fetch(self, url: str):
-        response = requests.get(url, headers=self.headers, timeout=10)
+        host = url_host(url)
+        with FETCH_SECONDS.time(host=host):
+            response = requests.get(url, headers=self.headers, timeout=10)
         if response.status_code in [403, 429]:
-            raise Exception(f"HTTP {response.status_code}")
+            FETCH_BLOCKED.inc(host=host, status=str(response.status_code))
+            raise FetchBlocked(f"HTTP {response.status_code}")
         return response
 
-    def _save_card(self, session_id: UUID, card: ProfessorCardResponse):
+    async def _saved_professor_keys(self, session_id: UUID) -> set:
+        """professor_key of every live card the session already has (empty for a first run)."""
+        try:
+            res = await self.supabase.table("professor_cards").select("professor_name") \
+                .eq("session_id", str(session_id)).is_("retired_at", None).execute()
+        except Exception as e:
+            logger.warning(f"Could not load saved cards for session {session_id}: {e}")
+            return set()
+        return {professor_key(r.get("professor_name")) for r in res.data or []} - {""}
+
+    async def _save_card(self, session_id: UUID, card: ProfessorCardResponse):
         try:
             data = card.model_dump(exclude={"id", "created_at"}, exclude_none=True)
             data["session_id"] = str(session_id)
@@ -553,7 +935,9 @@ class CrawlerService:
                 data["links"] = data["links"]
             
             logging.info(f"Saving card {card.professor_name} (Links: {len(data.get('links', []))})")
-            self.supabase.table("professor_cards").insert(data).execute()
+            # Buffered: written in bulk on the next size/time flush
+            with span("card_save", professor=card.professor_name):
+                await self.write_buffer.add(data)
             
         except Exception as e:
             logger.error(f"Failed to save card to DB: {e}")
@@ -566,7 +950,11 @@ class CrawlerService:
             if blocked_url:
                 data["blocked_url"] = blocked_url
             
-            self.supabase.table("scrape_sessions").update(data).eq("id", str(session_id)).execute()
+            if status in FINAL_STATUSES:
+                # Flushes this session's buffered cards before the status lands
+                await self.write_buffer.write_status(str(session_id), data)
+            else:
+                self.write_buffer.defer_status(str(session_id), data)
             logger.info(f"Session {session_id} updated: {status}")
         except Exception as e:
             logger.error(f"Failed to update session status: {e}")
@@ -0,0 +1,256 @@
+import asyncio
+import json
+import logging
+import os
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# memory:// (default, single process), redis://..., or postgresql://... (LISTEN/NOTIFY)
+EVENT_BROKER_URL = os.environ.get("EVENT_BROKER_URL", "memory://")
+# Recent events kept per session (where the backend supports it) for clients
+# that attach on a worker other than the one running the crawl
+BROKER_BACKLOG = int(os.environ.get("EVENT_BROKER_BACKLOG", "500"))
+BROKER_BACKLOG_TTL = int(os.environ.get("EVENT_BROKER_BACKLOG_TTL", "3600"))
+
+# NOTIFY payloads are capped at 8000 bytes by Postgres
+PG_NOTIFY_MAX_BYTES = 7900
+
+
+def encode_event(event_id: int, event_type: str, data: str) -> str:
+    return json.dumps({"id": event_id, "type": event_type, "data": data})
+
+
+def decode_event(raw) -> Optional[dict]:
+    if isinstance(raw, bytes):
+        raw = raw.decode()
+    try:
+        event = json.loads(raw)
+        return event if isinstance(event, dict) and "id" in event else None
+    except (json.JSONDecodeError, TypeError):
+        return None
+
+
+class Subscription:
+    """Live subscription to one session channel: `async for raw in sub`, then `await sub.aclose()`."""
+
+    def __init__(self, receive: Callable[[], Awaitable[str]], close: Callable[[], Awaitable[None]]):
+        self._receive = receive
+        self._close = close
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        return await self._receive()
+
+    async def aclose(self) -> None:
+        await self._close()
+
+
+class SessionEventBroker:
+    """
+    Pub/sub transport for session events between API workers.
+
+    The worker running a crawl publishes every event (already numbered by its
+    SessionEventBus) on the session's channel; any worker serving a stream for
+    that session subscribes and mirrors the events into a local bus, so event
+    ids and Last-Event-ID resume work the same on every worker.
+    """
+
+    name = "base"
+    shared = True  # reaches other processes, so mirroring a remote crawl can work
+
+    async def publish(self, session_id: str, message: str, backlog: bool = True) -> None:
+        """Send to the session's channel; backlog=False skips the replay backlog (e.g. control messages)."""
+        raise NotImplementedError
+
+    async def subscribe(self, session_id: str) -> "Subscription":
+        """Start listening on the session's channel; events published after this returns are delivered."""
+        raise NotImplementedError
+
+    async def backlog(self, session_id: str) -> List[str]:
+        """Recently published events for the session, oldest first (may be empty)."""
+        return []
+
+    async def close(self) -> None:
+        pass
+
+
+class InMemoryBroker(SessionEventBroker):
+    """
+    Single-process broker (default, and for tests). No backlog: in one process
+    the crawl's own bus already holds the replay ring. Pass shared=True when
+    several registries in one process stand in for separate workers.
+    """
+
+    name = "memory"
+
+    def __init__(self, shared: bool = False):
+        self.shared = shared
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+
+    async def publish(self, session_id: str, message: str, backlog: bool = True) -> None:
+        session_id = str(session_id)
+        for queue in list(self._subscribers.get(session_id, ())):
+            queue.put_nowait(message)
+
+    async def subscribe(self, session_id: str) -> "Subscription":
+        session_id = str(session_id)
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers[session_id].add(queue)
+
+        async def close():
+            self._subscribers[session_id].discard(queue)
+            if not self._subscribers[session_id]:
+                del self._subscribers[session_id]
+
+        return Subscription(queue.get, close)
+
+
+class RedisBroker(SessionEventBroker):
+    """Redis PUBLISH/SUBSCRIBE, plus a capped list per session for late subscribers."""
+
+    name = "redis"
+
+    def __init__(self, url: str, backlog: int = BROKER_BACKLOG, backlog_ttl: int = BROKER_BACKLOG_TTL):
+        import redis.asyncio as redis_asyncio
+        self._redis = redis_asyncio.from_url(url)
+        self.backlog_size = backlog
+        self.backlog_ttl = backlog_ttl
+
+    @staticmethod
+    def _channel(session_id: str) -> str:
+        return f"labmatch:events:{session_id}"
+
+    @staticmethod
+    def _backlog_key(session_id: str) -> str:
+        return f"labmatch:events:{session_id}:backlog"
+
+    async def publish(self, session_id: str, message: str, backlog: bool = True) -> None:
+        key = self._backlog_key(session_id)
+        async with self._redis.pipeline(transaction=False) as pipe:
+            if backlog:
+                pipe.rpush(key, message)
+                pipe.ltrim(key, -self.backlog_size, -1)
+                pipe.expire(key, self.backlog_ttl)
+            pipe.publish(self._channel(session_id), message)
+            await pipe.execute()
+
+    async def subscribe(self, session_id: str) -> "Subscription":
+        channel = self._channel(session_id)
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(channel)
+
+        async def receive():
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message and message.get("type") == "message":
+                    data = message["data"]
+                    return data.decode() if isinstance(data, bytes) else data
+
+        async def close():
+            await pubsub.unsubscribe(channel)
+            await pubsub.aclose()
+
+        return Subscription(receive, close)
+
+    async def backlog(self, session_id: str) -> List[str]:
+        raw = await self._redis.lrange(self._backlog_key(session_id), 0, -1)
+        return [r.decode() if isinstance(r, bytes) else r for r in raw]
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+class PostgresBroker(SessionEventBroker):
+    """
+    Postgres LISTEN/NOTIFY via asyncpg. No backlog: a client attaching on a
+    non-crawling worker sees events from the moment it subscribes (the bus
+    reports the missed range as a gap).
+    """
+
+    name = "postgres"
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self._publish_conn = None
+        self._listen_conn = None
+        self._conn_lock = asyncio.Lock()
+        self._publish_lock = asyncio.Lock()
+        self._queues: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+
+    @staticmethod
+    def _channel(session_id: str) -> str:
+        # Identifiers are limited to 63 bytes; a hex uuid keeps this at 41
+        return "labmatch_" + str(session_id).replace("-", "")
+
+    async def _connect(self):
+        import asyncpg
+        return await asyncpg.connect(self.dsn)
+
+    async def publish(self, session_id: str, message: str, backlog: bool = True) -> None:
+        if len(message.encode()) > PG_NOTIFY_MAX_BYTES:
+            logger.warning(f"Dropping {len(message)}-byte event for {session_id}: exceeds NOTIFY payload limit")
+            return
+        async with self._publish_lock:
+            if self._publish_conn is None or self._publish_conn.is_closed():
+                self._publish_conn = await self._connect()
+            await self._publish_conn.execute("SELECT pg_notify($1, $2)", self._channel(session_id), message)
+
+    def _on_notify(self, conn, pid, channel, payload) -> None:
+        for queue in list(self._queues.get(channel, ())):
+            queue.put_nowait(payload)
+
+    async def subscribe(self, session_id: str) -> "Subscription":
+        channel = self._channel(session_id)
+        queue: asyncio.Queue = asyncio.Queue()
+        async with self._conn_lock:
+            if self._listen_conn is None or self._listen_conn.is_closed():
+                self._listen_conn = await self._connect()
+            if not self._queues.get(channel):
+                await self._listen_conn.add_listener(channel, self._on_notify)
+            self._queues[channel].add(queue)
+
+        async def close():
+            async with self._conn_lock:
+                self._queues[channel].discard(queue)
+                if not self._queues[channel]:
+                    del self._queues[channel]
+                    if self._listen_conn is not None and not self._listen_conn.is_closed():
+                        await self._listen_conn.remove_listener(channel, self._on_notify)
+
+        return Subscription(queue.get, close)
+
+    async def close(self) -> None:
+        for conn in (self._listen_conn, self._publish_conn):
+            if conn is not None and not conn.is_closed():
+                await conn.close()
+
+
+def create_broker(url: Optional[str] = None) -> SessionEventBroker:
+    url = url or EVENT_BROKER_URL
+    scheme = url.split("://", 1)[0].lower()
+    try:
+        if scheme in ("redis", "rediss"):
+            return RedisBroker(url)
+        if scheme in ("postgres", "postgresql"):
+            import asyncpg  # noqa: F401  (fail here rather than on first event)
+            return PostgresBroker(url)
+    except ImportError as e:
+        logger.warning(f"EVENT_BROKER_URL is {scheme}:// but {e.name} is not installed; using in-memory broker")
+        return InMemoryBroker()
+    if scheme != "memory":
+        logger.warning(f"Unknown EVENT_BROKER_URL scheme {scheme!r}; using in-memory broker")
+    return InMemoryBroker()
+
+
+_broker: Optional[SessionEventBroker] = None
+
+
+def get_event_broker() -> SessionEventBroker:
+    global _broker
+    if _broker is None:
+        _broker = create_broker()
+    return _broker
@@ -0,0 +1,318 @@
+import asyncio
+import json
+import logging
+import os
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from services.event_broker import SessionEventBroker, decode_event, encode_event
+
+logger = logging.getLogger(__name__)
+
+RING_CAPACITY = int(os.environ.get("SSE_RING_CAPACITY", "500"))
+# A subscriber this many events behind is "slow" and gets low-priority events shed
+SLOW_CONSUMER_LAG = int(os.environ.get("SSE_SLOW_CONSUMER_LAG", "50"))
+# Mirrors of crawls running in other workers give up after this long without events
+MIRROR_IDLE_TIMEOUT = float(os.environ.get("EVENT_BROKER_IDLE_TIMEOUT", "300"))
+MIRROR_LINGER = 60
+
+# Coalescing window for SSE writes: events arriving within it go out as one frame
+BATCH_WINDOW = float(os.environ.get("SSE_BATCH_WINDOW_MS", "250")) / 1000
+BATCH_MAX_EVENTS = int(os.environ.get("SSE_BATCH_MAX_EVENTS", "50"))
+
+# Subscriber verbosity: progress (phases, cards, errors), info (+ step messages),
+# debug (+ raw log lines, LLM model chatter, usage reports)
+VERBOSITY_LEVELS = {"progress": 0, "info": 1, "debug": 2}
+DEFAULT_VERBOSITY = os.environ.get("SSE_DEFAULT_VERBOSITY", "info")
+EVENT_LEVELS = {"info": 1, "status": 1, "log": 2, "debug": 2, "llm_usage": 2}  # anything else: progress
+
+# Event types dropped for a subscriber that falls behind, and types merged
+# into the latest update in every batch. Everything else is always delivered.
+DROPPABLE_TYPES = {"info", "log", "debug"}
+COALESCED_TYPES = {"scanning"}
+
+
+@dataclass
+class SessionEvent:
+    id: int
+    type: str
+    data: str  # JSON payload as sent on the wire
+
+
+def to_event_payload(message) -> Tuple[str, str]:
+    """Normalize a crawler log message (JSON string or plain text) to (type, json)."""
+    if isinstance(message, dict):
+        return message.get("type", "log"), json.dumps(message)
+    if isinstance(message, str) and message.strip().startswith("{"):
+        try:
+            return json.loads(message).get("type", "log"), message
+        except (json.JSONDecodeError, AttributeError):
+            pass
+    return "log", json.dumps({"type": "log", "message": str(message)})
+
+
+class SessionEventBus:
+    """
+    Per-session event stream with a fixed-size replay ring buffer.
+
+    Every event gets a monotonic id. Any number of subscribers read it with
+    independent cursors, and a reconnecting client resumes after its
+    Last-Event-ID. Subscribers pick a verbosity and read in short batches;
+    when one falls more than `slow_lag` events behind, info/log events are
+    dropped for it as well.
+    """
+
+    def __init__(self, session_id, capacity: int = RING_CAPACITY, slow_lag: int = SLOW_CONSUMER_LAG,
+                 on_event=None):
+        self.session_id = session_id
+        self.slow_lag = slow_lag
+        self.on_event = on_event  # async hook, e.g. forward to the cross-worker broker
+        self._events: deque = deque(maxlen=capacity)
+        self._last_id = 0
+        self._closed = False
+        self._cond = asyncio.Condition()
+        self.subscribers = 0
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    async def publish(self, message) -> int:
+        if self._closed:
+            return self._last_id
+        event_type, data = to_event_payload(message)
+        async with self._cond:
+            self._last_id += 1
+            event = SessionEvent(self._last_id, event_type, data)
+            self._events.append(event)
+            self._cond.notify_all()
+        if self.on_event is not None:
+            try:
+                await self.on_event(event)
+            except Exception as e:
+                logger.error(f"Event hook failed for session {self.session_id}: {e}")
+        return event.id
+
+    async def append(self, event: SessionEvent) -> None:
+        """Add an already-numbered event (mirrored from another worker); an `end` event closes the bus."""
+        if self._closed or event.id <= self._last_id:
+            return
+        async with self._cond:
+            self._last_id = event.id
+            self._events.append(event)
+            if event.type == "end":
+                self._closed = True
+            self._cond.notify_all()
+
+    async def close(self, message: str = "Crawling finished") -> None:
+        """Publish the terminal `end` event; subscribers stop after delivering it."""
+        if self._closed:
+            return
+        await self.publish({"type": "end", "message": message})
+        async with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    async def subscribe(self, last_event_id: Optional[int] = None, level: str = "debug") -> AsyncIterator[SessionEvent]:
+        """Yield events after `last_event_id` (from the start of the ring if None) one at a time."""
+        async for batch in self.subscribe_batches(last_event_id, level=level, window=0):
+            for event in batch:
+                yield event
+
+    async def subscribe_batches(self, last_event_id: Optional[int] = None, level: str = DEFAULT_VERBOSITY,
+                                window: float = BATCH_WINDOW, max_events: int = BATCH_MAX_EVENTS
+                                ) -> AsyncIterator[List[SessionEvent]]:
+        """
+        Yield lists of events after `last_event_id`. Once an event arrives, wait
+        up to `window` seconds (or until `max_events` are pending, or the bus
+        closes) so bursts go out as one write. Events above `level` are
+        filtered and scanning updates are merged into the latest one.
+        """
+        cursor = last_event_id or 0
+        max_level = VERBOSITY_LEVELS.get(level, VERBOSITY_LEVELS[DEFAULT_VERBOSITY])
+        self.subscribers += 1
+        try:
+            while True:
+                async with self._cond:
+                    await self._cond.wait_for(lambda: self._last_id > cursor or self._closed)
+                    if window > 0 and not self._closed:
+                        try:
+                            await asyncio.wait_for(
+                                self._cond.wait_for(lambda: self._last_id - cursor >= max_events or self._closed),
+                                timeout=window
+                            )
+                        except asyncio.TimeoutError:
+                            pass
+                    pending = [e for e in self._events if e.id > cursor]
+                    oldest = self._events[0].id if self._events else self._last_id + 1
+                    done = self._closed
+
+                if cursor < oldest - 1:
+                    # Events between cursor and the ring start were overwritten
+                    yield [SessionEvent(oldest - 1, "gap", json.dumps({
+                        "type": "gap", "missed": oldest - 1 - cursor,
+                        "message": "Some earlier log lines are no longer available"
+                    }))]
+
+                if not pending and done:
+                    return
+                if pending:
+                    cursor = pending[-1].id
+                    batch = self._filter(pending, max_level, slow=len(pending) > self.slow_lag)
+                    if batch:
+                        yield batch
+                    if pending[-1].type == "end":
+                        return
+        finally:
+            self.subscribers -= 1
+
+    @staticmethod
+    def _filter(events: List[SessionEvent], max_level: int, slow: bool = False) -> List[SessionEvent]:
+        """
+        Drop events above the subscriber's verbosity (and droppable ones for a
+        slow consumer); keep only the newest event of each coalesced type,
+        tagged with how many updates it stands for.
+        """
+        kept = [
+            e for e in events
+            if EVENT_LEVELS.get(e.type, VERBOSITY_LEVELS["progress"]) <= max_level
+            and not (slow and e.type in DROPPABLE_TYPES)
+        ]
+        merged = Counter(e.type for e in kept if e.type in COALESCED_TYPES)
+        latest = {e.type: e.id for e in kept if e.type in COALESCED_TYPES}
+
+        result = []
+        for e in kept:
+            if e.type in COALESCED_TYPES:
+                if latest[e.type] != e.id:
+                    continue
+                if merged[e.type] > 1:
+                    payload = json.loads(e.data)
+                    payload["merged"] = merged[e.type]
+                    e = SessionEvent(e.id, e.type, json.dumps(payload))
+            result.append(e)
+        return result
+
+
+class EventBusRegistry:
+    """
+    session_id -> SessionEventBus for the sessions this process is streaming.
+
+    Buses created here for a local crawl forward every event to `broker`.
+    A stream request for a crawl running in another worker gets a mirror bus
+    via `attach()`, fed from the broker (backlog first, then live events).
+    """
+
+    def __init__(self, broker: Optional[SessionEventBroker] = None, idle_timeout: float = MIRROR_IDLE_TIMEOUT):
+        self.broker = broker
+        self.idle_timeout = idle_timeout
+        self._buses: Dict[str, SessionEventBus] = {}
+        self._followers: Dict[str, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._buses)
+
+    def create(self, session_id) -> SessionEventBus:
+        session_id = str(session_id)
+        on_event = None
+        if self.broker is not None:
+            broker = self.broker
+
+            async def on_event(event: SessionEvent):
+                await broker.publish(session_id, encode_event(event.id, event.type, event.data))
+
+        bus = SessionEventBus(session_id, on_event=on_event)
+        self._buses[session_id] = bus
+        return bus
+
+    def get(self, session_id) -> Optional[SessionEventBus]:
+        return self._buses.get(str(session_id))
+
+    def __contains__(self, session_id) -> bool:
+        return str(session_id) in self._buses
+
+    async def attach(self, session_id) -> Optional[SessionEventBus]:
+        """Local bus for the session, or a mirror of one running in another worker (None without a shared broker)."""
+        session_id = str(session_id)
+        bus = self._buses.get(session_id)
+        if bus is not None or self.broker is None or not self.broker.shared:
+            return bus
+
+        bus = SessionEventBus(session_id)
+        self._buses[session_id] = bus
+        try:
+            subscription = await self.broker.subscribe(session_id)
+            for raw in await self.broker.backlog(session_id):
+                await self._mirror(bus, raw)
+        except Exception as e:
+            logger.error(f"Could not attach to event broker for session {session_id}: {e}")
+            del self._buses[session_id]
+            return None
+        self._followers[session_id] = asyncio.get_running_loop().create_task(self._follow(bus, subscription))
+        return bus
+
+    @staticmethod
+    async def _mirror(bus: SessionEventBus, raw) -> None:
+        event = decode_event(raw)
+        if event is not None:
+            await bus.append(SessionEvent(int(event["id"]), event.get("type", "log"), event.get("data", "{}")))
+
+    async def _follow(self, bus: SessionEventBus, subscription) -> None:
+        session_id = bus.session_id
+        try:
+            while not bus.closed:
+                try:
+                    raw = await asyncio.wait_for(subscription.__anext__(), timeout=self.idle_timeout)
+                except asyncio.TimeoutError:
+                    logger.warning(f"No events for session {session_id} in {self.idle_timeout}s; closing mirror")
+                    await bus.close("Lost contact with the crawl worker")
+                    break
+                await self._mirror(bus, raw)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Event broker subscription for session {session_id} failed: {e}")
+            await bus.close("Lost contact with the crawl worker")
+        finally:
+            try:
+                await subscription.aclose()
+            except Exception:
+                pass
+            self._followers.pop(session_id, None)
+        await self._drop_later(session_id, bus, MIRROR_LINGER)
+
+    async def close(self, session_id, linger: float = 60) -> None:
+        """End the stream, keep it around `linger` seconds for late/reconnecting readers, then drop it."""
+        bus = self.get(session_id)
+        if bus is None:
+            return
+        await bus.close()
+        await self._drop_later(str(session_id), bus, linger)
+
+    async def _drop_later(self, session_id: str, bus: SessionEventBus, linger: float) -> None:
+        await asyncio.sleep(linger)
+        if self._buses.get(session_id) is bus:
+            del self._buses[session_id]
+
+    async def shutdown(self) -> None:
+        for task in list(self._followers.values()):
+            task.cancel()
+        if self.broker is not None:
+            await self.broker.close()
+
+
+def format_sse(event: SessionEvent) -> str:
+    return f"id: {event.id}\ndata: {event.data}\n\n"
+
+
+def format_sse_batch(events: List[SessionEvent]) -> str:
+    """One frame for a batch; payloads are already JSON, so they are spliced in rather than re-encoded."""
+    if len(events) == 1:
+        return format_sse(events[0])
+    body = ", ".join(e.data for e in events)
+    return f'id: {events[-1].id}\ndata: {{"type": "batch", "events": [{body}]}}\n\n'
@@ -0,0 +1,239 @@
+import asyncio
+import json
+import logging
+import math
+import re
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from services.supabase_client import get_async_supabase_client
+
+logger = logging.getLogger(__name__)
+
+# Honorifics and suffixes ignored when deciding two cards are the same professor
+NAME_NOISE = {"dr", "prof", "professor", "phd", "md", "jr", "sr", "ii", "iii"}
+
+FEED_CARD_COLUMNS = "id,session_id,professor_name,match_score,embedding,created_at"
+
+
+def professor_key(name: Optional[str]) -> str:
+    """Dedup key for a professor across sessions: the name without titles, case or punctuation."""
+    words = re.sub(r"[^\w\s]", " ", (name or "").lower()).split()
+    return " ".join(w for w in words if w not in NAME_NOISE)
+
+
+def parse_vector(value: Any) -> Optional[List[float]]:
+    """pgvector columns come back from PostgREST as "[0.1,0.2,...]" strings; SQLite stores JSON lists."""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            return None
+    if isinstance(value, list) and value:
+        return [float(v) for v in value]
+    return None
+
+
+def cosine_similarity(a: List[float], b: List[float]) -> Optional[float]:
+    if len(a) != len(b):
+        return None
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    if not norm:
+        return None
+    return sum(x * y for x, y in zip(a, b)) / norm
+
+
+def rank_score(card: Dict[str, Any], profile_embedding: Optional[List[float]]) -> float:
+    """Embedding similarity to the user's profile (0-100) when both vectors exist, else the card's match_score."""
+    if profile_embedding:
+        card_embedding = parse_vector(card.get("embedding"))
+        similarity = cosine_similarity(profile_embedding, card_embedding) if card_embedding else None
+        if similarity is not None:
+            return round(max(similarity, 0.0) * 100, 2)
+    return round(float(card.get("match_score") or 0.0), 2)
+
+
+class FeedIndexer:
+    """
+    Maintains user_feed, the materialized swipe feed: one row per (user,
+    professor) holding the best-scored card for that professor across all of
+    the user's sessions. Cards are folded in incrementally, as the write
+    buffer flushes them and before a user's first feed page: each session's
+    feed_indexed_through holds the created_at of its newest indexed card, so
+    a pass (in any process, after any restart) reads only newer cards. Swipes
+    mark rows with swiped_at instead of deleting them so later cards for the
+    same professor stay hidden.
+    """
+
+    def __init__(self, client=None):
+        self.client = client or get_async_supabase_client()
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self.stats = {"passes": 0, "cards_seen": 0, "rows_written": 0}
+
+    async def index_sessions(self, session_ids: Iterable[str]) -> None:
+        """Write-buffer hook: fold newly written cards of these sessions into their users' feeds."""
+        session_ids = sorted({str(s) for s in session_ids})
+        if not session_ids:
+            return
+        res = await self.client.table("scrape_sessions").select("id,user_id").in_("id", session_ids).execute()
+        by_user: Dict[str, List[str]] = defaultdict(list)
+        for row in res.data or []:
+            by_user[str(row["user_id"])].append(str(row["id"]))
+        for user_id, sessions in by_user.items():
+            await self.index_user(user_id, sessions)
+
+    async def index_user(self, user_id: str, session_ids: Optional[List[str]] = None) -> int:
+        """Index cards created since the last pass (all of the user's sessions by default); returns rows written."""
+        user_id = str(user_id)
+        async with self._locks[user_id]:
+            # Marks are read under the lock so a pass never starts from a mark the previous one moved past
+            query = self.client.table("scrape_sessions").select("id,feed_indexed_through").eq("user_id", user_id)
+            if session_ids is not None:
+                query = query.in_("id", list(session_ids))
+            res = await query.execute()
+            marks = {str(r["id"]): r.get("feed_indexed_through") for r in res.data or []}
+            if not marks:
+                return 0
+            cards = await self._new_cards(marks)
+            self.stats["passes"] += 1
+            if not cards:
+                return 0
+            self.stats["cards_seen"] += len(cards)
+
+            written = await self._upsert_best(user_id, cards)
+
+            newest: Dict[str, str] = {}
+            for card in cards:
+                session_id, created_at = str(card["session_id"]), str(card["created_at"])
+                if created_at > newest.get(session_id, ""):
+                    newest[session_id] = created_at
+            for session_id, created_at in newest.items():
+                if created_at > (marks.get(session_id) or ""):
+                    await self.client.table("scrape_sessions").update({"feed_indexed_through": created_at}, returning="minimal") \
+                        .eq("id", session_id).execute()
+            return written
+
+    async def _upsert_best(self, user_id: str, cards: List[Dict[str, Any]], replace: bool = False) -> int:
+        """
+        Upsert the best card per professor. An existing row is kept unless the
+        new card outranks it, or with `replace` (its card was just retired).
+        """
+        profile_embedding = await self._profile_embedding(user_id)
+        ranked_at = datetime.now(timezone.utc).isoformat()
+        best: Dict[str, Dict[str, Any]] = {}
+        for card in cards:
+            key = professor_key(card.get("professor_name"))
+            if not key:
+                continue
+            row = {
+                "user_id": user_id,
+                "professor_key": key,
+                "professor_card_id": str(card["id"]),
+                "session_id": str(card["session_id"]),
+                "score": rank_score(card, profile_embedding),
+                "ranked_at": ranked_at,
+            }
+            if key not in best or row["score"] > best[key]["score"]:
+                best[key] = row
+
+        if best and not replace:
+            res = await self.client.table("user_feed").select("professor_key,score") \
+                .eq("user_id", user_id).in_("professor_key", list(best)).execute()
+            for existing in res.data or []:
+                row = best.get(existing["professor_key"])
+                if row and row["score"] <= float(existing.get("score") or 0.0):
+                    del best[existing["professor_key"]]
+        if best:
+            await self.client.table("user_feed").upsert(list(best.values()), on_conflict="user_id,professor_key").execute()
+            self.stats["rows_written"] += len(best)
+        return len(best)
+
+    async def _new_cards(self, marks: Dict[str, Optional[str]]) -> List[Dict[str, Any]]:
+        query = self.client.table("professor_cards") \
+            .select(FEED_CARD_COLUMNS).in_("session_id", list(marks)) \
+            .is_("retired_at", None)
+        if all(marks.values()):
+            # gte: rows committed in one statement share a timestamp; re-folding them is harmless
+            query = query.gte("created_at", min(marks.values()))
+        res = await query.order("created_at").execute()
+        return [
+            c for c in res.data or []
+            if str(c["created_at"]) >= (marks.get(str(c["session_id"])) or "")
+        ]
+
+    async def _profile_embedding(self, user_id: str) -> Optional[List[float]]:
+        try:
+            res = await self.client.table("profiles").select("embedding").eq("id", user_id).execute()
+        except Exception as e:
+            logger.warning(f"Could not load profile embedding for {user_id}: {e}")
+            return None
+        return parse_vector(res.data[0].get("embedding")) if res.data else None
+
+    async def retire_cards(self, card_ids: List[str]) -> None:
+        """
+        Drop retired cards from feeds; swiped rows stay so their professor
+        stays hidden. A professor with a live card in another of the user's
+        sessions gets the best such card back.
+        """
+        if not card_ids:
+            return
+        res = await self.client.table("user_feed").delete(returning="representation") \
+            .in_("professor_card_id", list(card_ids)).is_("swiped_at", None).execute()
+        keys_by_user: Dict[str, Set[str]] = defaultdict(set)
+        for row in res.data or []:
+            keys_by_user[str(row["user_id"])].add(row["professor_key"])
+        for user_id, keys in keys_by_user.items():
+            async with self._locks[user_id]:
+                await self._resurface(user_id, keys)
+
+    async def _resurface(self, user_id: str, keys: Set[str]) -> None:
+        sessions = await self.client.table("scrape_sessions").select("id").eq("user_id", user_id).execute()
+        session_ids = [str(r["id"]) for r in sessions.data or []]
+        if not session_ids:
+            return
+        # Names first (no embeddings), then full rows for the matching cards only
+        res = await self.client.table("professor_cards").select("id,professor_name") \
+            .in_("session_id", session_ids).is_("retired_at", None).execute()
+        matches = [str(c["id"]) for c in res.data or [] if professor_key(c.get("professor_name")) in keys]
+        if not matches:
+            return
+        res = await self.client.table("professor_cards").select(FEED_CARD_COLUMNS).in_("id", matches).execute()
+        # The retired rows are gone; a row swiped meanwhile must not be revived
+        swiped = await self.client.table("user_feed").select("professor_key").eq("user_id", user_id) \
+            .in_("professor_key", list(keys)).execute()
+        hidden = {r["professor_key"] for r in swiped.data or []}
+        cards = [c for c in res.data or [] if professor_key(c.get("professor_name")) not in hidden]
+        await self._upsert_best(user_id, cards, replace=True)
+
+    async def mark_swiped(self, user_id: str, card: Dict[str, Any]) -> None:
+        """Hide the card's professor from the user's feed, including cards for them indexed later."""
+        user_id = str(user_id)
+        key = professor_key(card.get("professor_name"))
+        if not key:
+            return
+        swiped_at = datetime.now(timezone.utc).isoformat()
+        async with self._locks[user_id]:
+            res = await self.client.table("user_feed").update({"swiped_at": swiped_at}) \
+                .eq("user_id", user_id).eq("professor_key", key).execute()
+            if not res.data:
+                # Not indexed yet: leave a swiped row so indexing can't surface the professor
+                await self.client.table("user_feed").upsert({
+                    "user_id": user_id,
+                    "professor_key": key,
+                    "professor_card_id": str(card["id"]),
+                    "session_id": str(card["session_id"]),
+                    "score": rank_score(card, None),
+                    "ranked_at": swiped_at,
+                    "swiped_at": swiped_at,
+                }, on_conflict="user_id,professor_key").execute()
+
+
+_feed_indexer: Optional[FeedIndexer] = None
+
+
+def get_feed_indexer() -> FeedIndexer:
+    global _feed_indexer
+    if _feed_indexer is None:
+        _feed_indexer = FeedIndexer()
+    return _feed_indexer
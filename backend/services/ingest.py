@@ -0,0 +1,159 @@
+import hashlib
+import logging
+import os
+import zlib
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Set, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+from pydantic import ValidationError
+
+from models import IngestArtifact
+
+logger = logging.getLogger(__name__)
+
+INGEST_BATCH_ROWS = int(os.environ.get("INGEST_BATCH_ROWS", "200"))
+# Decompressed size cap per request (guards against gzip bombs) and per line
+INGEST_MAX_BYTES = int(os.environ.get("INGEST_MAX_BYTES", str(64 * 1024 * 1024)))
+INGEST_MAX_LINE_BYTES = int(os.environ.get("INGEST_MAX_LINE_BYTES", str(4 * 1024 * 1024)))
+INGEST_MAX_HTML_CHARS = int(os.environ.get("INGEST_MAX_HTML_CHARS", "1000000"))
+MAX_REPORTED_ERRORS = 20
+
+
+class IngestTooLarge(Exception):
+    pass
+
+
+def canonical_url(url: str) -> str:
+    """Normalize a URL for matching: lowercase scheme/host, no fragment, no default port or trailing slash."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and not ((scheme == "http" and parts.port == 80) or (scheme == "https" and parts.port == 443)):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((scheme, host, path, parts.query, ""))
+
+
+def content_hash(artifact: IngestArtifact) -> str:
+    body = artifact.content or artifact.html or ""
+    if not body.strip():
+        # Nothing captured: only identical URLs should collide
+        body = "url:" + canonical_url(artifact.url)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+async def iter_ndjson_lines(chunks: AsyncIterator[bytes], gzipped: bool,
+                            max_bytes: int = INGEST_MAX_BYTES,
+                            max_line: int = INGEST_MAX_LINE_BYTES) -> AsyncIterator[Tuple[int, bytes]]:
+    """Yield (line_number, line) from a possibly gzip-compressed byte stream without buffering it whole."""
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+    buffer = b""
+    total = 0
+    line_no = 0
+    async for chunk in chunks:
+        if decoder is not None:
+            # Bound each inflate step so a tiny bomb can't expand unchecked
+            data = decoder.decompress(chunk, max_bytes - total + 1)
+            if decoder.unconsumed_tail:
+                raise IngestTooLarge(f"Decompressed body exceeds {max_bytes} bytes")
+        else:
+            data = chunk
+        total += len(data)
+        if total > max_bytes:
+            raise IngestTooLarge(f"Body exceeds {max_bytes} bytes")
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        if len(buffer) > max_line:
+            raise IngestTooLarge(f"Line {line_no + len(lines) + 1} exceeds {max_line} bytes")
+        for line in lines:
+            line_no += 1
+            if line.strip():
+                yield line_no, line
+    if decoder is not None:
+        buffer += decoder.flush()
+    if buffer.strip():
+        yield line_no + 1, buffer
+
+
+class ArtifactBatchWriter:
+    """
+    Validates NDJSON artifact lines, drops duplicates (content the session
+    already has, stored or earlier in this request, or a URL captured twice in
+    the same request) and writes the rest as bulk inserts of `batch_rows`.
+    """
+
+    def __init__(self, client, batch_rows: int = INGEST_BATCH_ROWS):
+        self.client = client
+        self.batch_rows = batch_rows
+        self._pending: List[Dict[str, Any]] = []
+        self._seen_hashes: Dict[str, Set[str]] = {}     # session -> content hashes
+        self._request_urls: Set[Tuple[str, str]] = set()  # (session, canonical url) in this request
+        self._loaded_sessions: Set[str] = set()
+        self.sessions: Set[str] = set()
+        self.stats = {"received": 0, "inserted": 0, "duplicates": 0, "invalid": 0, "batches": 0}
+        self.errors: List[Dict[str, Any]] = []
+
+    async def add_line(self, line_no: int, line: bytes) -> None:
+        self.stats["received"] += 1
+        try:
+            artifact = IngestArtifact.model_validate_json(line)
+        except ValidationError as e:
+            self._error(line_no, "; ".join(f"{'.'.join(map(str, err['loc'])) or 'line'}: {err['msg']}" for err in e.errors()))
+            return
+        await self.add(artifact)
+
+    async def add(self, artifact: IngestArtifact) -> None:
+        session_id = str(artifact.session_id)
+        await self._load_existing(session_id)
+        url = canonical_url(artifact.url)
+        digest = content_hash(artifact)
+        if digest in self._seen_hashes[session_id] or (session_id, url) in self._request_urls:
+            self.stats["duplicates"] += 1
+            return
+        self._seen_hashes[session_id].add(digest)
+        self._request_urls.add((session_id, url))
+        self.sessions.add(session_id)
+
+        html = artifact.html or ""
+        row = {
+            "session_id": session_id,
+            "source": "chrome_extension",
+            "url": url,
+            "title": artifact.title,
+            "extracted_text": artifact.content,
+            "out_links": artifact.out_links,
+            "content_hash": digest,
+            # Always set, so every row in a bulk insert has the same columns
+            "captured_at": (artifact.captured_at or datetime.now(timezone.utc)).isoformat(),
+            "raw_metadata": {"html": html[:INGEST_MAX_HTML_CHARS], "html_truncated": len(html) > INGEST_MAX_HTML_CHARS,
+                             "original_url": artifact.url},
+        }
+        self._pending.append(row)
+        if len(self._pending) >= self.batch_rows:
+            await self.flush()
+
+    async def _load_existing(self, session_id: str) -> None:
+        """Seed the dedup sets with what the session already has (one query per session per request)."""
+        if session_id in self._loaded_sessions:
+            return
+        self._loaded_sessions.add(session_id)
+        self._seen_hashes[session_id] = set()
+        res = await self.client.table("scrape_artifacts").select("content_hash").eq("session_id", session_id).execute()
+        self._seen_hashes[session_id].update(row["content_hash"] for row in res.data or [] if row.get("content_hash"))
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        await self.client.table("scrape_artifacts").insert(rows, returning="minimal").execute()
+        self.stats["inserted"] += len(rows)
+        self.stats["batches"] += 1
+
+    def _error(self, line_no: int, message: str) -> None:
+        self.stats["invalid"] += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line_no, "error": message})
+
+    def summary(self) -> Dict[str, Any]:
+        return {**self.stats, "errors": self.errors}
@@ -0,0 +1,339 @@
+import asyncio
+import logging
+import math
+import os
+import socket
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# inprocess: the API process runs the worker pool. external: crawls run in
+# `python worker.py` processes and the API only enqueues (needs a shared EVENT_BROKER_URL).
+CRAWL_WORKER_MODE = os.environ.get("CRAWL_WORKER_MODE", "inprocess")
+CRAWL_CONCURRENCY = int(os.environ.get("CRAWL_CONCURRENCY", "4"))
+CRAWL_MAX_RUNNING_PER_USER = int(os.environ.get("CRAWL_MAX_RUNNING_PER_USER", "1"))
+CRAWL_MAX_QUEUED_PER_USER = int(os.environ.get("CRAWL_MAX_QUEUED_PER_USER", "3"))
+CRAWL_QUEUE_MAX = int(os.environ.get("CRAWL_QUEUE_MAX", "100"))
+CRAWL_POLL_SECONDS = float(os.environ.get("CRAWL_POLL_SECONDS", "2"))
+CRAWL_ESTIMATED_SECONDS = float(os.environ.get("CRAWL_ESTIMATED_SECONDS", "180"))
+CRAWL_HEARTBEAT_SECONDS = float(os.environ.get("CRAWL_HEARTBEAT_SECONDS", "30"))
+# A running job whose worker hasn't heartbeated for this long is re-queued
+CRAWL_STALE_SECONDS = float(os.environ.get("CRAWL_STALE_SECONDS", "300"))
+CRAWL_MAX_ATTEMPTS = int(os.environ.get("CRAWL_MAX_ATTEMPTS", "2"))
+
+QUEUE_COLUMNS = "id,user_id,status,created_at,root_urls,major,custom_prompt,attempts"
+ACTIVE_STATUSES = ("queued", "running")
+# Statuses that end a session (the crawler writes these immediately, not buffered)
+FINAL_STATUSES = {"done", "error", "failed", "blocked"}
+SNAPSHOT_LIMIT = 1000
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class QueueFull(Exception):
+    """Admission refused; `eta_seconds` is a hint for Retry-After."""
+
+    def __init__(self, message: str, eta_seconds: float):
+        super().__init__(message)
+        self.eta_seconds = eta_seconds
+
+
+def fair_order(queued: List[Dict[str, Any]], running_by_user: Dict[str, int]) -> List[Dict[str, Any]]:
+    """
+    Order queued jobs round-robin across users: the next job always comes from
+    the user with the fewest jobs running or already ahead in line, oldest
+    first within a user and as the tie-break.
+    """
+    per_user: Dict[str, List[Dict[str, Any]]] = {}
+    for job in sorted(queued, key=lambda j: j["created_at"]):
+        per_user.setdefault(job["user_id"], []).append(job)
+    load = Counter({user: running_by_user.get(user, 0) for user in per_user})
+
+    ordered = []
+    while per_user:
+        user = min(per_user, key=lambda u: (load[u], per_user[u][0]["created_at"]))
+        ordered.append(per_user[user].pop(0))
+        load[user] += 1
+        if not per_user[user]:
+            del per_user[user]
+    return ordered
+
+
+class CrawlJobQueue:
+    """
+    Durable crawl queue stored in scrape_sessions: `queued` rows are pending
+    jobs, claimed with a conditional update (status queued -> running) so only
+    one worker wins. Running jobs heartbeat; jobs whose worker died are
+    re-queued, up to CRAWL_MAX_ATTEMPTS.
+    """
+
+    def __init__(self, client, concurrency: int = CRAWL_CONCURRENCY,
+                 max_running_per_user: int = CRAWL_MAX_RUNNING_PER_USER,
+                 max_queued_per_user: int = CRAWL_MAX_QUEUED_PER_USER,
+                 queue_max: int = CRAWL_QUEUE_MAX, snapshot_ttl: float = CRAWL_POLL_SECONDS):
+        self.client = client
+        self.concurrency = concurrency
+        self.max_running_per_user = max_running_per_user
+        self.max_queued_per_user = max_queued_per_user
+        self.queue_max = queue_max
+        self.snapshot_ttl = snapshot_ttl
+        self.avg_job_seconds = CRAWL_ESTIMATED_SECONDS
+        self._snapshot: Optional[Tuple[float, List[Dict[str, Any]]]] = None
+        self._snapshot_lock = asyncio.Lock()
+
+    # --- Reading the queue ---
+
+    async def snapshot(self, max_age: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Active (queued + running) jobs, oldest first; shared by every caller for `max_age` seconds."""
+        max_age = self.snapshot_ttl if max_age is None else max_age
+        async with self._snapshot_lock:
+            if self._snapshot and time.monotonic() - self._snapshot[0] <= max_age:
+                return self._snapshot[1]
+            res = await self.client.table("scrape_sessions").select(QUEUE_COLUMNS) \
+                .in_("status", list(ACTIVE_STATUSES)).order("created_at").limit(SNAPSHOT_LIMIT).execute()
+            self._snapshot = (time.monotonic(), res.data or [])
+            return self._snapshot[1]
+
+    def invalidate(self) -> None:
+        self._snapshot = None
+
+    @staticmethod
+    def _split(jobs: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+        queued = [j for j in jobs if j["status"] == "queued"]
+        running = Counter(j["user_id"] for j in jobs if j["status"] == "running")
+        return queued, dict(running)
+
+    def eta(self, position: int) -> float:
+        """Seconds until the job at 1-based `position` is likely to start."""
+        return math.ceil(position / max(1, self.concurrency)) * self.avg_job_seconds
+
+    async def position(self, session_id) -> Optional[Dict[str, Any]]:
+        """{'position', 'queued', 'eta_seconds'} while the session waits; None once it's no longer queued."""
+        queued, running = self._split(await self.snapshot())
+        for index, job in enumerate(fair_order(queued, running)):
+            if job["id"] == str(session_id):
+                return {"position": index + 1, "queued": len(queued), "eta_seconds": round(self.eta(index + 1))}
+        return None
+
+    async def admit(self, user_id) -> None:
+        """Raise QueueFull if the queue (or this user's share of it) is saturated."""
+        jobs = await self.snapshot(max_age=0.5)
+        queued, _ = self._split(jobs)
+        if len(queued) >= self.queue_max:
+            raise QueueFull("Crawl queue is full, try again later", self.eta(len(queued) - self.queue_max + 1))
+        mine = [j for j in jobs if j["user_id"] == str(user_id)]
+        if len(mine) >= self.max_queued_per_user:
+            raise QueueFull(f"You already have {len(mine)} crawls queued or running",
+                            self.eta(sum(1 for j in mine if j["status"] == "queued") + 1))
+
+    # --- Worker side ---
+
+    async def claim(self, session_id, worker_id: str) -> Optional[Dict[str, Any]]:
+        """Atomically move one queued job to running; None if another worker got it first."""
+        now = _now().isoformat()
+        res = await self.client.table("scrape_sessions").update(
+            {"status": "running", "worker_id": worker_id, "started_at": now, "heartbeat_at": now}
+        ).eq("id", str(session_id)).eq("status", "queued").execute()
+        self.invalidate()
+        return res.data[0] if res.data else None
+
+    async def claim_next(self, slots: int, worker_id: str,
+                         on_claim: Optional[Callable[[Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+        """Claim up to `slots` jobs in fair order, honouring the per-user running limit."""
+        if slots <= 0:
+            return []
+        queued, running = self._split(await self.snapshot(max_age=0))
+        claimed = []
+        for job in fair_order(queued, running):
+            if len(claimed) >= slots:
+                break
+            if running.get(job["user_id"], 0) >= self.max_running_per_user:
+                continue
+            row = await self.claim(job["id"], worker_id)
+            if row is not None:
+                if on_claim:
+                    on_claim(row)
+                claimed.append(row)
+                running[job["user_id"]] = running.get(job["user_id"], 0) + 1
+        return claimed
+
+    async def heartbeat(self, session_ids: List[str]) -> None:
+        if session_ids:
+            await self.client.table("scrape_sessions").update(
+                {"heartbeat_at": _now().isoformat()}, returning="minimal"
+            ).in_("id", list(session_ids)).eq("status", "running").execute()
+
+    async def release(self, session_ids: List[str]) -> None:
+        """Put jobs this worker is abandoning (e.g. on shutdown) back in the queue."""
+        if session_ids:
+            await self.client.table("scrape_sessions").update(
+                {"status": "queued", "worker_id": None}, returning="minimal"
+            ).in_("id", list(session_ids)).eq("status", "running").execute()
+            self.invalidate()
+
+    async def resume_blocked(self, session_ids) -> List[str]:
+        """Re-queue blocked sessions (e.g. once the extension captured the blocked pages); returns those resumed."""
+        resumed = []
+        for session_id in {str(s) for s in session_ids}:
+            res = await self.client.table("scrape_sessions").update(
+                {"status": "queued", "worker_id": None, "blocked_reason": None, "blocked_url": None}
+            ).eq("id", session_id).eq("status", "blocked").execute()
+            if res.data:
+                resumed.append(session_id)
+        if resumed:
+            self.invalidate()
+        return resumed
+
+    async def requeue_stale(self, stale_seconds: float = CRAWL_STALE_SECONDS) -> int:
+        """Re-queue running jobs whose worker stopped heartbeating; give up after CRAWL_MAX_ATTEMPTS."""
+        cutoff = (_now() - timedelta(seconds=stale_seconds)).isoformat()
+        res = await self.client.table("scrape_sessions").select("id,attempts") \
+            .eq("status", "running").lt("heartbeat_at", cutoff).execute()
+        for job in res.data or []:
+            attempts = (job.get("attempts") or 0) + 1
+            data = {"status": "queued", "worker_id": None, "attempts": attempts}
+            if attempts >= CRAWL_MAX_ATTEMPTS:
+                data = {"status": "error", "attempts": attempts, "finished_at": _now().isoformat()}
+            await self.client.table("scrape_sessions").update(data, returning="minimal") \
+                .eq("id", job["id"]).eq("status", "running").execute()
+            logger.warning(f"Crawl job {job['id']} lost its worker; {'re-queued' if data['status'] == 'queued' else 'failed'}")
+        if res.data:
+            self.invalidate()
+        return len(res.data or [])
+
+    def record_duration(self, seconds: float) -> None:
+        # Exponential moving average drives the ETA estimates
+        self.avg_job_seconds = 0.8 * self.avg_job_seconds + 0.2 * seconds
+
+
+class CrawlWorkerPool:
+    """
+    Runs up to `concurrency` crawl jobs from a CrawlJobQueue. `run_job(session)`
+    is awaited once per claimed job (the scrape_sessions row).
+    """
+
+    def __init__(self, queue: CrawlJobQueue, run_job: Callable[[Dict[str, Any]], Awaitable[None]],
+                 concurrency: int = CRAWL_CONCURRENCY, worker_id: Optional[str] = None,
+                 on_claim: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.queue = queue
+        self.run_job = run_job
+        self.concurrency = concurrency
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.on_claim = on_claim  # sync hook run right after a claim, before any other await
+        self._running: Dict[str, asyncio.Task] = {}
+        self._wake = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+
+    @property
+    def running(self) -> int:
+        return len(self._running)
+
+    def wake(self) -> None:
+        """Dispatch now instead of waiting for the next poll (e.g. right after enqueueing)."""
+        self._wake.set()
+
+    def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._dispatch_loop()), loop.create_task(self._heartbeat_loop())]
+        logger.info(f"Crawl worker {self.worker_id} started ({self.concurrency} slots)")
+
+    async def _dispatch_loop(self) -> None:
+        last_stale_check = 0.0
+        while not self._stopping:
+            if time.monotonic() - last_stale_check > CRAWL_HEARTBEAT_SECONDS:
+                # Checked again next interval even if it failed, so a broken sweep never blocks claims
+                last_stale_check = time.monotonic()
+                try:
+                    await self.queue.requeue_stale()
+                except Exception as e:
+                    logger.error(f"Stale crawl job sweep failed: {e}")
+            try:
+                for job in await self.queue.claim_next(self.concurrency - self.running, self.worker_id, self.on_claim):
+                    self._running[job["id"]] = asyncio.get_running_loop().create_task(self._run(job))
+            except Exception as e:
+                logger.error(f"Crawl dispatcher error: {e}")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=CRAWL_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        started = time.monotonic()
+        try:
+            await self.run_job(job)
+            self.queue.record_duration(time.monotonic() - started)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Crawl job {job['id']} failed: {e}")
+        finally:
+            self._running.pop(job["id"], None)
+            self.queue.invalidate()
+            self.wake()
+
+    async def _heartbeat_loop(self) -> None:
+        while not self._stopping:
+            await asyncio.sleep(CRAWL_HEARTBEAT_SECONDS)
+            try:
+                await self.queue.heartbeat(list(self._running))
+            except Exception as e:
+                logger.error(f"Crawl heartbeat failed: {e}")
+
+    async def stop(self) -> None:
+        """Stop claiming, cancel running jobs and hand them back to the queue."""
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        abandoned = list(self._running)
+        for task in list(self._running.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._running.values(), return_exceptions=True)
+        try:
+            await self.queue.release(abandoned)
+        except Exception as e:
+            logger.error(f"Could not re-queue {len(abandoned)} abandoned crawl jobs: {e}")
+
+
+def create_crawl_pool(queue: CrawlJobQueue, crawler_service, event_buses,
+                      concurrency: int = CRAWL_CONCURRENCY) -> CrawlWorkerPool:
+    """Worker pool that runs claimed sessions through `crawler_service`, streaming to `event_buses`."""
+
+    async def run_job(job: Dict[str, Any]) -> None:
+        session_id = uuid.UUID(job["id"])
+        root_urls = job.get("root_urls") or []
+        logger.info(f"Starting crawl for {session_id} on {root_urls}")
+
+        # helper for emitting logs
+        async def log_callback(message: str):
+            bus = event_buses.get(session_id)
+            if bus is not None:
+                await bus.publish(message)
+
+        try:
+            await log_callback(f"Starting crawl session for: {', '.join(root_urls)}")
+            await crawler_service.run_session(session_id, root_urls, log_callback, job.get("major"), job.get("custom_prompt"))
+            await log_callback("Crawl task finished successfully.")
+        except asyncio.CancelledError:
+            # Shutting down: the job goes back to the queue, tell clients to reconnect later
+            bus = event_buses.get(session_id)
+            if bus is not None:
+                await bus.close("Crawl interrupted; it will resume when a worker is available")
+            raise
+        except Exception as e:
+            await log_callback(f"Crawl task failed: {str(e)}")
+        finally:
+            logger.info(f"Crawl task finished for {session_id}")
+
+        # Signal stream end; the bus lingers briefly for reconnecting clients
+        asyncio.get_running_loop().create_task(event_buses.close(session_id, linger=60))
+
+    return CrawlWorkerPool(queue, run_job, concurrency=concurrency,
+                           on_claim=lambda job: event_buses.create(job["id"]))
@@ -0,0 +1,131 @@
+import json
+import logging
+from typing import Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class JSONArrayStreamParser:
+    """
+    Incremental parser for streamed LLM JSON output.
+
+    Feed it text chunks as they arrive and it returns every element of the
+    array stored under `key` (e.g. "professors") as soon as that element is
+    complete. A bare top-level array is also accepted (legacy list responses).
+    Anything before the first bracket, like a ```json fence, is ignored.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.reset()
+
+    def reset(self):
+        """Discard all state, e.g. before retrying with another model."""
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._last_key = None
+        self._expect_array = False
+        self._array_depth = None   # Depth of the target array's elements
+        self._array_done = False
+        self._element_start = -1
+        self.items_emitted = 0
+
+    def feed(self, chunk: str) -> List[Any]:
+        """Consume a chunk and return any array elements completed by it."""
+        if not chunk:
+            return []
+        self.text += chunk
+        completed = []
+        text = self.text
+
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._element_start < 0:
+                        self._last_key = text[self._string_start:i + 1]
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+                continue
+
+            if ch in "{[":
+                if self._depth == 0 and ch == "[" and self._array_depth is None:
+                    # Top-level list response
+                    self._array_depth = 1
+                elif self._expect_array and ch == "[" and self._depth == 1:
+                    self._array_depth = 2
+                elif self._array_depth is not None and not self._array_done and self._depth == self._array_depth:
+                    self._element_start = i
+                self._expect_array = False
+                self._depth += 1
+                continue
+
+            if ch in "}]":
+                self._depth -= 1
+                if self._element_start >= 0 and self._depth == self._array_depth:
+                    completed.extend(self._emit(text[self._element_start:i + 1]))
+                    self._element_start = -1
+                elif self._array_depth is not None and self._depth == self._array_depth - 1:
+                    self._array_done = True
+                continue
+
+            if ch == ":" and self._depth == 1 and self._last_key is not None:
+                try:
+                    self._expect_array = json.loads(self._last_key) == self.key
+                except json.JSONDecodeError:
+                    self._expect_array = False
+                self._last_key = None
+            elif not ch.isspace():
+                self._expect_array = False
+
+        self._pos = len(text)
+        return completed
+
+    def _emit(self, element_text: str) -> List[Any]:
+        try:
+            item = json.loads(element_text)
+        except json.JSONDecodeError:
+            logger.debug(f"Skipping malformed streamed element: {element_text[:100]}")
+            return []
+        self.items_emitted += 1
+        return [item]
+
+    @property
+    def done(self) -> bool:
+        """True once the target array has been closed."""
+        return self._array_done
+
+    def result(self) -> Optional[Any]:
+        """Parse the full accumulated text once the stream has ended."""
+        return parse_json_content(self.text)
+
+
+def parse_json_content(content: str) -> Optional[Any]:
+    """Parse JSON from an LLM response, tolerating markdown code fences."""
+    if not content:
+        return None
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        pass
+    try:
+        if "```json" in content:
+            return json.loads(content.split("```json")[1].split("```")[0].strip())
+        elif "```" in content:
+            return json.loads(content.split("```")[1].split("```")[0].strip())
+    except (json.JSONDecodeError, IndexError):
+        pass
+    return None
@@ -1,148 +1,72 @@
 import os
-from openai import AsyncOpenAI
 from typing import Optional, Dict, Any, List
 import json
 import logging
-from bs4 import BeautifulSoup
+import re
+import time
+from services.json_stream import JSONArrayStreamParser, parse_json_content
+from services.prompts import PROMPTS, get_prompt, render_prompt
+from services.metrics import PARSE_SECONDS, LLM_SECONDS, LLM_TOKENS, LLM_RATE_LIMITED, LLM_FALLBACKS, LLM_ESCALATIONS
+from services.tracing import record_span, span
 
 logger = logging.getLogger(__name__)
 
 # ==============================================================================
-# PROMPTS
+# SERVICE
 # ==============================================================================
 
-PROMPT_RESUME = """
-Analyze the following Resume/CV text to assist a student in finding a relevant research lab.
-
-Resume Content:
-{resume_text}
-
-TASK:
-1. Extract the top 4-5 technical "Experience/Interest" Keywords (e.g. "Computer Vision", "React", "CRISPR").
-2. Write a 1-sentence "Custom Prompt" summary describing what kind of research they are looking for based on their experience.
-   (e.g. "I am looking for a lab focused on AI and NLP, specifically dealing with large language models.")
-
-Return JSON:
-{{
-    "keywords": ["Keyword1", "Keyword2", ...],
-    "summary": "Full sentence summary..."
-}}
-"""
-
-PROMPT_DISCOVERY = """
-You are extracting RESEARCH FACULTY information from a university webpage.
-
-URL: {url}
-Page Content:
-{text_content}
-
-FILTER_TOPIC: {major}
-
-YOUR TASK:
-1. ANALYZE: Does this page contain RESEARCH FACULTY (Professors who conduct research)?
-   - GOOD pages: "Faculty Directory", "Our Faculty", "Research Faculty", "People > Faculty"
-   - BAD pages: "Leadership", "Administration", "Office of...", "About the Dean"
-   - IF this is a LEADERSHIP/ADMIN page: Return empty professors array immediately.
-
-2. EXTRACT only ACTIVE RESEARCH FACULTY. For each person found:
-   - name: Real full name
-   - profile_url: Direct link to their individual profile page
-   - title: Academic title (Professor, Assistant Professor, Associate Professor, Lecturer)
-   - email: If visible
-   - snippet: Brief research description if visible
-
-CRITICAL EXCLUSIONS (Do NOT extract these people):
-- **ADMINISTRATORS**: Vice Chancellor, Provost, Dean, Associate Dean, Vice Dean, 
-  Chancellor, President, Vice President, Director (of office/program), Executive Director
-- **NON-RESEARCH STAFF**: Coordinator, Advisor, Counselor, HR, Administrative Assistant, 
-  Manager, Specialist, Analyst
-- **INACTIVE**: Alumni, Emeritus, Deceased, "In Memoriam", Historical figures
-- **STUDENTS**: Graduate students, PhD candidates, Postdocs, Interns, Fellows
-- **ORGANIZATIONS**: Names containing "Lab", "Center", "Institute", "Office", "Program"
-
-VALID TITLES TO INCLUDE:
-- Professor, Assistant Professor, Associate Professor
-- Research Professor, Clinical Professor, Teaching Professor
-- Lecturer, Senior Lecturer, Instructor
-- Research Scientist (only if they lead research)
-
-OUTPUT FORMAT:
-{{
-    "page_type": "Faculty Directory" or "Leadership Page" or "Other",
-    "professors": [
-        {{
-            "name": "<REAL_HUMAN_NAME>",
-            "profile_url": "<DIRECT_PROFILE_URL>",
-            "title": "<ACADEMIC_TITLE>",
-            "email": "<EMAIL_IF_FOUND>",
-            "snippet": "<RESEARCH_AREA>"
-        }}
-    ]
-}}
-
-If this is a LEADERSHIP page or NO research faculty found:
-{{"page_type": "Leadership Page", "professors": []}}
-"""
-
-PROMPT_PROFILE = """
-Extract detailed information about this professor from their profile page.
-
-Professor Name: {professor_name}
-Profile URL: {url}
-
-Page Content:
-{text_content}
-
-NOTE: The content may contain a section marked "=== EXTERNAL LAB WEBSITE CONTENT ===".
-This section contains data from the professor's personal lab website or research group page.
-PRIORITIZE this section for:
-- Research Summary (it is usually more up-to-date)
-- Keywords (extract specific technical terms from this section)
-- Recent News/Publications
-
-TASK:
-1. VERIFY STATUS: Is this person ACTIVE faculty?
-   - If Deceased, In Memoriam, Emeritus (inactive), or Alumni: RETURN JSON WITH ERROR.
-   - If they are a Grad Student, Staff, or Admin: RETURN JSON WITH ERROR.
-
-2. EXTRACT (If Active):
-   - title: Academic title
-   - department: Department name
-   - school: University name
-   - email: Email address
-   - summary: 3-5 sentence bio
-   - keywords: 5-7 research keywords
-   - links: Array of {{"label": "...", "url": "..."}}
-   
-3. SCORING (Relevance to User):
-   - USER SEARCH GOAL: "{user_search_prompt}"
-   - CALCULATION: How relevant is this professor's research to the user's goal?
-   - match_score: Integer 0-100 (100 = Perfect Match, 0 = Irrelevant)
-   - match_reasoning: 1 sentence explaining the score.
-    
-Return JSON (Valid Profile):
-{{
-    "professor_name": "{professor_name}",
-    "title": "...",
-    "department": "...",
-    "school": "...",
-    "email": "...",
-    "summary": "...",
-    "keywords": [...],
-    "links": [...],
-    "match_score": 85,
-    "match_reasoning": "Research in X strictly aligns with user's interest in Y."
-}}
-
-Return JSON (Invalid/Inactive):
-{{
-    "error": "Person is deceased/alumni/inactive"
-}}
-"""
+# Model tiers for the cascade: cheap models run first, the large tier is only
+# used when the small model's answer fails validation or reports low confidence.
+DEFAULT_SMALL_MODELS = [
+    "llama-3.1-8b-instant",
+]
+DEFAULT_LARGE_MODELS = [
+    "llama-3.3-70b-versatile",                         # Best for extraction
+    "meta-llama/llama-4-maverick-17b-128e-instruct",   # Better than scout
+]
+DEFAULT_CASCADE_TASKS = ["discovery", "profile", "resume"]
+
+# Page text sent to the LLM (benchmarks/html_hot_paths.py measures these)
+DISCOVERY_NOISE_TAGS = ["script", "style", "nav", "footer", "header", "aside", "form", "noscript", "iframe", "svg", "button", "input"]
+PROFILE_NOISE_TAGS = ["script", "style", "nav", "footer"]
+DISCOVERY_TEXT_CHARS = 15000  # Increased limit slightly for long directories
+PROFILE_TEXT_CHARS = 6000
+
+
+def discovery_text(html_content: str) -> str:
+    """Directory page text for the discovery prompt, one element per line."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html_content, 'html.parser')
+
+    # Remove noisy elements that confuse the LLM
+    for tag in soup(DISCOVERY_NOISE_TAGS):
+        tag.decompose()
+
+    # Use newline separator to preserve list structure (CRITICAL for directories)
+    text_content = soup.get_text(separator='\n', strip=True)
+
+    # Clean up excessive newlines/spaces
+    text_content = re.sub(r'\n\s*\n', '\n', text_content)
+    return text_content[:DISCOVERY_TEXT_CHARS]
+
+
+def profile_text(html_content: str) -> str:
+    """Profile page text for the profile prompt."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html_content, 'html.parser')
+    for script in soup(PROFILE_NOISE_TAGS):
+        script.decompose()
+    return soup.get_text(separator=' ', strip=True)[:PROFILE_TEXT_CHARS]
+
+
+def _env_list(name: str, default: List[str]) -> List[str]:
+    raw = os.environ.get(name)
+    if raw is None:
+        return list(default)
+    return [item.strip() for item in raw.split(",") if item.strip()]
 
-# ==============================================================================
-# SERVICE
-# ==============================================================================
 
 class LLMService:
     def __init__(self):
@@ -152,37 +76,153 @@ class LLMService:
         if use_local:
             self.base_url = "http://localhost:11434/v1"
             self.api_key = "ollama"
-            self.available_models = ["phi3"]
+            small_models = _env_list("LLM_SMALL_MODELS", ["phi3"])
+            large_models = _env_list("LLM_LARGE_MODELS", ["phi3"])
             logger.info("Using LOCAL Ollama LLM")
         else:
             self.base_url = os.environ.get("LLM_BASE_URL", "https://api.groq.com/openai/v1")
             self.api_key = os.environ.get("LLM_API_KEY", "")
             # Only models that actually work on Groq
-            self.available_models = [
-                "llama-3.3-70b-versatile",                         # Best for extraction
-                "meta-llama/llama-4-maverick-17b-128e-instruct",   # Better than scout
-            ]
+            small_models = _env_list("LLM_SMALL_MODELS", DEFAULT_SMALL_MODELS)
+            large_models = _env_list("LLM_LARGE_MODELS", DEFAULT_LARGE_MODELS)
             logger.info("Using CLOUD Groq LLM")
+
+        self.model_tiers = {"small": small_models, "large": large_models}
+        self.available_models = self.model_tiers["large"]
+
+        # Cascade configuration
+        cascade_enabled = os.environ.get("LLM_CASCADE_ENABLED", "true").lower() == "true"
+        self.cascade_tasks = set(_env_list("LLM_CASCADE_TASKS", DEFAULT_CASCADE_TASKS)) if cascade_enabled else set()
+        self.min_confidence = float(os.environ.get("LLM_CASCADE_MIN_CONFIDENCE", "0.6"))
         
-        self.client = AsyncOpenAI(base_url=self.base_url, api_key=self.api_key)
-        self.current_model_index = 0
-        self.rate_limit_time = 0  # Track when we got rate limited
+        self._client = None  # AsyncOpenAI, created on first use (importing openai is slow)
+        self.current_model_index = {tier: 0 for tier in self.model_tiers}
+        self.rate_limit_time = {tier: 0 for tier in self.model_tiers}  # Track when we got rate limited
+
+        # Per-tier usage and cascade escalation stats
+        self.usage = {
+            tier: {"calls": 0, "failures": 0, "prompt_tokens": 0, "completion_tokens": 0}
+            for tier in self.model_tiers
+        }
+        self.cascade_stats = {"attempts": 0, "escalations": 0, "reasons": {}}
+        # Per prompt version (e.g. discovery@v2): its static prefix hash, calls and tokens
+        self.prompt_usage: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import AsyncOpenAI
+
+            self._client = AsyncOpenAI(base_url=self.base_url, api_key=self.api_key)
+        return self._client
+
+    @client.setter
+    def client(self, client) -> None:
+        self._client = client
 
-    async def _call_llm(self, messages: List[Dict], on_log=None, log_prefix="") -> Optional[Dict]:
+    def _record_usage(self, tier: str, usage, model: str, task: str = "other") -> None:
+        records = [self.usage[tier]]
+        if task in PROMPTS:
+            template = get_prompt(task)
+            records.append(self.prompt_usage.setdefault(template.key, {
+                "prefix_hash": template.prefix_hash, "calls": 0, "prompt_tokens": 0, "completion_tokens": 0
+            }))
+        prompt_tokens = (getattr(usage, "prompt_tokens", 0) or 0) if usage is not None else 0
+        completion_tokens = (getattr(usage, "completion_tokens", 0) or 0) if usage is not None else 0
+        for stats in records:
+            stats["calls"] += 1
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+        if usage is not None:
+            LLM_TOKENS.inc(prompt_tokens, model=model, direction="in")
+            LLM_TOKENS.inc(completion_tokens, model=model, direction="out")
+
+    @staticmethod
+    def _record_attempt(model: str, task: str, started: float, outcome: str, tier: str, fallback: bool, usage=None) -> None:
+        """Latency of one model attempt; `fallback` when the request moves on to the tier's next model."""
+        LLM_SECONDS.observe(time.perf_counter() - started, model=model, prompt=task, outcome=outcome)
+        record_span("llm", started, model=model, prompt=task, tier=tier, outcome=outcome,
+                    prompt_tokens=getattr(usage, "prompt_tokens", None),
+                    completion_tokens=getattr(usage, "completion_tokens", None))
+        if outcome == "rate_limited":
+            LLM_RATE_LIMITED.inc(model=model)
+        if fallback and outcome != "ok":
+            LLM_FALLBACKS.inc(tier=tier, reason=outcome)
+
+    def get_usage_report(self) -> Dict[str, Any]:
+        """Per-tier call/token counts and cascade escalation rate."""
+        attempts = self.cascade_stats["attempts"]
+        return {
+            "prompts": {name: get_prompt(name).key for name in ("discovery", "profile", "resume")},
+            "prompt_usage": {key: dict(stats) for key, stats in self.prompt_usage.items()},
+            "tiers": {
+                tier: {"models": self.model_tiers[tier], **stats}
+                for tier, stats in self.usage.items()
+            },
+            "cascade": {
+                "tasks": sorted(self.cascade_tasks),
+                "attempts": attempts,
+                "escalations": self.cascade_stats["escalations"],
+                "escalation_rate": round(self.cascade_stats["escalations"] / attempts, 3) if attempts else 0.0,
+                "reasons": dict(self.cascade_stats["reasons"]),
+            },
+        }
+
+    def _escalation_reason(self, data: Any, validate=None) -> Optional[str]:
+        """Why a small-tier answer should be redone on the large tier (None = accept)."""
+        if data is None:
+            return "no_result"
+        if validate:
+            reason = validate(data)
+            if reason:
+                return reason
+        confidence = data.get("confidence") if isinstance(data, dict) else None
+        if isinstance(confidence, (int, float)) and confidence < self.min_confidence:
+            return "low_confidence"
+        return None
+
+    async def _cascade(self, task: str, run, validate=None, on_log=None, log_prefix="") -> Optional[Any]:
+        """
+        Run `run(tier)` on the small tier first and escalate to the large tier
+        only if the result fails `validate` (which returns a reason string or
+        None) or reports low confidence.
+        """
+        if task not in self.cascade_tasks or not self.model_tiers["small"]:
+            return await run("large")
+
+        self.cascade_stats["attempts"] += 1
+        data = await run("small")
+        reason = self._escalation_reason(data, validate)
+        if reason is None:
+            return data
+
+        self.cascade_stats["escalations"] += 1
+        self.cascade_stats["reasons"][reason] = self.cascade_stats["reasons"].get(reason, 0) + 1
+        LLM_ESCALATIONS.inc(prompt=task, reason=reason)
+        logger.info(f"{log_prefix}escalating {task} to large model ({reason})")
+        if on_log:
+            await on_log(json.dumps({"type": "debug", "message": f"{log_prefix}Escalating to large model ({reason})..."}))
+
+        escalated = await run("large")
+        return escalated if escalated is not None else data
+
+    async def _call_llm(self, messages: List[Dict], on_log=None, log_prefix="", tier: str = "large", task: str = "other") -> Optional[Dict]:
         """Helper to call LLM with retry logic and JSON parsing."""
-        import time
+        models = self.model_tiers[tier]
         
         # Reset model index after 60 seconds of cooldown
-        if time.time() - self.rate_limit_time > 60:
-            self.current_model_index = 0
+        if time.time() - self.rate_limit_time[tier] > 60:
+            self.current_model_index[tier] = 0
         
-        for i in range(len(self.available_models)):
-            model_idx = (self.current_model_index + i) % len(self.available_models)
-            model = self.available_models[model_idx]
+        for i in range(len(models)):
+            model_idx = (self.current_model_index[tier] + i) % len(models)
+            model = models[model_idx]
+            has_next = i + 1 < len(models)
+            started = time.perf_counter()
             
             try:
                 if on_log:
-                    await on_log(json.dumps({"type": "info", "message": f"{log_prefix}Analyzing with {model}..."}))
+                    await on_log(json.dumps({"type": "debug", "message": f"{log_prefix}Analyzing with {model}..."}))
                 
                 # Try with JSON mode first, fall back to regular if not supported
                 try:
@@ -196,7 +236,7 @@ class LLMService:
                     if "json" in str(json_err).lower() or "response_format" in str(json_err).lower():
                         # Model doesn't support JSON mode, try without it
                         if on_log:
-                            await on_log(json.dumps({"type": "info", "message": f"Retrying without JSON mode..."}))
+                            await on_log(json.dumps({"type": "debug", "message": f"Retrying without JSON mode..."}))
                         response = await self.client.chat.completions.create(
                             model=model,
                             messages=messages,
@@ -204,77 +244,217 @@ class LLMService:
                         )
                     else:
                         raise json_err
+
+                usage = getattr(response, "usage", None)
+                self._record_usage(tier, usage, model, task)
                 
                 content = response.choices[0].message.content
                 if not content: 
+                    self._record_attempt(model, task, started, "empty", tier, has_next, usage)
                     continue  # Try next model
                 
-                # Parse JSON from response
-                try:
-                    return json.loads(content)
-                except json.JSONDecodeError:
-                    # Try to extract JSON from markdown code block
-                    if "```json" in content:
-                        json_str = content.split("```json")[1].split("```")[0].strip()
-                        return json.loads(json_str)
-                    elif "```" in content:
-                        json_str = content.split("```")[1].split("```")[0].strip()
-                        return json.loads(json_str)
-                    else:
-                        logger.error(f"Failed to parse JSON from: {content[:200]}")
-                        continue  # Try next model
+                # Parse JSON from response (tolerates markdown code blocks)
+                parsed = parse_json_content(content)
+                if parsed is None:
+                    logger.error(f"Failed to parse JSON from: {content[:200]}")
+                    self._record_attempt(model, task, started, "invalid_json", tier, has_next, usage)
+                    continue  # Try next model
+                self._record_attempt(model, task, started, "ok", tier, has_next, usage)
+                return parsed
 
             except Exception as e:
+                self.usage[tier]["failures"] += 1
                 error_str = str(e)
                 # Handle Rate Limits
                 if "429" in error_str or "rate_limit" in error_str.lower():
-                    self.current_model_index = (model_idx + 1) % len(self.available_models)
-                    self.rate_limit_time = time.time()
+                    self._record_attempt(model, task, started, "rate_limited", tier, has_next)
+                    self.current_model_index[tier] = (model_idx + 1) % len(models)
+                    self.rate_limit_time[tier] = time.time()
                     if on_log:
                         await on_log(json.dumps({"type": "status", "message": f"Rate limit hit. Switching to next model..."}))
                     continue  # Try next model
                 
                 logger.error(f"LLM Error ({model}): {e}")
+                self._record_attempt(model, task, started, "error", tier, has_next)
                 if on_log:
                     await on_log(json.dumps({"type": "error", "message": f"Issue: {str(e)[:50]}"}))
                 continue  # Try next model instead of returning None
         
         return None  # All models failed
 
+    async def _stream_llm(self, messages: List[Dict], parser: JSONArrayStreamParser, on_item=None, on_log=None, log_prefix="", tier: str = "large", task: str = "other") -> Optional[Dict]:
+        """
+        Streaming variant of _call_llm.
+        Feeds completion chunks into `parser` and awaits `on_item` for every array
+        element as soon as it is complete. Returns the fully parsed document.
+        Falls back to the next model only if nothing has been emitted yet.
+        """
+        models = self.model_tiers[tier]
+
+        if time.time() - self.rate_limit_time[tier] > 60:
+            self.current_model_index[tier] = 0
+
+        for i in range(len(models)):
+            model_idx = (self.current_model_index[tier] + i) % len(models)
+            model = models[model_idx]
+            has_next = i + 1 < len(models)
+            started = time.perf_counter()
+
+            try:
+                if on_log:
+                    await on_log(json.dumps({"type": "debug", "message": f"{log_prefix}Streaming from {model}..."}))
+
+                try:
+                    stream = await self.client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=0.1,
+                        response_format={"type": "json_object"},
+                        stream=True,
+                        stream_options={"include_usage": True}
+                    )
+                except Exception as json_err:
+                    if "json" in str(json_err).lower() or "response_format" in str(json_err).lower():
+                        stream = await self.client.chat.completions.create(
+                            model=model,
+                            messages=messages,
+                            temperature=0.1,
+                            stream=True,
+                            stream_options={"include_usage": True}
+                        )
+                    else:
+                        raise json_err
+
+                usage = None
+                async for chunk in stream:
+                    # Usage arrives on a final chunk with no choices (requested via include_usage)
+                    usage = getattr(chunk, "usage", None) or usage
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if not delta:
+                        continue
+                    for item in parser.feed(delta):
+                        if on_item:
+                            await on_item(item)
+                self._record_usage(tier, usage, model, task)
+
+                parsed = parser.result()
+                if parsed is None:
+                    if parser.items_emitted:
+                        # Truncated/garbled tail, but the elements we got are valid
+                        self._record_attempt(model, task, started, "truncated", tier, False, usage)
+                        return {parser.key: []}
+                    logger.error(f"Failed to parse streamed JSON from: {parser.text[:200]}")
+                    self._record_attempt(model, task, started, "invalid_json", tier, has_next, usage)
+                    parser.reset()
+                    continue  # Try next model
+                self._record_attempt(model, task, started, "ok", tier, has_next, usage)
+                return parsed
+
+            except Exception as e:
+                self.usage[tier]["failures"] += 1
+                if parser.items_emitted:
+                    # Mid-stream failure: keep what was already delivered
+                    logger.warning(f"LLM stream interrupted ({model}) after {parser.items_emitted} items: {e}")
+                    self._record_attempt(model, task, started, "truncated", tier, False)
+                    return {parser.key: []}
+
+                parser.reset()
+                error_str = str(e)
+                if "429" in error_str or "rate_limit" in error_str.lower():
+                    self._record_attempt(model, task, started, "rate_limited", tier, has_next)
+                    self.current_model_index[tier] = (model_idx + 1) % len(models)
+                    self.rate_limit_time[tier] = time.time()
+                    if on_log:
+                        await on_log(json.dumps({"type": "status", "message": f"Rate limit hit. Switching to next model..."}))
+                    continue
+
+                logger.error(f"LLM Stream Error ({model}): {e}")
+                self._record_attempt(model, task, started, "error", tier, has_next)
+                if on_log:
+                    await on_log(json.dumps({"type": "error", "message": f"Issue: {str(e)[:50]}"}))
+                continue
+
+        return None  # All models failed
+
     async def parse_resume(self, resume_text: str) -> Dict[str, Any]:
-        prompt = PROMPT_RESUME.format(resume_text=resume_text[:10000])
-        result = await self._call_llm([{"role": "user", "content": prompt}])
+        messages = render_prompt("resume", resume_text=resume_text[:10000])
+
+        def validate(data):
+            if not isinstance(data, dict) or not isinstance(data.get("keywords"), list):
+                return "schema_error"
+            if not data["keywords"] or not data.get("summary"):
+                return "empty_result"
+            return None
+
+        result = await self._cascade(
+            "resume",
+            lambda tier: self._call_llm(messages, tier=tier, task="resume"),
+            validate
+        )
         return result or {"keywords": [], "summary": "Failed to analyze resume."}
 
-    async def discover_professors(self, html_content: str, url: str, on_log=None, major: str = None, candidate_links: List[str] = []) -> List[Dict[str, str]]:
-        """PHASE 1: Directory Scan - Extract professors from a page."""
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Remove noisy elements that confuse the LLM
-        for tag in soup(["script", "style", "nav", "footer", "header", "aside", "form", "noscript", "iframe", "svg", "button", "input"]):
-            tag.decompose()
-            
-        # Use newline separator to preserve list structure (CRITICAL for directories)
-        text_content = soup.get_text(separator='\n', strip=True)
-        
-        # Clean up excessive newlines/spaces
-        import re
-        text_content = re.sub(r'\n\s*\n', '\n', text_content)
-        text_content = text_content[:15000]  # Increased limit slightly for long directories
+    async def discover_professors(self, html_content: str, url: str, on_log=None, major: str = None, candidate_links: List[str] = [], on_professor=None, accept_professor=None) -> List[Dict[str, str]]:
+        """
+        PHASE 1: Directory Scan - Extract professors from a page.
+        If `on_professor` is given, the completion is streamed and it is awaited
+        with each professor dict as soon as that element has been generated.
+        Small-tier professors are held back until the cascade accepts that
+        answer, so an escalated page never mixes both tiers' professors;
+        `accept_professor` (the caller's name filter, without side effects)
+        counts their rejections meanwhile.
+        """
+        with PARSE_SECONDS.time(stage="discovery"), span("parse", stage="discovery"):
+            text_content = discovery_text(html_content)
         major_str = str(major or "All Departments")
         
-        prompt = PROMPT_DISCOVERY.format(
+        messages = render_prompt(
+            "discovery",
             url=url,
             text_content=text_content,
             major=major_str
         )
         
-        messages = [
-            {"role": "system", "content": "You are a data extraction assistant. Output valid JSON only."},
-            {"role": "user", "content": prompt}
-        ]
-        
-        data = await self._call_llm(messages, on_log, log_prefix="Discovery: ")
+        # on_professor returns False for stubs the caller's name filter rejected;
+        # a mostly-rejected small-model answer is escalated to the large tier
+        counts = {"accepted": 0, "rejected": 0}
+        held: List[Dict[str, Any]] = []  # Small-tier professors, emitted once that answer is accepted
+        answers: Dict[str, Any] = {}
+
+        async def run(tier):
+            counts["accepted"] = counts["rejected"] = 0
+            if not on_professor:
+                return await self._call_llm(messages, on_log, log_prefix="Discovery: ", tier=tier, task="discovery")
+
+            async def on_item(prof):
+                if tier == "small":
+                    held.append(prof)
+                    accepted = accept_professor(prof) if accept_professor else True
+                else:
+                    accepted = await on_professor(prof)
+                counts["accepted" if accepted is not False else "rejected"] += 1
+
+            parser = JSONArrayStreamParser("professors")
+            answers[tier] = await self._stream_llm(messages, parser, on_item, on_log, log_prefix="Discovery: ", tier=tier, task="discovery")
+            return answers[tier]
+
+        def validate(data):
+            if isinstance(data, list):
+                data = {"professors": data}
+            if not isinstance(data, dict) or not isinstance(data.get("professors"), list):
+                return "schema_error"
+            if counts["rejected"] >= 3 and counts["rejected"] > counts["accepted"]:
+                return "name_filter_rejections"
+            page_type = str(data.get("page_type") or "")
+            if not data["professors"] and not counts["accepted"] and (not page_type or "directory" in page_type.lower()):
+                return "empty_result"
+            return None
+
+        data = await self._cascade("discovery", run, validate, on_log, log_prefix="Discovery: ")
+        if held and data is not None and data is answers.get("small"):
+            for prof in held:
+                await on_professor(prof)
         
         if not data:
             return {"professors": [], "is_profile_page": False}
@@ -287,26 +467,35 @@ class LLMService:
 
     async def extract_profile(self, html_content: str, url: str, professor_name: str = "Unknown", on_log=None, user_prompt: str = None) -> Dict[str, Any]:
         """PHASE 2: Deep Profile Extraction"""
-        soup = BeautifulSoup(html_content, 'html.parser')
-        for script in soup(["script", "style", "nav", "footer"]):
-            script.decompose()
-        
-        text_content = soup.get_text(separator=' ', strip=True)[:6000]
+        with PARSE_SECONDS.time(stage="profile"), span("parse", stage="profile"):
+            text_content = profile_text(html_content)
         
         # If no user prompt is provided, default to general research relevance
         prompt_criteria = user_prompt if user_prompt else "General academic research relevance"
 
-        formatted_prompt = PROMPT_PROFILE.replace("{professor_name}", professor_name)\
-                                         .replace("{url}", url)\
-                                         .replace("{text_content}", text_content)\
-                                         .replace("{user_search_prompt}", prompt_criteria)
-        
-        messages = [
-            {"role": "system", "content": "Output valid JSON only. Extract as much detail as possible."},
-            {"role": "user", "content": formatted_prompt}
-        ]
+        messages = render_prompt(
+            "profile",
+            professor_name=professor_name,
+            url=url,
+            user_search_prompt=prompt_criteria,
+            text_content=text_content
+        )
         
-        data = await self._call_llm(messages, on_log, log_prefix="Profile: ")
+        def validate(data):
+            if not isinstance(data, dict):
+                return "schema_error"
+            if data.get("error"):
+                # Dropping a professor is costly; confirm on the large tier
+                return "status_rejected"
+            if not data.get("summary") or not data.get("keywords"):
+                return "incomplete_profile"
+            return None
+
+        data = await self._cascade(
+            "profile",
+            lambda tier: self._call_llm(messages, on_log, log_prefix="Profile: ", tier=tier, task="profile"),
+            validate, on_log, log_prefix="Profile: "
+        )
         
         if not data:
             return {"professor_name": professor_name, "error": "Extraction failed"}
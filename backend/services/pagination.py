@@ -0,0 +1,36 @@
+import base64
+import json
+from typing import Any, List, Optional
+
+# Columns for the lightweight card list view (no evidence_snippets/recent_papers/links)
+CARD_LIST_COLUMNS = [
+    "id", "session_id", "professor_name", "title", "department", "school",
+    "primary_url", "keywords", "match_score", "created_at",
+]
+
+# Keyset columns used for cursor paging of cards
+CARD_CURSOR_COLUMNS = ("created_at", "id")
+# Keyset columns of a user's ranked feed (user_feed rows, best first)
+FEED_CURSOR_COLUMNS = ("score", "professor_card_id")
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """Opaque cursor from the keyset values of the last row on a page."""
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], columns=CARD_CURSOR_COLUMNS) -> Optional[List[Any]]:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError("Invalid cursor")
+    return values
@@ -0,0 +1,244 @@
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+# ==============================================================================
+# PROMPT REGISTRY
+# ==============================================================================
+# Templates are versioned and laid out for provider prefix caching: the system
+# message and all static instructions come first and never change between
+# requests; per-request values are appended at the very end in a fixed order.
+# Static text is never passed through .format, so JSON braces need no escaping.
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    name: str
+    version: str
+    system: Optional[str]
+    instructions: str
+    # Ordered (label, variable) pairs appended after the static instructions
+    variables: Tuple[Tuple[str, str], ...]
+
+    @property
+    def key(self) -> str:
+        """Stable identifier for cache keys and benchmark reports, e.g. 'discovery@v2'."""
+        return f"{self.name}@{self.version}"
+
+    @property
+    def prefix_hash(self) -> str:
+        """Hash of the static (cacheable) prefix."""
+        static = f"{self.system or ''}\x00{self.instructions}"
+        return hashlib.sha256(static.encode("utf-8")).hexdigest()[:12]
+
+    def render(self, **values) -> List[Dict[str, str]]:
+        """Build chat messages; output depends only on the template and `values`."""
+        missing = [var for _, var in self.variables if var not in values]
+        if missing:
+            raise KeyError(f"Prompt {self.key} missing values: {', '.join(missing)}")
+
+        parts = [self.instructions.strip(), ""]
+        for label, var in self.variables:
+            parts.append(f"{label}:")
+            parts.append(str(values[var]))
+            parts.append("")
+        user_content = "\n".join(parts).rstrip() + "\n"
+
+        messages = []
+        if self.system:
+            messages.append({"role": "system", "content": self.system})
+        messages.append({"role": "user", "content": user_content})
+        return messages
+
+
+PROMPTS: Dict[str, Dict[str, PromptTemplate]] = {}
+
+
+def register_prompt(template: PromptTemplate) -> PromptTemplate:
+    PROMPTS.setdefault(template.name, {})[template.version] = template
+    return template
+
+
+def _version_sort_key(version: str):
+    digits = version.lstrip("v")
+    return int(digits) if digits.isdigit() else -1
+
+
+def get_prompt(name: str, version: Optional[str] = None) -> PromptTemplate:
+    """Look up a template; defaults to PROMPT_VERSIONS override, then the latest version."""
+    versions = PROMPTS.get(name)
+    if not versions:
+        raise KeyError(f"Unknown prompt: {name}")
+    version = version or _pinned_versions().get(name)
+    if version:
+        if version not in versions:
+            raise KeyError(f"Unknown prompt version: {name}@{version}")
+        return versions[version]
+    return versions[max(versions, key=_version_sort_key)]
+
+
+def render_prompt(name: str, version: Optional[str] = None, **values) -> List[Dict[str, str]]:
+    return get_prompt(name, version).render(**values)
+
+
+def _pinned_versions() -> Dict[str, str]:
+    """PROMPT_VERSIONS=discovery=v2,profile=v2 pins versions (e.g. for A/B benchmarks)."""
+    pins = {}
+    for item in os.environ.get("PROMPT_VERSIONS", "").split(","):
+        if "=" in item:
+            name, version = item.split("=", 1)
+            pins[name.strip()] = version.strip()
+    return pins
+
+
+# ==============================================================================
+# TEMPLATES
+# ==============================================================================
+
+register_prompt(PromptTemplate(
+    name="resume",
+    version="v2",
+    system=None,
+    instructions="""
+Analyze the Resume/CV text given at the end of this message to assist a student in finding a relevant research lab.
+
+TASK:
+1. Extract the top 4-5 technical "Experience/Interest" Keywords (e.g. "Computer Vision", "React", "CRISPR").
+2. Write a 1-sentence "Custom Prompt" summary describing what kind of research they are looking for based on their experience.
+   (e.g. "I am looking for a lab focused on AI and NLP, specifically dealing with large language models.")
+
+Return JSON:
+{
+    "keywords": ["Keyword1", "Keyword2", ...],
+    "summary": "Full sentence summary..."
+}
+""",
+    variables=(
+        ("Resume Content", "resume_text"),
+    ),
+))
+
+register_prompt(PromptTemplate(
+    name="discovery",
+    version="v2",
+    system="You are a data extraction assistant. Output valid JSON only.",
+    instructions="""
+You are extracting RESEARCH FACULTY information from a university webpage.
+The page URL, FILTER_TOPIC and page content are given at the end of this message.
+
+YOUR TASK:
+1. ANALYZE: Does this page contain RESEARCH FACULTY (Professors who conduct research)?
+   - GOOD pages: "Faculty Directory", "Our Faculty", "Research Faculty", "People > Faculty"
+   - BAD pages: "Leadership", "Administration", "Office of...", "About the Dean"
+   - IF this is a LEADERSHIP/ADMIN page: Return empty professors array immediately.
+
+2. EXTRACT only ACTIVE RESEARCH FACULTY. For each person found:
+   - name: Real full name
+   - profile_url: Direct link to their individual profile page
+   - title: Academic title (Professor, Assistant Professor, Associate Professor, Lecturer)
+   - email: If visible
+   - snippet: Brief research description if visible
+
+CRITICAL EXCLUSIONS (Do NOT extract these people):
+- **ADMINISTRATORS**: Vice Chancellor, Provost, Dean, Associate Dean, Vice Dean,
+  Chancellor, President, Vice President, Director (of office/program), Executive Director
+- **NON-RESEARCH STAFF**: Coordinator, Advisor, Counselor, HR, Administrative Assistant,
+  Manager, Specialist, Analyst
+- **INACTIVE**: Alumni, Emeritus, Deceased, "In Memoriam", Historical figures
+- **STUDENTS**: Graduate students, PhD candidates, Postdocs, Interns, Fellows
+- **ORGANIZATIONS**: Names containing "Lab", "Center", "Institute", "Office", "Program"
+
+VALID TITLES TO INCLUDE:
+- Professor, Assistant Professor, Associate Professor
+- Research Professor, Clinical Professor, Teaching Professor
+- Lecturer, Senior Lecturer, Instructor
+- Research Scientist (only if they lead research)
+
+OUTPUT FORMAT:
+{
+    "page_type": "Faculty Directory" or "Leadership Page" or "Other",
+    "confidence": <0.0-1.0, how sure you are the list is complete and correct>,
+    "professors": [
+        {
+            "name": "<REAL_HUMAN_NAME>",
+            "profile_url": "<DIRECT_PROFILE_URL>",
+            "title": "<ACADEMIC_TITLE>",
+            "email": "<EMAIL_IF_FOUND>",
+            "snippet": "<RESEARCH_AREA>"
+        }
+    ]
+}
+
+If this is a LEADERSHIP page or NO research faculty found:
+{"page_type": "Leadership Page", "professors": []}
+""",
+    variables=(
+        ("URL", "url"),
+        ("FILTER_TOPIC", "major"),
+        ("Page Content", "text_content"),
+    ),
+))
+
+register_prompt(PromptTemplate(
+    name="profile",
+    version="v2",
+    system="Output valid JSON only. Extract as much detail as possible.",
+    instructions="""
+Extract detailed information about a professor from their profile page.
+The professor name, profile URL, USER SEARCH GOAL and page content are given at the end of this message.
+
+NOTE: The content may contain a section marked "=== EXTERNAL LAB WEBSITE CONTENT ===".
+This section contains data from the professor's personal lab website or research group page.
+PRIORITIZE this section for:
+- Research Summary (it is usually more up-to-date)
+- Keywords (extract specific technical terms from this section)
+- Recent News/Publications
+
+TASK:
+1. VERIFY STATUS: Is this person ACTIVE faculty?
+   - If Deceased, In Memoriam, Emeritus (inactive), or Alumni: RETURN JSON WITH ERROR.
+   - If they are a Grad Student, Staff, or Admin: RETURN JSON WITH ERROR.
+
+2. EXTRACT (If Active):
+   - title: Academic title
+   - department: Department name
+   - school: University name
+   - email: Email address
+   - summary: 3-5 sentence bio
+   - keywords: 5-7 research keywords
+   - links: Array of {"label": "...", "url": "..."}
+
+3. SCORING (Relevance to User):
+   - CALCULATION: How relevant is this professor's research to the USER SEARCH GOAL?
+   - match_score: Integer 0-100 (100 = Perfect Match, 0 = Irrelevant)
+   - match_reasoning: 1 sentence explaining the score.
+   - confidence: 0.0-1.0, how sure you are about the status and extracted details.
+
+Return JSON (Valid Profile):
+{
+    "professor_name": "<PROFESSOR_NAME>",
+    "title": "...",
+    "department": "...",
+    "school": "...",
+    "email": "...",
+    "summary": "...",
+    "keywords": [...],
+    "links": [...],
+    "match_score": 85,
+    "match_reasoning": "Research in X strictly aligns with user's interest in Y.",
+    "confidence": 0.9
+}
+
+Return JSON (Invalid/Inactive):
+{
+    "error": "Person is deceased/alumni/inactive"
+}
+""",
+    variables=(
+        ("Professor Name", "professor_name"),
+        ("Profile URL", "url"),
+        ("USER SEARCH GOAL", "user_search_prompt"),
+        ("Page Content", "text_content"),
+    ),
+))
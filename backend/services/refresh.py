@@ -0,0 +1,389 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from services.feed import get_feed_indexer, professor_key
+from services.ingest import canonical_url
+from services.llm import discovery_text, profile_text
+
+logger = logging.getLogger(__name__)
+
+# Refresh finished sessions this many hours after their pages were last read (0 disables the schedule)
+REFRESH_INTERVAL_HOURS = float(os.environ.get("REFRESH_INTERVAL_HOURS", "0"))
+REFRESH_POLL_SECONDS = float(os.environ.get("REFRESH_POLL_SECONDS", "300"))
+# Sessions the scheduler refreshes at once, and pages fetched/extracted at once per refresh
+REFRESH_CONCURRENCY = int(os.environ.get("REFRESH_CONCURRENCY", "2"))
+REFRESH_PAGE_CONCURRENCY = int(os.environ.get("REFRESH_PAGE_CONCURRENCY", "4"))
+# Profile extractions (LLM calls) per refresh; the rest are picked up by the next one
+REFRESH_MAX_EXTRACTIONS = int(os.environ.get("REFRESH_MAX_EXTRACTIONS", "30"))
+
+PAGE_COLUMNS = "url,kind,content_hash,professor_key,professors"
+# Card columns a refresh compares, and writes when they changed
+CARD_DIFF_COLUMNS = ("professor_name", "title", "department", "school", "primary_url", "links",
+                     "summary", "keywords", "match_score")
+
+
+class RefreshConflict(Exception):
+    """The session can't be refreshed now (not finished, or already refreshing)."""
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+# ========== PAGE HASHES ==========
+
+def page_fingerprint(html: str, kind: str) -> str:
+    """
+    SHA-256 of the text the LLM reads from the page, so changes to markup,
+    scripts or navigation alone don't count as a change.
+    """
+    text = discovery_text(html) if kind == "directory" else profile_text(html)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def page_record(url: str, kind: str, html: str, professor: Optional[str] = None,
+                professors: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """A crawl_pages row: a directory page with the professors it lists, or one professor's profile page."""
+    return {
+        "url": canonical_url(url),
+        "kind": kind,
+        "content_hash": page_fingerprint(html, kind),
+        "professor_key": professor_key(professor) if professor else None,
+        "professors": professors,
+    }
+
+
+def stub_summary(stub: Dict[str, Any]) -> Dict[str, Any]:
+    """The parts of a discovery stub kept with its directory page (enough to investigate it later)."""
+    return {k: stub.get(k) for k in ("name", "profile_url", "source_url", "title", "snippet")}
+
+
+async def save_crawl_pages(client, session_id, records: Iterable[Dict[str, Any]]) -> None:
+    """Upsert page hashes for a session (one bulk write); a failure only costs the next refresh more work."""
+    checked_at = _now().isoformat()
+    rows = {r["url"]: {**r, "session_id": str(session_id), "checked_at": checked_at} for r in records}
+    if not rows:
+        return
+    try:
+        await client.table("crawl_pages").upsert(list(rows.values()), on_conflict="session_id,url").execute()
+    except Exception as e:
+        logger.error(f"Could not save page hashes for session {session_id}: {e}")
+
+
+# ========== REFRESH ==========
+
+class SessionRefresher:
+    """
+    Incremental re-crawl of a finished session. Directory pages are fetched
+    again and compared by content hash; only changed ones go through LLM
+    discovery. Professors who appeared get new cards, professors whose profile
+    page changed are re-extracted and only their changed card columns are
+    written, and professors no longer listed are retired (retired_at) rather
+    than deleted, so swipes and drafts keep their card.
+    """
+
+    def __init__(self, crawler, page_concurrency: int = REFRESH_PAGE_CONCURRENCY,
+                 max_extractions: int = REFRESH_MAX_EXTRACTIONS):
+        self.crawler = crawler
+        self.client = crawler.supabase
+        self.page_concurrency = page_concurrency
+        self.max_extractions = max_extractions
+        self._active: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def is_refreshing(self, session_id) -> bool:
+        return str(session_id) in self._active
+
+    async def claim(self, session_id, refreshed_at: Optional[str]) -> bool:
+        """
+        Move a finished session's refreshed_at forward if it is still the value
+        read earlier; False when another process claimed (or changed) it first.
+        """
+        query = self.client.table("scrape_sessions").update({"refreshed_at": _now().isoformat()}) \
+            .eq("id", str(session_id)).eq("status", "done")
+        query = query.eq("refreshed_at", refreshed_at) if refreshed_at else query.is_("refreshed_at", "null")
+        claimed = await query.execute()
+        return bool(claimed.data)
+
+    async def refresh(self, session_id, log_callback=None) -> Dict[str, int]:
+        """Refresh one session; returns counts of pages checked and cards added, updated and retired."""
+        session_id = str(session_id)
+        if session_id in self._active:
+            raise RefreshConflict("Session is already refreshing")
+        self._active.add(session_id)
+        try:
+            return await self._refresh(session_id, log_callback)
+        finally:
+            self._active.discard(session_id)
+
+    def start(self, session_id, event_buses) -> asyncio.Task:
+        """Refresh in the background, streaming progress to the session's event bus."""
+        session_id = str(session_id)
+        if session_id in self._active:
+            raise RefreshConflict("Session is already refreshing")
+        bus = event_buses.create(session_id)
+
+        async def run():
+            try:
+                await self.refresh(session_id, bus.publish)
+            except Exception as e:
+                logger.error(f"Refresh of session {session_id} failed: {e}")
+                await bus.publish(json.dumps({"type": "error", "message": f"Refresh failed: {e}"}))
+            finally:
+                await event_buses.close(session_id, linger=60)
+
+        task = asyncio.get_running_loop().create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _refresh(self, session_id: str, log_callback=None) -> Dict[str, int]:
+        async def log(payload):
+            if log_callback:
+                await log_callback(json.dumps(payload))
+
+        session_res, pages_res, cards_res = await asyncio.gather(
+            self.client.table("scrape_sessions").select("id,status,root_urls,major,custom_prompt")
+                .eq("id", session_id).execute(),
+            self.client.table("crawl_pages").select(PAGE_COLUMNS).eq("session_id", session_id).execute(),
+            self.client.table("professor_cards").select(["id", *CARD_DIFF_COLUMNS])
+                .eq("session_id", session_id).is_("retired_at", None).execute(),
+        )
+        if not session_res.data:
+            raise LookupError(f"Session {session_id} not found")
+        session = session_res.data[0]
+        if session.get("status") != "done":
+            raise RefreshConflict(f"Only finished sessions can be refreshed (status: {session.get('status')})")
+
+        stats = Counter()
+        pages = {p["url"]: p for p in pages_res.data or []}
+        directories = [url for url, p in pages.items() if p["kind"] == "directory"]
+        if not pages:
+            # Crawled before page hashes were kept: the roots are the directories
+            directories = [canonical_url(u) for u in session.get("root_urls") or []]
+        semaphore = asyncio.Semaphore(self.page_concurrency)
+        records: List[Dict[str, Any]] = []  # crawl_pages rows that changed
+
+        async def fetch(url: str) -> Optional[str]:
+            async with semaphore:
+                try:
+                    html = await self.crawler._fetch_page(url, None)
+                    stats["pages_fetched"] += 1
+                    return html
+                except Exception as e:
+                    logger.info(f"Refresh could not fetch {url}: {e}")
+                    return None
+
+        await log({"type": "phase", "phase": "refresh", "message": f"Checking {len(directories)} directory page(s) for changes..."})
+
+        # 1. Directory pages: rediscover only the ones whose text changed
+        listed: Dict[str, Dict[str, Any]] = {}  # professor key -> stub
+        complete = True  # every directory was read, so unlisted professors really left
+        for url, html in zip(directories, await asyncio.gather(*(fetch(u) for u in directories))):
+            stored = pages.get(url) or {}
+            stubs = stored.get("professors") or []
+            if html is None:
+                complete = False
+                stats["directories_failed"] += 1
+            elif stored.get("content_hash") == page_fingerprint(html, "directory") and stored.get("professors") is not None:
+                stats["directories_unchanged"] += 1
+            else:
+                stats["directories_changed"] += 1
+                discovered = await self._discover(html, url, session, log_callback)
+                if discovered or not stubs:
+                    stubs = discovered
+                    records.append(page_record(url, "directory", html, professors=discovered))
+                else:
+                    # A directory that suddenly lists nobody is more likely broken than empty
+                    complete = False
+            for stub in stubs:
+                key = professor_key(stub.get("name"))
+                if key and key not in listed:
+                    listed[key] = stub
+
+        cards = {professor_key(c.get("professor_name")): c for c in cards_res.data or []}
+        profile_pages = {p["professor_key"]: p for p in pages.values() if p["kind"] == "profile" and p.get("professor_key")}
+        retired = [c for key, c in cards.items() if key not in listed] if directories and complete else []
+        added = [key for key in listed if key not in cards]
+        await log({"type": "info", "message": f"🔄 {len(added)} new, {len(retired)} no longer listed, "
+                                              f"checking {len(cards) - len(retired)} profile(s) for changes"})
+
+        # 2. Known professors: re-extract only those whose profile page changed
+        budget = {"extractions": self.max_extractions}
+        retired_ids = {c["id"] for c in retired}
+
+        async def revalidate(key: str, card: Dict[str, Any]) -> None:
+            stored = profile_pages.get(key)
+            url = (listed.get(key) or {}).get("profile_url") or (stored or {}).get("url")
+            if not url:
+                return
+            html = await fetch(url)
+            if html is None:
+                return
+            record = page_record(url, "profile", html, professor=card.get("professor_name"))
+            stats["profiles_checked"] += 1
+            if stored is None:
+                # First refresh of a session crawled before page hashes were kept: take this as the baseline
+                records.append(record)
+                return
+            if stored["url"] == record["url"] and stored["content_hash"] == record["content_hash"]:
+                stats["unchanged"] += 1
+                return
+            if budget["extractions"] <= 0:
+                stats["deferred"] += 1
+                return
+            budget["extractions"] -= 1
+            stub = listed.get(key) or {"name": card.get("professor_name"), "source_url": card.get("primary_url")}
+            async with semaphore:
+                new_card = await self.crawler._investigate(session_id, {**stub, "profile_url": url}, html, None, [],
+                                                           log_callback, session.get("major"), session.get("custom_prompt"))
+            await self._write_diff(card, new_card.model_dump(include=set(CARD_DIFF_COLUMNS)), stats, log)
+            records.append(record)
+
+        await asyncio.gather(*(revalidate(key, card) for key, card in cards.items() if card["id"] not in retired_ids))
+
+        # 3. New professors: full investigation, cards go through the write buffer like a crawl's
+        async def investigate(key: str) -> None:
+            if budget["extractions"] <= 0:
+                stats["deferred"] += 1
+                return
+            budget["extractions"] -= 1
+            stub = dict(listed[key])
+            html = await fetch(stub["profile_url"]) if stub.get("profile_url") else None
+            if html is None:
+                stub["profile_url"] = None
+            async with semaphore:
+                card = await self.crawler._investigate(session_id, stub, html, None, [], log_callback,
+                                                       session.get("major"), session.get("custom_prompt"))
+            await self.crawler._save_card(session_id, card)
+            stats["added"] += 1
+            if html is not None:
+                records.append(page_record(stub["profile_url"], "profile", html, professor=stub["name"]))
+            await log({"type": "found_card", "name": card.professor_name, "department": card.department or "Unknown",
+                       "title": card.title or "", "links_count": len(card.links), "summary": (card.summary or "")[:100]})
+
+        await asyncio.gather(*(investigate(key) for key in added))
+
+        # 4. Professors no longer listed
+        if retired:
+            retired_at = _now().isoformat()
+            await self.client.table("professor_cards").update({"retired_at": retired_at}, returning="minimal") \
+                .in_("id", [str(c["id"]) for c in retired]).execute()
+            await get_feed_indexer().retire_cards([str(c["id"]) for c in retired])
+            stats["retired"] = len(retired)
+            for card in retired:
+                await log({"type": "info", "message": f"🗄️ Retired: {card.get('professor_name')} (no longer listed)"})
+
+        await save_crawl_pages(self.client, session_id, records)
+        await self.crawler.write_buffer.flush()
+        await self.client.table("scrape_sessions").update({"refreshed_at": _now().isoformat()}, returning="minimal") \
+            .eq("id", session_id).execute()
+        await self.crawler._on_rows_written({session_id})
+
+        result = {k: stats[k] for k in ("pages_fetched", "directories_changed", "directories_unchanged", "directories_failed",
+                                        "profiles_checked", "unchanged", "added", "updated", "retired", "deferred")}
+        logger.info(f"Refreshed session {session_id}: {result}")
+        await log({"type": "refresh_complete", **result,
+                   "message": f"Refresh complete: {result['added']} new, {result['updated']} updated, {result['retired']} retired."})
+        return result
+
+    async def _discover(self, html: str, url: str, session: Dict[str, Any], log_callback=None) -> List[Dict[str, Any]]:
+        """Run LLM discovery on a changed directory page; returns its validated stubs."""
+        stubs: List[Dict[str, Any]] = []
+        seen: Set[str] = set()
+
+        async def on_professor(prof, source_url=url):
+            stub = self.crawler._build_stub(prof, source_url, seen)
+            if stub:
+                stubs.append(stub_summary(stub))
+            return stub is not None
+
+        result = await self.crawler.llm_service.discover_professors(
+            html, url, log_callback, session.get("major"), self.crawler._extract_directory_links(html, url),
+            on_professor=on_professor, accept_professor=self.crawler._is_valid_professor
+        )
+        if not result.get("is_profile_page"):
+            for prof in result.get("professors", []):
+                if not (isinstance(prof, dict) and (prof.get("name") or "").strip().lower() in seen):
+                    await on_professor(prof)
+        return stubs
+
+    async def _write_diff(self, card: Dict[str, Any], fresh: Dict[str, Any], stats: Counter, log) -> None:
+        """Write the columns that changed (missing values never erase stored ones)."""
+        changes = {c: fresh[c] for c in CARD_DIFF_COLUMNS if fresh.get(c) not in (None, [], "") and fresh[c] != card.get(c)}
+        if not changes:
+            stats["unchanged"] += 1
+            return
+        await self.client.table("professor_cards").update({**changes, "updated_at": _now().isoformat()}, returning="minimal") \
+            .eq("id", str(card["id"])).execute()
+        stats["updated"] += 1
+        await log({"type": "info", "message": f"✏️ Updated: {card.get('professor_name')} ({', '.join(sorted(changes))})"})
+
+    async def aclose(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+class RefreshScheduler:
+    """
+    Refreshes finished sessions whose pages were last read more than
+    `interval_hours` ago, at most `concurrency` at a time. A session is
+    claimed by moving its refreshed_at forward with a conditional update, so
+    several API or worker processes can run schedulers side by side.
+    """
+
+    def __init__(self, refresher: SessionRefresher, event_buses, interval_hours: float = REFRESH_INTERVAL_HOURS,
+                 concurrency: int = REFRESH_CONCURRENCY, poll_seconds: float = REFRESH_POLL_SECONDS):
+        self.refresher = refresher
+        self.client = refresher.client
+        self.event_buses = event_buses
+        self.interval = timedelta(hours=interval_hours)
+        self.concurrency = concurrency
+        self.poll_seconds = poll_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._loop())
+        logger.info(f"Refreshing finished sessions every {self.interval} ({self.concurrency} at a time)")
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_due()
+            except Exception as e:
+                logger.error(f"Refresh scheduler error: {e}")
+            await asyncio.sleep(self.poll_seconds)
+
+    async def run_due(self) -> int:
+        """
+        Claim the sessions that are due and start refreshing them in the
+        background; returns how many were started.
+        """
+        running = [t for t in self.refresher._tasks if not t.done()]
+        slots = self.concurrency - len(running)
+        if slots <= 0:
+            return 0
+        cutoff = (_now() - self.interval).isoformat()
+        res = await self.client.table("scrape_sessions").select("id,refreshed_at") \
+            .eq("status", "done").lt("refreshed_at", cutoff).order("refreshed_at").limit(slots).execute()
+        started = 0
+        for row in res.data or []:
+            if self.refresher.is_refreshing(row["id"]) or row["id"] in self.event_buses:
+                continue
+            if await self.refresher.claim(row["id"], row["refreshed_at"]):
+                self.refresher.start(row["id"], self.event_buses)
+                started += 1
+        return started
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
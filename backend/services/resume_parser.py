@@ -0,0 +1,218 @@
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+
+from services.metrics import cache_result
+from services.prompts import get_prompt
+
+logger = logging.getLogger(__name__)
+
+RESUME_MAX_BYTES = int(os.environ.get("RESUME_MAX_BYTES", str(10 * 1024 * 1024)))
+RESUME_MAX_PAGES = int(os.environ.get("RESUME_MAX_PAGES", "10"))
+# The resume prompt only reads the first 10k characters
+RESUME_MAX_CHARS = int(os.environ.get("RESUME_MAX_CHARS", "20000"))
+RESUME_PARSE_TIMEOUT = float(os.environ.get("RESUME_PARSE_TIMEOUT", "15"))
+RESUME_PARSE_WORKERS = int(os.environ.get("RESUME_PARSE_WORKERS", "2"))
+RESUME_CACHE_MAX_ENTRIES = int(os.environ.get("RESUME_CACHE_MAX_ENTRIES", "256"))
+# How long shutdown waits for pool processes to exit before killing them
+RESUME_SHUTDOWN_TIMEOUT = float(os.environ.get("RESUME_SHUTDOWN_TIMEOUT", "5"))
+
+
+class ResumeParseError(Exception):
+    """Resume rejected or unreadable; `status_code` is the HTTP status to answer with."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def extract_pdf_text(contents: bytes, max_pages: int = RESUME_MAX_PAGES, max_chars: int = RESUME_MAX_CHARS) -> str:
+    """
+    Runs in a pool process: pull text from at most `max_pages` pages, stopping
+    once `max_chars` have been collected.
+    """
+    from io import BytesIO
+    from pypdf import PdfReader
+
+    reader = PdfReader(BytesIO(contents))
+    parts, size = [], 0
+    for index, page in enumerate(reader.pages):
+        if index >= max_pages or size >= max_chars:
+            break
+        text = page.extract_text() or ""
+        parts.append(text)
+        size += len(text)
+    return "".join(parts)[:max_chars]
+
+
+def _warm_worker() -> bool:
+    """Runs in a pool process: pay the pypdf import before the first upload does."""
+    import pypdf  # noqa: F401
+    return True
+
+
+class _LRU:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class ResumeParser:
+    """
+    PDF text extraction in a bounded process pool (so a huge or hostile PDF
+    can't stall the event loop), with the extracted text and the LLM analysis
+    cached by content hash. Concurrent uploads of the same file share one parse.
+    """
+
+    def __init__(self, workers: int = RESUME_PARSE_WORKERS, timeout: float = RESUME_PARSE_TIMEOUT,
+                 max_bytes: int = RESUME_MAX_BYTES, cache_entries: int = RESUME_CACHE_MAX_ENTRIES):
+        self.workers = workers
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # Queue extra uploads here instead of piling them into the pool
+        self._slots = asyncio.Semaphore(workers)
+        self._texts = _LRU(cache_entries)
+        self._results = _LRU(cache_entries)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {"text_hits": 0, "result_hits": 0, "parses": 0, "timeouts": 0}
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: don't fork the server's threads and open sockets into workers
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def _recycle(self) -> None:
+        """Kill a pool whose worker is stuck on a PDF; the next parse starts a fresh one."""
+        pool, self._pool = self._pool, None
+        if pool is None:
+            return
+        # ProcessPoolExecutor can't cancel a running task, so stop its processes directly
+        for process in list((getattr(pool, "_processes", None) or {}).values()):
+            process.kill()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def extract_text(self, contents: bytes) -> str:
+        if len(contents) > self.max_bytes:
+            raise ResumeParseError(f"Resume exceeds the {self.max_bytes:,}-byte upload limit", status_code=413)
+        digest = hashlib.sha256(contents).hexdigest()
+        cached = self._texts.get(digest)
+        cache_result("resume_text", cached is not None)
+        if cached is not None:
+            self.stats["text_hits"] += 1
+            return cached
+
+        inflight = self._inflight.get(digest)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[digest] = future
+        try:
+            text = await self._extract_in_pool(contents)
+            self._texts.set(digest, text)
+            future.set_result(text)
+            return text
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            del self._inflight[digest]
+
+    async def _extract_in_pool(self, contents: bytes) -> str:
+        loop = asyncio.get_running_loop()
+        async with self._slots:
+            self.stats["parses"] += 1
+            try:
+                return await asyncio.wait_for(
+                    loop.run_in_executor(self._executor(), extract_pdf_text, contents), timeout=self.timeout
+                )
+            except asyncio.TimeoutError:
+                self.stats["timeouts"] += 1
+                self._recycle()
+                raise ResumeParseError(f"Resume took longer than {self.timeout:.0f}s to read", status_code=422)
+            except BrokenProcessPool:
+                self._recycle()
+                raise ResumeParseError("Resume parser crashed on this file", status_code=422)
+            except ImportError:
+                raise ResumeParseError("pypdf not installed", status_code=500)
+            except Exception as e:
+                raise ResumeParseError(f"Could not read PDF: {e}")
+
+    async def parse(self, contents: bytes, llm_service) -> Dict[str, Any]:
+        """Extract text and analyze it with `llm_service.parse_resume`, cached per file and prompt version."""
+        text = await self.extract_text(contents)
+        if not text.strip():
+            raise ResumeParseError("Could not extract text from PDF")
+
+        key = (hashlib.sha256(text.encode()).hexdigest(), get_prompt("resume").key)
+        cached = self._results.get(key)
+        cache_result("resume_analysis", cached is not None)
+        if cached is not None:
+            self.stats["result_hits"] += 1
+            return dict(cached)
+
+        result = await llm_service.parse_resume(text)
+        # Don't pin the fallback answer from a failed analysis
+        if result.get("keywords"):
+            self._results.set(key, dict(result))
+        return result
+
+    async def warm(self) -> None:
+        """Start the pool's worker processes and import pypdf in each."""
+        loop = asyncio.get_running_loop()
+        pool = self._executor()
+        await asyncio.gather(*(loop.run_in_executor(pool, _warm_worker) for _ in range(self.workers)))
+
+    def close(self, timeout: float = RESUME_SHUTDOWN_TIMEOUT) -> None:
+        """
+        Stop the pool and wait for it, so its processes and queues are gone
+        before the interpreter exits (no leaked-semaphore warnings). Blocks
+        for at most `timeout` seconds before killing a worker stuck on a PDF.
+        """
+        pool, self._pool = self._pool, None
+        if pool is None:
+            return
+        processes = list((getattr(pool, "_processes", None) or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        deadline = time.monotonic() + timeout
+        for process in processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.kill()
+                process.join()
+        pool.shutdown(wait=True)
+
+
+_resume_parser: Optional[ResumeParser] = None
+
+
+def get_resume_parser() -> ResumeParser:
+    global _resume_parser
+    if _resume_parser is None:
+        _resume_parser = ResumeParser()
+    return _resume_parser
@@ -0,0 +1,206 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional, Set, Tuple
+
+from services.metrics import cache_result
+
+logger = logging.getLogger(__name__)
+
+# Entries are invalidated on every write, in every worker: invalidations are
+# broadcast through the event broker (and Redis entries deleted when shared).
+# The TTLs only bound staleness if a broadcast is lost; finished sessions
+# rarely change (a blocked session resumed, a done session refreshed).
+FINAL_SESSION_STATUSES = {"done", "error", "failed", "blocked"}
+CACHE_MAX_ENTRIES = int(os.environ.get("SESSION_CACHE_MAX_ENTRIES", "1000"))
+CACHE_RUNNING_TTL = float(os.environ.get("SESSION_CACHE_RUNNING_TTL", "5"))
+CACHE_FINAL_TTL = float(os.environ.get("SESSION_CACHE_FINAL_TTL", "86400"))
+SESSION_CACHE_URL = os.environ.get("SESSION_CACHE_URL")
+
+# Broker channel carrying invalidated session ids between workers
+INVALIDATION_CHANNEL = "session-cache"
+# Ids per broadcast, keeping messages under the Postgres NOTIFY payload limit
+INVALIDATION_BATCH = 100
+# Sessions whose generation is remembered
+GENERATION_ENTRIES = 10000
+
+CacheEntry = Tuple[bytes, str]  # (serialized body, strong ETag)
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """RFC 7232 If-None-Match comparison (weak comparison, as required for GET)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+class SessionCache:
+    """
+    In-process LRU of serialized GET /sessions/{id} responses, keyed by
+    (session_id, view). Set SESSION_CACHE_URL=redis://... to share entries
+    between workers.
+
+    invalidate() is broadcast on `broker` when it is shared, and start()
+    listens for other workers' invalidations. Each session has a generation,
+    bumped on every invalidation: read generation() before loading a session
+    and pass it to set(), so a body loaded before a concurrent write is not
+    cached.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, redis_url: Optional[str] = None, broker=None):
+        self.max_entries = max_entries
+        self.broker = broker
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[CacheEntry, float]]" = OrderedDict()
+        self._generations: "OrderedDict[str, int]" = OrderedDict()
+        self._listener: Optional[asyncio.Task] = None
+        self._redis = None
+        if redis_url:
+            try:
+                import redis.asyncio as redis_asyncio
+                self._redis = redis_asyncio.from_url(redis_url)
+            except ImportError:
+                logger.warning("SESSION_CACHE_URL set but redis is not installed; using in-process cache only")
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    @staticmethod
+    def _redis_key(session_id: str, view: str) -> str:
+        return f"labmatch:session:{session_id}:{view}"
+
+    def generation(self, session_id: str) -> int:
+        return self._generations.get(str(session_id), 0)
+
+    async def get(self, session_id: str, view: str) -> Optional[CacheEntry]:
+        key = (str(session_id), view)
+        hit = self._entries.get(key)
+        if hit is not None:
+            entry, expires_at = hit
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                cache_result("session", True)
+                return entry
+            del self._entries[key]
+
+        if self._redis is not None:
+            try:
+                raw = await self._redis.get(self._redis_key(*key))
+                if raw:
+                    etag, body = raw.split(b"\n", 1)
+                    entry = (body, etag.decode())
+                    self._store_local(key, entry, CACHE_RUNNING_TTL)
+                    self.stats["hits"] += 1
+                    cache_result("session", True)
+                    return entry
+            except Exception as e:
+                logger.warning(f"Shared session cache read failed: {e}")
+
+        self.stats["misses"] += 1
+        cache_result("session", False)
+        return None
+
+    async def set(self, session_id: str, view: str, body: bytes, status: str,
+                  generation: Optional[int] = None) -> str:
+        """
+        Cache a serialized response and return its ETag. With `generation`
+        (read before the body was loaded), nothing is cached if the session
+        was invalidated since.
+        """
+        etag = make_etag(body)
+        if generation is not None and generation != self.generation(session_id):
+            return etag
+        ttl = CACHE_FINAL_TTL if status in FINAL_SESSION_STATUSES else CACHE_RUNNING_TTL
+        key = (str(session_id), view)
+        self._store_local(key, (body, etag), ttl)
+
+        if self._redis is not None:
+            try:
+                await self._redis.set(self._redis_key(*key), etag.encode() + b"\n" + body, ex=int(ttl))
+            except Exception as e:
+                logger.warning(f"Shared session cache write failed: {e}")
+        return etag
+
+    def _store_local(self, key, entry: CacheEntry, ttl: float) -> None:
+        self._entries[key] = (entry, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _drop_local(self, session_ids: Set[str]) -> None:
+        for session_id in session_ids:
+            self._generations[session_id] = self._generations.get(session_id, 0) + 1
+            self._generations.move_to_end(session_id)
+        # Generations only matter to reads in flight, so only the most
+        # recently invalidated sessions are remembered
+        while len(self._generations) > GENERATION_ENTRIES:
+            self._generations.popitem(last=False)
+        for key in [k for k in self._entries if k[0] in session_ids]:
+            del self._entries[key]
+
+    async def invalidate(self, session_ids: Iterable[str]) -> None:
+        """Drop every cached view of the given sessions, in every worker (call after cards/status are written)."""
+        session_ids = {str(s) for s in session_ids}
+        if not session_ids:
+            return
+        self._drop_local(session_ids)
+        self.stats["invalidations"] += len(session_ids)
+
+        if self._redis is not None:
+            try:
+                keys = [self._redis_key(s, v) for s in session_ids for v in ("full", "list")]
+                await self._redis.delete(*keys)
+            except Exception as e:
+                logger.warning(f"Shared session cache invalidation failed: {e}")
+
+        if self.broker is not None and self.broker.shared:
+            ids = sorted(session_ids)
+            try:
+                for i in range(0, len(ids), INVALIDATION_BATCH):
+                    message = json.dumps({"sessions": ids[i:i + INVALIDATION_BATCH]})
+                    await self.broker.publish(INVALIDATION_CHANNEL, message, backlog=False)
+            except Exception as e:
+                logger.warning(f"Session cache invalidation broadcast failed: {e}")
+
+    async def start(self) -> None:
+        """Listen for invalidations broadcast by other workers (no-op without a shared broker)."""
+        if self.broker is None or not self.broker.shared or self._listener is not None:
+            return
+        subscription = await self.broker.subscribe(INVALIDATION_CHANNEL)
+        self._listener = asyncio.get_running_loop().create_task(self._listen(subscription))
+
+    async def _listen(self, subscription) -> None:
+        try:
+            async for raw in subscription:
+                try:
+                    session_ids = json.loads(raw)["sessions"]
+                except (json.JSONDecodeError, TypeError, KeyError):
+                    continue
+                self._drop_local({str(s) for s in session_ids})
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Entries still expire; a lost listener only makes them live to their TTL
+            logger.error(f"Session cache invalidation listener failed: {e}")
+        finally:
+            try:
+                await subscription.aclose()
+            except Exception:
+                pass
+
+    async def aclose(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        if self._redis is not None:
+            await self._redis.aclose()
@@ -0,0 +1,518 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.metrics import DB_SECONDS
+from services.supabase_client import APIResponse, BaseQueryBuilder
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# SCHEMA
+# ==============================================================================
+# Mirrors schema.sql plus the migration_*.sql files. Postgres arrays and jsonb
+# are stored as JSON text and decoded on read. Foreign keys are declared but
+# not enforced (PRAGMA foreign_keys stays off), so sessions can be created
+# without seeding auth users/profiles.
+
+SCHEMA = """
+create table if not exists profiles (
+  id text primary key,
+  name text,
+  school text,
+  major text,
+  interests text,
+  resume_text text,
+  embedding text,
+  created_at text not null
+);
+
+create table if not exists scrape_sessions (
+  id text primary key,
+  user_id text not null references profiles(id),
+  root_urls text,
+  objective_prompt text,
+  major text,
+  custom_prompt text,
+  status text check (status in ('queued', 'running', 'done', 'error', 'blocked', 'failed')) default 'queued',
+  blocked_reason text,
+  blocked_url text,
+  created_at text not null,
+  finished_at text,
+  worker_id text,
+  started_at text,
+  heartbeat_at text,
+  attempts integer default 0,
+  refreshed_at text,
+  feed_indexed_through text
+);
+
+create table if not exists professor_cards (
+  id text primary key,
+  session_id text not null references scrape_sessions(id),
+  professor_name text,
+  title text,
+  department text,
+  school text,
+  primary_url text,
+  personal_urls text,
+  links text default '[]',
+  summary text,
+  research_themes text,
+  keywords text,
+  evidence_snippets text,
+  recent_papers text,
+  undergrad_friendly_score real,
+  match_score real default 0.0,
+  match_reasoning text,
+  embedding text,
+  created_at text not null,
+  updated_at text,
+  retired_at text
+);
+
+create table if not exists swipes (
+  id text primary key,
+  user_id text not null references profiles(id),
+  professor_card_id text not null references professor_cards(id),
+  decision text check (decision in ('like', 'pass')),
+  created_at text not null
+);
+
+create table if not exists email_drafts (
+  id text primary key,
+  user_id text not null references profiles(id),
+  professor_card_id text not null references professor_cards(id),
+  subject text,
+  body text,
+  tone text,
+  created_at text not null
+);
+
+create table if not exists scrape_artifacts (
+  id text primary key,
+  session_id text references scrape_sessions(id),
+  source text check (source in ('backend_crawler', 'chrome_extension')),
+  url text,
+  title text,
+  extracted_text text,
+  out_links text,
+  captured_at text not null,
+  raw_metadata text,
+  content_hash text
+);
+
+create table if not exists user_feed (
+  user_id text not null references profiles(id),
+  professor_key text not null,
+  professor_card_id text not null references professor_cards(id),
+  session_id text references scrape_sessions(id),
+  score real not null default 0,
+  ranked_at text,
+  swiped_at text,
+  primary key (user_id, professor_key)
+);
+
+create table if not exists session_traces (
+  session_id text primary key references scrape_sessions(id),
+  trace text,
+  created_at text not null
+);
+
+create table if not exists crawl_pages (
+  session_id text not null references scrape_sessions(id),
+  url text not null,
+  kind text check (kind in ('directory', 'profile')) not null,
+  content_hash text not null,
+  professor_key text,
+  professors text,
+  checked_at text not null,
+  primary key (session_id, url)
+);
+
+create index if not exists scrape_artifacts_session_idx on scrape_artifacts (session_id, captured_at);
+create index if not exists scrape_sessions_user_created_idx on scrape_sessions (user_id, created_at);
+create index if not exists scrape_sessions_status_idx on scrape_sessions (status, created_at);
+create index if not exists swipes_user_card_idx on swipes (user_id, professor_card_id);
+create index if not exists user_feed_rank_idx on user_feed (user_id, score desc, professor_card_id desc) where swiped_at is null;
+"""
+
+# Columns added by later migrations, applied to database files created before them
+ADDED_COLUMNS = {
+    "scrape_sessions": [("worker_id", "text"), ("started_at", "text"), ("heartbeat_at", "text"),
+                        ("attempts", "integer default 0"), ("refreshed_at", "text"),
+                        ("feed_indexed_through", "text")],
+    "professor_cards": [("updated_at", "text"), ("retired_at", "text")],
+    "scrape_artifacts": [("content_hash", "text")],
+}
+# Indexes over those columns, created once the columns exist
+ADDED_INDEXES = """
+create index if not exists scrape_artifacts_session_hash_idx on scrape_artifacts (session_id, content_hash);
+create index if not exists scrape_sessions_refresh_due_idx on scrape_sessions (refreshed_at) where status = 'done';
+create index if not exists professor_cards_session_live_idx on professor_cards (session_id, created_at, id) where retired_at is null;
+drop index if exists professor_cards_session_created_idx;
+"""
+# Values for rows written before those columns existed
+ADDED_BACKFILLS = """
+update scrape_sessions set refreshed_at = coalesce(finished_at, created_at) where status = 'done' and refreshed_at is null;
+"""
+
+# Columns holding Postgres arrays / jsonb, stored as JSON text
+JSON_COLUMNS = {
+    "profiles": {"interests", "embedding"},
+    "scrape_sessions": {"root_urls"},
+    "professor_cards": {"personal_urls", "links", "research_themes", "keywords",
+                        "evidence_snippets", "recent_papers", "embedding"},
+    "scrape_artifacts": {"out_links", "raw_metadata"},
+    "session_traces": {"trace"},
+    "crawl_pages": {"professors"},
+}
+
+# Timestamp column filled with now() when missing on insert
+TIMESTAMP_DEFAULTS = {"scrape_artifacts": "captured_at", "user_feed": "ranked_at", "crawl_pages": "checked_at"}
+
+SQL_OPERATORS = {"eq": "=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<=", "neq": "!="}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+# ==============================================================================
+# POSTGREST PARAM PARSING
+# ==============================================================================
+# The builders below reuse BaseQueryBuilder, so the chainable API is exactly the
+# PostgREST one; execute() translates the accumulated params into SQL.
+
+def _split_top_level(text: str) -> List[str]:
+    """Split on commas that are not inside quotes or parentheses."""
+    parts, depth, in_quotes, escape, current = [], 0, False, False, []
+    for ch in text:
+        if escape:
+            current.append(ch)
+            escape = False
+            continue
+        if in_quotes and ch == "\\":
+            current.append(ch)
+            escape = True
+            continue
+        if ch == '"':
+            in_quotes = not in_quotes
+        elif not in_quotes and ch == "(":
+            depth += 1
+        elif not in_quotes and ch == ")":
+            depth -= 1
+        elif not in_quotes and depth == 0 and ch == ",":
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(ch)
+    if current:
+        parts.append("".join(current))
+    return parts
+
+
+def _parse_value(raw: str) -> Any:
+    if raw == "null":
+        return None
+    if len(raw) >= 2 and raw[0] == '"' and raw[-1] == '"':
+        return raw[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return raw
+
+
+def _condition(column: str, expr: str, args: list, in_tree: bool = False) -> str:
+    """
+    'gt.5' on column -> 'column > ?' (appending bound values to args). Like
+    PostgREST, quotes are only stripped inside in.(...) lists and or/and trees.
+    """
+    op, _, raw = expr.partition(".")
+    if op == "in":
+        values = [_parse_value(v) for v in _split_top_level(raw[1:-1])] if raw.startswith("(") else []
+        if not values:
+            return "0"
+        args.extend(values)
+        return f'"{column}" in ({",".join("?" for _ in values)})'
+    if op == "is":
+        if raw == "null":
+            return f'"{column}" is null'
+        return f'"{column}" is {1 if raw == "true" else 0}'
+    if op not in SQL_OPERATORS:
+        raise ValueError(f"Unsupported filter operator: {op}")
+    args.append(_parse_value(raw) if in_tree else raw)
+    return f'"{column}" {SQL_OPERATORS[op]} ?'
+
+
+def _logic_tree(expr: str, joiner: str, args: list) -> str:
+    """Translate PostgREST or=(...)/and(...) trees."""
+    clauses = []
+    for term in _split_top_level(expr):
+        if term.startswith("and(") or term.startswith("or("):
+            name, _, inner = term.partition("(")
+            clauses.append(_logic_tree(inner[:-1], name, args))
+        else:
+            column, _, rest = term.partition(".")
+            clauses.append(_condition(column, rest, args, in_tree=True))
+    return "(" + f" {joiner} ".join(clauses) + ")"
+
+
+# ==============================================================================
+# STORE
+# ==============================================================================
+
+class SQLiteStore:
+    """
+    Embedded storage backend exposing the same table() surface as the
+    Supabase clients. One shared connection in WAL mode, serialized by a lock;
+    async callers run queries on a single dedicated thread so a slow write or
+    fsync never stalls the event loop.
+    """
+
+    def __init__(self, path: str = "labmatch.db"):
+        self.path = path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self.conn.execute("pragma journal_mode=wal")
+        self.conn.execute("pragma synchronous=normal")
+        self.conn.executescript(SCHEMA)
+        for table, columns in ADDED_COLUMNS.items():
+            existing = {r["name"] for r in self.conn.execute(f'pragma table_info("{table}")')}
+            for name, ddl in columns:
+                if name not in existing:
+                    self.conn.execute(f'alter table "{table}" add column "{name}" {ddl}')
+        self._widen_status_check()
+        self.conn.executescript(ADDED_INDEXES)
+        self.conn.executescript(ADDED_BACKFILLS)
+        self._columns = {
+            table: [r["name"] for r in self.conn.execute(f'pragma table_info("{table}")')]
+            for table in JSON_COLUMNS.keys() | {"swipes", "email_drafts", "user_feed"}
+        }
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+
+    def _widen_status_check(self):
+        """
+        Files created before 'failed' was a session status keep the old CHECK,
+        which SQLite can't alter in place: rebuild the table from its own DDL.
+        """
+        ddl = self.conn.execute(
+            "select sql from sqlite_master where type = 'table' and name = 'scrape_sessions'"
+        ).fetchone()["sql"]
+        if "'failed'" in ddl:
+            return
+        indexes = [r["sql"] for r in self.conn.execute(
+            "select sql from sqlite_master where type = 'index' and tbl_name = 'scrape_sessions' and sql is not null"
+        )]
+        ddl = ddl.replace("'blocked')", "'blocked', 'failed')", 1)
+        ddl = "create table scrape_sessions_new" + ddl[ddl.index("("):]
+        self.conn.execute("begin")
+        try:
+            self.conn.execute(ddl)
+            self.conn.execute("insert into scrape_sessions_new select * from scrape_sessions")
+            self.conn.execute("drop table scrape_sessions")
+            self.conn.execute("alter table scrape_sessions_new rename to scrape_sessions")
+            for sql in indexes:
+                self.conn.execute(sql)
+            self.conn.execute("commit")
+        except Exception:
+            self.conn.execute("rollback")
+            raise
+
+    def table(self, name):
+        if name not in self._columns:
+            raise ValueError(f"Unknown table: {name}")
+        return AsyncSQLiteQueryBuilder(self, name)
+
+    async def aclose(self):
+        self.executor.shutdown(wait=True)
+        with self.lock:
+            self.conn.execute("pragma wal_checkpoint(passive)")
+            self.conn.close()
+
+    # --- Row encoding ---
+
+    def encode_row(self, table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        json_cols = JSON_COLUMNS.get(table, set())
+        encoded = {}
+        for column, value in row.items():
+            if column not in self._columns[table]:
+                raise ValueError(f"Unknown column {table}.{column}")
+            if column in json_cols and value is not None:
+                value = json.dumps(value, default=str)
+            elif isinstance(value, (uuid.UUID, datetime)):
+                value = str(value) if isinstance(value, uuid.UUID) else value.isoformat()
+            encoded[column] = value
+        return encoded
+
+    def decode_row(self, table: str, row: sqlite3.Row) -> Dict[str, Any]:
+        json_cols = JSON_COLUMNS.get(table, set())
+        decoded = dict(row)
+        for column in json_cols & decoded.keys():
+            if decoded[column] is not None:
+                decoded[column] = json.loads(decoded[column])
+        return decoded
+
+
+class SQLiteQueryBuilder(BaseQueryBuilder):
+    def __init__(self, store: SQLiteStore, table: str):
+        super().__init__("sqlite://", {}, table)
+        self.store = store
+        self.table_name = table
+
+    def execute(self):
+        return self._run()
+
+    # --- Translation ---
+
+    def _sql_where(self) -> Tuple[str, list]:
+        clauses, args = [], []
+        for key, value in self.query_params():
+            if key in ("select", "order", "limit", "offset", "columns", "on_conflict"):
+                continue
+            if key == "or":
+                clauses.append(_logic_tree(value[1:-1], "or", args))
+            elif key == "and":
+                clauses.append(_logic_tree(value[1:-1], "and", args))
+            else:
+                clauses.append(_condition(key, value, args))
+        return (" where " + " and ".join(clauses)) if clauses else "", args
+
+    def _sql_columns(self) -> str:
+        select = self.params.get("select", "*")
+        if select.strip() == "*":
+            return "*"
+        columns = [c.strip() for c in select.split(",") if c.strip()]
+        for column in columns:
+            if column not in self.store._columns[self.table_name]:
+                raise ValueError(f"Unknown column {self.table_name}.{column}")
+        return ",".join(f'"{c}"' for c in columns)
+
+    def _sql_order(self) -> str:
+        if "order" not in self.params:
+            return ""
+        terms = []
+        for term in self.params["order"].split(","):
+            parts = term.split(".")
+            direction = "desc" if "desc" in parts[1:] else "asc"
+            nulls = " nulls last" if "nullslast" in parts[1:] else ""
+            terms.append(f'"{parts[0]}" {direction}{nulls}')
+        return " order by " + ", ".join(terms)
+
+    def _sql_limit(self) -> str:
+        limit, offset = self.params.get("limit"), 0
+        if "Range" in self.headers:
+            start, _, end = self.headers["Range"].partition("-")
+            offset = int(start)
+            range_limit = int(end) - offset + 1
+            limit = min(int(limit), range_limit) if limit is not None else range_limit
+        if limit is None:
+            return f" limit -1 offset {offset}" if offset else ""
+        return f" limit {int(limit)} offset {offset}"
+
+    def _run(self) -> APIResponse:
+        store, table = self.store, self.table_name
+        with store.lock:
+            if self.method == "GET":
+                where, args = self._sql_where()
+                sql = f'select {self._sql_columns()} from "{table}"{where}{self._sql_order()}{self._sql_limit()}'
+                rows = [store.decode_row(table, r) for r in store.conn.execute(sql, args)]
+                count = None
+                if "count" in self._prefer:
+                    count = store.conn.execute(f'select count(*) from "{table}"{where}', args).fetchone()[0]
+                return APIResponse(rows, count)
+
+            if self.method == "POST":
+                rows = self.json_data if isinstance(self.json_data, list) else [self.json_data]
+                table_columns = store._columns[table]
+                conflict = self._sql_on_conflict()
+                inserted = []
+                store.conn.execute("begin")
+                try:
+                    for row in rows:
+                        row = dict(row)
+                        if "id" in table_columns:
+                            row.setdefault("id", str(uuid.uuid4()))
+                        row.setdefault(TIMESTAMP_DEFAULTS.get(table, "created_at"), _now())
+                        encoded = store.encode_row(table, row)
+                        columns = ",".join(f'"{c}"' for c in encoded)
+                        sql = f'insert into "{table}" ({columns}) values ({",".join("?" for _ in encoded)})'
+                        if conflict:
+                            keys = [c.strip() for c in conflict.split(",")]
+                            updates = ",".join(f'"{c}" = excluded."{c}"' for c in encoded if c not in keys)
+                            quoted = ",".join(f'"{c}"' for c in keys)
+                            sql += f" on conflict ({quoted}) do " + (f"update set {updates}" if updates else "nothing")
+                        cursor = store.conn.execute(sql + " returning rowid", list(encoded.values()))
+                        inserted.extend(r[0] for r in cursor.fetchall())
+                    store.conn.execute("commit")
+                except Exception:
+                    store.conn.execute("rollback")
+                    raise
+                return APIResponse(self._returning(inserted))
+
+            if self.method == "PATCH":
+                where, args = self._sql_where()
+                ids = [r[0] for r in store.conn.execute(f'select rowid from "{table}"{where}', args)]
+                encoded = store.encode_row(table, self.json_data)
+                if ids and encoded:
+                    assignments = ",".join(f'"{c}" = ?' for c in encoded)
+                    placeholders = ",".join("?" for _ in ids)
+                    store.conn.execute(
+                        f'update "{table}" set {assignments} where rowid in ({placeholders})',
+                        list(encoded.values()) + ids
+                    )
+                return APIResponse(self._returning(ids))
+
+            if self.method == "DELETE":
+                where, args = self._sql_where()
+                ids = [r[0] for r in store.conn.execute(f'select rowid from "{table}"{where}', args)]
+                deleted = self._returning(ids)
+                if ids:
+                    placeholders = ",".join("?" for _ in ids)
+                    store.conn.execute(f'delete from "{table}" where rowid in ({placeholders})', ids)
+                return APIResponse(deleted)
+
+        raise ValueError(f"Unsupported method: {self.method}")
+
+    def _sql_on_conflict(self) -> Optional[str]:
+        """Conflict target columns of an upsert (Prefer resolution=merge-duplicates)."""
+        if self._prefer.get("resolution") != "merge-duplicates":
+            return None
+        return self.params.get("on_conflict") or "id"
+
+    def _returning(self, rowids: List[int]) -> List[Dict[str, Any]]:
+        if self._prefer.get("return") == "minimal" or not rowids:
+            return []
+        placeholders = ",".join("?" for _ in rowids)
+        rows = self.store.conn.execute(f'select * from "{self.table_name}" where rowid in ({placeholders})', rowids)
+        return [self.store.decode_row(self.table_name, r) for r in rows]
+
+
+class AsyncSQLiteQueryBuilder(SQLiteQueryBuilder):
+    async def execute(self):
+        with DB_SECONDS.time(table=self.table_name, method=self.method):
+            return await asyncio.get_running_loop().run_in_executor(self.store.executor, self._run)
+
+
+class SyncSQLiteClient:
+    """Sync facade over a SQLiteStore for scripts (execute() without await)."""
+
+    def __init__(self, store: SQLiteStore):
+        self.store = store
+
+    def table(self, name):
+        if name not in self.store._columns:
+            raise ValueError(f"Unknown table: {name}")
+        return SQLiteQueryBuilder(self.store, name)
+
+
+def create_sqlite_store(path: Optional[str] = None) -> SQLiteStore:
+    path = path or os.environ.get("SQLITE_PATH", "labmatch.db")
+    logger.info(f"Using SQLite storage backend at {path}")
+    return SQLiteStore(path)
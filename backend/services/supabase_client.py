@@ -1,91 +1,337 @@
+import logging
 import os
+from typing import List, Tuple
+
 import requests
+import httpx
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
-load_dotenv()
+from services.metrics import DB_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Connection pool sizing (shared by every query issued through one client)
+POOL_MAX_CONNECTIONS = int(os.environ.get("SUPABASE_POOL_MAX_CONNECTIONS", "20"))
+POOL_MAX_KEEPALIVE = int(os.environ.get("SUPABASE_POOL_MAX_KEEPALIVE", "10"))
+REQUEST_TIMEOUT = float(os.environ.get("SUPABASE_TIMEOUT_SECONDS", "10"))
+
+
+class APIResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count  # Total rows when .count() was requested
+
+
+def _plain_value(value) -> str:
+    """Render a simple `col=op.value` filter value; PostgREST takes it verbatim (no quoting)."""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _format_value(value):
+    """
+    Render a value inside an in.(...) list or an or=/and= tree, where PostgREST
+    strips double quotes (quotes values containing reserved chars).
+    """
+    value = _plain_value(value)
+    if any(c in value for c in ',.:()" '):
+        return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+    return value
 
-url: str = os.environ.get("SUPABASE_URL", "")
-key: str = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "")
 
-class QueryBuilder:
+class BaseQueryBuilder:
+    """Builds a PostgREST request; subclasses decide how it is sent."""
+
     def __init__(self, base_url, headers, table):
+        self.table = table
         self.url = f"{base_url}/rest/v1/{table}"
         self.headers = headers.copy()
         self.params = {}
+        self.filters: List[Tuple[str, str]] = []  # (column, "op.value"); a column may repeat
         self.method = "GET"
         self.json_data = None
+        self._prefer = {}
+        self._order = []
 
     def select(self, columns="*"):
+        """columns: "*", a PostgREST select string, or a list of column names."""
         self.method = "GET"
+        if isinstance(columns, (list, tuple)):
+            columns = ",".join(columns)
         self.params["select"] = columns
         return self
 
-    def insert(self, data):
+    def insert(self, data, returning="representation"):
+        """Insert one row or a list of rows (bulk). returning="minimal" skips echoing rows back."""
         self.method = "POST"
-        self.headers["Prefer"] = "return=representation"
+        self._prefer["return"] = returning
         self.json_data = data
+        if isinstance(data, list) and data:
+            # PostgREST requires uniform keys in bulk inserts; missing ones get column defaults
+            columns = sorted({k for row in data for k in row})
+            self.params["columns"] = ",".join(columns)
+        return self
+
+    def upsert(self, data, on_conflict, returning="minimal"):
+        """Insert rows, updating the given columns of rows that collide on `on_conflict` (a unique key)."""
+        self.insert(data, returning=returning)
+        self._prefer["resolution"] = "merge-duplicates"
+        if isinstance(on_conflict, (list, tuple)):
+            on_conflict = ",".join(on_conflict)
+        self.params["on_conflict"] = on_conflict
         return self
 
-    def update(self, data):
+    def update(self, data, returning="representation"):
         self.method = "PATCH"
-        self.headers["Prefer"] = "return=representation"
+        self._prefer["return"] = returning
         self.json_data = data
         return self
 
+    def delete(self, returning="minimal"):
+        self.method = "DELETE"
+        self._prefer["return"] = returning
+        return self
+
+    # --- Filters ---
+
+    def _filter(self, column, op, value):
+        self.filters.append((column, f"{op}.{value}"))
+        return self
+
     def eq(self, column, value):
-        self.params[f"{column}"] = f"eq.{value}"
+        return self._filter(column, "eq", _plain_value(value))
+
+    def gt(self, column, value):
+        return self._filter(column, "gt", _plain_value(value))
+
+    def gte(self, column, value):
+        return self._filter(column, "gte", _plain_value(value))
+
+    def lt(self, column, value):
+        return self._filter(column, "lt", _plain_value(value))
+
+    def lte(self, column, value):
+        return self._filter(column, "lte", _plain_value(value))
+
+    def is_(self, column, value):
+        """`column IS value` for None, True or False."""
+        return self._filter(column, "is", _plain_value(value))
+
+    def in_(self, column, values):
+        return self._filter(column, "in", "(" + ",".join(_format_value(v) for v in values) + ")")
+
+    # --- Ordering / paging ---
+
+    def order(self, column, desc=False, nulls_last=False):
+        term = f"{column}.{'desc' if desc else 'asc'}"
+        if nulls_last:
+            term += ".nullslast"
+        self._order.append(term)
+        self.params["order"] = ",".join(self._order)
         return self
 
     def limit(self, count):
         self.params["limit"] = count
         return self
 
+    def range(self, start, end):
+        """Rows start..end inclusive, via the Range header (offset paging)."""
+        self.headers["Range-Unit"] = "items"
+        self.headers["Range"] = f"{start}-{end}"
+        return self
+
+    def keyset(self, after, columns=("created_at", "id"), desc=False):
+        """
+        Keyset pagination: order by `columns` and return only rows strictly after
+        the `after` values (the last row of the previous page). `after=None`
+        returns the first page.
+        """
+        for column in columns:
+            self.order(column, desc=desc)
+        if after is not None:
+            op = "lt" if desc else "gt"
+            # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y)
+            clauses = []
+            for i, column in enumerate(columns):
+                terms = [f"{c}.eq.{_format_value(v)}" for c, v in zip(columns[:i], after[:i])]
+                terms.append(f"{column}.{op}.{_format_value(after[i])}")
+                clauses.append(terms[0] if len(terms) == 1 else f"and({','.join(terms)})")
+            # A filter, not params["or"], so it ANDs with any other or=(...) on the query
+            self.filters.append(("or", f"({','.join(clauses)})"))
+        return self
+
+    def count(self, mode="exact"):
+        """Request a total row count: "exact", "planned" or "estimated"."""
+        self._prefer["count"] = mode
+        return self
+
+    def query_params(self) -> List[Tuple[str, str]]:
+        """Query string pairs (a list, so two filters on one column both reach PostgREST)."""
+        return [(k, str(v)) for k, v in self.params.items()] + self.filters
+
+    def _request_kwargs(self):
+        headers = self.headers
+        if self._prefer:
+            headers = {**headers, "Prefer": ",".join(f"{k}={v}" for k, v in self._prefer.items())}
+        kwargs = {"headers": headers, "params": self.query_params()}
+        if self.method != "GET":
+            kwargs["json"] = self.json_data
+        return kwargs
+
+    @staticmethod
+    def _parse(r):
+        # return=minimal (and some PATCHes) come back with an empty body
+        data = r.json() if r.content else []
+        count = None
+        content_range = r.headers.get("Content-Range", "")
+        if "/" in content_range:
+            total = content_range.rsplit("/", 1)[1]
+            count = int(total) if total.isdigit() else None
+        return APIResponse(data, count)
+
+
+class QueryBuilder(BaseQueryBuilder):
+    """Blocking query builder for scripts (create_user.py, list_users.py)."""
+
+    def __init__(self, base_url, headers, table, session=None):
+        super().__init__(base_url, headers, table)
+        self.session = session or requests
+
     def execute(self):
         try:
-            if self.method == "GET":
-                r = requests.get(self.url, headers=self.headers, params=self.params)
-            elif self.method == "POST":
-                r = requests.post(self.url, headers=self.headers, json=self.json_data, params=self.params)
-            elif self.method == "PATCH":
-                r = requests.patch(self.url, headers=self.headers, json=self.json_data, params=self.params)
-            
+            r = self.session.request(self.method, self.url, timeout=REQUEST_TIMEOUT, **self._request_kwargs())
             r.raise_for_status()
-            return type('Response', (), {'data': r.json()})
+            return self._parse(r)
         except Exception as e:
-            print(f"Supabase Request Failed: {e}")
-            # print(r.text) # Debugging
-            # Return empty data on failure to match broad expectations or raise? 
+            logger.error(f"Supabase Request Failed: {e}")
             # Raising is better so we know it failed.
             raise e
 
+
+class AsyncQueryBuilder(BaseQueryBuilder):
+    """Same chainable API as QueryBuilder, but `await .execute()` never blocks the event loop."""
+
+    def __init__(self, base_url, headers, table, client: "AsyncSupabaseClient"):
+        super().__init__(base_url, headers, table)
+        self.client = client
+
+    async def execute(self):
+        try:
+            http = self.client.http()
+            with DB_SECONDS.time(table=self.table, method=self.method):
+                r = await http.request(self.method, self.url, **self._request_kwargs())
+            r.raise_for_status()
+            return self._parse(r)
+        except Exception as e:
+            logger.error(f"Supabase Request Failed: {e}")
+            raise e
+
+
+def _auth_headers(key):
+    return {
+        "apikey": key,
+        "Authorization": f"Bearer {key}",
+        "Content-Type": "application/json"
+    }
+
+
 class SimpleSupabaseClient:
+    """Sync facade; reuses keep-alive connections through a pooled requests.Session."""
+
+    def __init__(self, url, key):
+        self.base_url = url.rstrip("/")
+        self.headers = _auth_headers(key)
+        self.session = requests.Session()
+        # One host (the Supabase project), so one cached pool of up to POOL_MAX_CONNECTIONS sockets
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAX_CONNECTIONS)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def table(self, name):
+         return QueryBuilder(self.base_url, self.headers, name, self.session)
+
+
+class AsyncSupabaseClient:
+    """Async client backed by one pooled keep-alive httpx.AsyncClient."""
+
     def __init__(self, url, key):
         self.base_url = url.rstrip("/")
-        self.headers = {
-            "apikey": key,
-            "Authorization": f"Bearer {key}",
-            "Content-Type": "application/json"
-        }
+        self.headers = _auth_headers(key)
+        self._http = None
+
+    def http(self) -> httpx.AsyncClient:
+        # Created lazily so it binds to the running event loop
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                timeout=REQUEST_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=POOL_MAX_CONNECTIONS,
+                    max_keepalive_connections=POOL_MAX_KEEPALIVE
+                )
+            )
+        return self._http
 
     def table(self, name):
-         return QueryBuilder(self.base_url, self.headers, name)
-
-# Initialize the lightweight client
-try:
-    if not url or not key:
-        print("Warning: SUPABASE_URL or KEY missing.")
-    
-    if "hvbmmywuurmbvnhqirep" in url:
-        print("\n" + "="*80)
-        print("CRITICAL: You are using a placeholder Supabase URL.") 
-        print("Please update backend/.env with your actual Supabase project URL.")
-        print("The current value 'hvbmmywuurmbvnhqirep' is invalid and will cause connection errors.")
-        print("="*80 + "\n")
-
-    supabase = SimpleSupabaseClient(url, key)
-except Exception as e:
-    print(f"Supabase init failed: {e}")
-    supabase = None
+        return AsyncQueryBuilder(self.base_url, self.headers, name, self)
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+_clients = None
+
+
+def _create_clients():
+    """Build the (sync, async) clients for STORAGE_BACKEND=supabase|sqlite; runs on first use, not at import."""
+    load_dotenv()
+    if os.environ.get("STORAGE_BACKEND", "supabase").lower() == "sqlite":
+        # Local embedded store with the same table() surface (CI, benchmarks, single node)
+        from services.sqlite_store import create_sqlite_store, SyncSQLiteClient
+
+        async_client = create_sqlite_store()
+        return SyncSQLiteClient(async_client), async_client
+
+    url = os.environ.get("SUPABASE_URL", "")
+    key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "")
+    try:
+        if not url or not key:
+            logger.warning("SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY missing.")
+
+        if "hvbmmywuurmbvnhqirep" in url:
+            logger.critical(
+                "You are using a placeholder Supabase URL ('hvbmmywuurmbvnhqirep'); "
+                "update backend/.env with your actual Supabase project URL or requests will fail."
+            )
+
+        return SimpleSupabaseClient(url, key), AsyncSupabaseClient(url, key)
+    except Exception as e:
+        logger.error(f"Supabase init failed: {e}")
+        return None, None
+
+
+def _get_clients():
+    global _clients
+    if _clients is None:
+        _clients = _create_clients()
+    return _clients
+
 
 def get_supabase_client():
-    return supabase
+    """Blocking client for scripts. Do not use from async code."""
+    return _get_clients()[0]
+
+
+def get_async_supabase_client():
+    """Non-blocking client for the API and crawler."""
+    return _get_clients()[1]
+
+
+async def aclose_async_supabase_client():
+    """Close the async client if one was created; shutdown shouldn't build it just to close it."""
+    if _clients is not None and _clients[1] is not None:
+        await _clients[1].aclose()
@@ -0,0 +1,268 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Spans kept per session; later ones are counted as dropped
+TRACE_MAX_SPANS = int(os.environ.get("TRACE_MAX_SPANS", "5000"))
+# Opt-in CPU sampling during crawls (samples per second, 0 = off). Samples the
+# event loop thread, so with several crawls in one process they overlap.
+SESSION_PROFILER_HZ = float(os.environ.get("SESSION_PROFILER_HZ", "0"))
+PROFILE_TOP_FRAMES = 30
+PROFILE_MAX_STACKS = 200
+
+_current_trace: ContextVar[Optional["SessionTrace"]] = ContextVar("session_trace", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("trace_span", default=None)
+
+# Traces of crawls running in this process, served live by /sessions/{id}/profile
+_active: Dict[str, "SessionTrace"] = {}
+
+
+class Span:
+    __slots__ = ("id", "parent_id", "name", "start", "end", "lane", "attrs")
+
+    def __init__(self, span_id: int, parent_id: Optional[int], name: str, start: float, lane: int, attrs: Dict[str, Any]):
+        self.id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.start = start
+        self.end: Optional[float] = None
+        self.lane = lane
+        self.attrs = attrs
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+
+class _NoopSpan:
+    def set(self, **attrs) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class SessionTrace:
+    """
+    Nested spans for one crawl, timed against a monotonic clock from the
+    start of the session. Nesting follows the asyncio context, so spans opened
+    in concurrent tasks get their own lane (a thread in the Chrome view).
+    """
+
+    def __init__(self, session_id, max_spans: int = TRACE_MAX_SPANS):
+        self.session_id = str(session_id)
+        self.max_spans = max_spans
+        self.started_at = datetime.now(timezone.utc)
+        self._t0 = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.spans: List[Span] = []
+        self.dropped = 0
+        self.profile: Optional[Dict[str, Any]] = None
+        self._lanes: Dict[int, int] = {}
+
+    def now(self) -> float:
+        return time.perf_counter() - self._t0
+
+    def _lane(self) -> int:
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        return self._lanes.setdefault(id(task), len(self._lanes) + 1)
+
+    def open(self, name: str, start: Optional[float] = None, **attrs) -> Optional[Span]:
+        if len(self.spans) >= self.max_spans:
+            self.dropped += 1
+            return None
+        parent = _current_span.get()
+        span = Span(len(self.spans) + 1, parent.id if parent else None, name,
+                    self.now() if start is None else start, self._lane(), attrs)
+        self.spans.append(span)
+        return span
+
+    @contextmanager
+    def activate(self, profile_hz: float = SESSION_PROFILER_HZ):
+        """Trace everything run inside the block (and tasks it spawns) under a root "session" span."""
+        profiler = SamplingProfiler(1.0 / profile_hz).start() if profile_hz > 0 else None
+        _active[self.session_id] = self
+        token = _current_trace.set(self)
+        try:
+            with span("session"):
+                yield self
+        finally:
+            _current_trace.reset(token)
+            self.finished = self.now()
+            if profiler is not None:
+                self.profile = profiler.stop()
+            _active.pop(self.session_id, None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        end = self.finished if self.finished is not None else self.now()
+        return {
+            "session_id": self.session_id,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(end * 1000, 3),
+            "complete": self.finished is not None,
+            "spans": [
+                {
+                    "id": s.id,
+                    "parent_id": s.parent_id,
+                    "name": s.name,
+                    "lane": s.lane,
+                    "start_ms": round(s.start * 1000, 3),
+                    "end_ms": round((s.end if s.end is not None else end) * 1000, 3),
+                    "attrs": s.attrs,
+                }
+                for s in self.spans
+            ],
+            "dropped_spans": self.dropped,
+            "profile": self.profile,
+        }
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time the block as a child of the current span; a no-op outside a traced session."""
+    trace = _current_trace.get()
+    opened = trace.open(name, **attrs) if trace is not None else None
+    if opened is None:
+        yield NOOP_SPAN
+        return
+    token = _current_span.set(opened)
+    try:
+        yield opened
+    except BaseException as e:
+        opened.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        opened.end = trace.now()
+        _current_span.reset(token)
+
+
+def record_span(name: str, started: float, **attrs) -> None:
+    """Add an already-finished span that began at perf_counter() value `started`."""
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    opened = trace.open(name, start=started - trace._t0, **attrs)
+    if opened is not None:
+        opened.end = trace.now()
+
+
+def span_totals(doc: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """Per span name: count, total and self time (total minus direct children), slowest first."""
+    spans = doc.get("spans") or []
+    child_ms: Counter = Counter()
+    for s in spans:
+        if s.get("parent_id") is not None:
+            child_ms[s["parent_id"]] += s["end_ms"] - s["start_ms"]
+    totals: Dict[str, Dict[str, float]] = {}
+    for s in spans:
+        duration = s["end_ms"] - s["start_ms"]
+        entry = totals.setdefault(s["name"], {"count": 0, "total_ms": 0.0, "self_ms": 0.0})
+        entry["count"] += 1
+        entry["total_ms"] += duration
+        entry["self_ms"] += max(duration - child_ms.get(s["id"], 0.0), 0.0)
+    for entry in totals.values():
+        entry["total_ms"] = round(entry["total_ms"], 3)
+        entry["self_ms"] = round(entry["self_ms"], 3)
+    return dict(sorted(totals.items(), key=lambda item: -item[1]["total_ms"]))
+
+
+def to_chrome_trace(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Chrome trace-event JSON (chrome://tracing, Perfetto, speedscope) from a stored trace."""
+    events = [{"name": "process_name", "ph": "M", "pid": 1, "tid": 0,
+               "args": {"name": f"session {doc.get('session_id')}"}}]
+    for s in doc.get("spans") or []:
+        events.append({
+            "name": s["name"],
+            "cat": "crawl",
+            "ph": "X",
+            "pid": 1,
+            "tid": s.get("lane", 1),
+            "ts": round(s["start_ms"] * 1000, 1),
+            "dur": round((s["end_ms"] - s["start_ms"]) * 1000, 1),
+            "args": s.get("attrs") or {},
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms",
+            "otherData": {"session_id": doc.get("session_id"), "started_at": doc.get("started_at")}}
+
+
+class SamplingProfiler:
+    """
+    Samples one thread's Python stack from a background thread every
+    `interval` seconds and aggregates folded stacks plus per-function self
+    and total sample counts.
+    """
+
+    def __init__(self, interval: float, thread_id: Optional[int] = None):
+        self.interval = interval
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self._stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.samples = 0
+
+    @staticmethod
+    def _frame_label(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_label(frame))
+                frame = frame.f_back
+            self._stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self) -> "SamplingProfiler":
+        self._thread = threading.Thread(target=self._run, name="session-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Dict[str, Any]:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        own, total = Counter(), Counter()
+        for stack, count in self._stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        return {
+            "interval_ms": round(self.interval * 1000, 3),
+            "samples": self.samples,
+            "top": [{"frame": frame, "self": count, "total": total[frame]}
+                    for frame, count in own.most_common(PROFILE_TOP_FRAMES)],
+            # Brendan Gregg folded format: "root;child;leaf" -> samples
+            "folded": dict(self._stacks.most_common(PROFILE_MAX_STACKS)),
+        }
+
+
+def active_trace(session_id) -> Optional[SessionTrace]:
+    return _active.get(str(session_id))
+
+
+async def save_trace(client, trace: SessionTrace) -> None:
+    try:
+        await client.table("session_traces").upsert({
+            "session_id": trace.session_id,
+            "trace": trace.to_dict(),
+        }, on_conflict="session_id").execute()
+    except Exception as e:
+        logger.error(f"Could not save trace for session {trace.session_id}: {e}")
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+BUFFER_MAX_ROWS = int(os.environ.get("CARD_BUFFER_MAX_ROWS", "50"))
+BUFFER_FLUSH_SECONDS = float(os.environ.get("CARD_BUFFER_FLUSH_SECONDS", "1.0"))
+BUFFER_MAX_RETRIES = int(os.environ.get("CARD_BUFFER_MAX_RETRIES", "3"))
+
+
+class WriteBehindBuffer:
+    """
+    Collects professor_cards rows across all sessions and writes them as bulk
+    inserts (return=minimal) when `max_rows` are pending or every
+    `flush_interval` seconds. Non-final session status updates are coalesced
+    per session (latest wins) and written on the same flush.
+
+    Rows from a failed flush are re-queued and retried up to `max_retries` times.
+    `on_write(session_ids, row_session_ids)` (async, optional) is awaited with
+    the session ids whose rows or status were just written, e.g. to
+    invalidate cached responses, and the subset whose rows were written.
+    """
+
+    def __init__(self, client, table: str = "professor_cards", max_rows: int = BUFFER_MAX_ROWS,
+                 flush_interval: float = BUFFER_FLUSH_SECONDS, max_retries: int = BUFFER_MAX_RETRIES,
+                 on_write=None):
+        self.client = client
+        self.table = table
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.on_write = on_write
+
+        self._rows: List[Dict[str, Any]] = []
+        self._attempts: List[int] = []       # Failed flush count per pending row
+        self._statuses: Dict[str, Dict[str, Any]] = {}
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        self.stats = {"rows_written": 0, "batches": 0, "retries": 0, "dropped": 0, "status_writes": 0}
+
+    @property
+    def pending(self) -> int:
+        return len(self._rows)
+
+    async def add(self, row: Dict[str, Any]) -> None:
+        self._rows.append(row)
+        self._attempts.append(0)
+        self._ensure_timer()
+        if len(self._rows) >= self.max_rows:
+            await self.flush()
+
+    def defer_status(self, session_id: str, data: Dict[str, Any]) -> None:
+        """Queue a non-final status update; superseded by any later update for the session."""
+        self._statuses.setdefault(session_id, {}).update(data)
+        self._ensure_timer()
+
+    async def write_status(self, session_id: str, data: Dict[str, Any]) -> None:
+        """
+        Write a final status now, after flushing every pending row so that
+        readers who see the new status also see all of the session's cards.
+        The session's rows that fail to insert are retried first, until they
+        are written or dropped. If the update fails, the deferred fields it
+        carried are queued again and the error is raised.
+        """
+        pending = self._statuses.pop(session_id, {})
+        try:
+            await self.flush()
+            for _ in range(self.max_retries):
+                if not any(str(row.get("session_id")) == session_id for row in self._rows):
+                    break
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+            await self.client.table("scrape_sessions").update({**pending, **data}, returning="minimal").eq("id", session_id).execute()
+        except (Exception, asyncio.CancelledError):
+            if pending:
+                # Newer deferred fields for the session win
+                self._statuses[session_id] = {**pending, **self._statuses.get(session_id, {})}
+                self._ensure_timer()
+            raise
+        self.stats["status_writes"] += 1
+        await self._notify({session_id}, set())
+
+    async def flush(self) -> None:
+        async with self._lock:
+            rows_written = await self._flush_rows()
+            statuses_written = await self._flush_statuses()
+        await self._notify(rows_written | statuses_written, rows_written)
+
+    async def _notify(self, session_ids: Set[str], row_session_ids: Set[str]) -> None:
+        if self.on_write and session_ids:
+            try:
+                await self.on_write(session_ids, row_session_ids)
+            except Exception as e:
+                logger.error(f"Write-behind on_write hook failed: {e}")
+
+    async def _flush_rows(self) -> Set[str]:
+        written = set()
+        if not self._rows:
+            return written
+        rows, attempts = self._rows, self._attempts
+        self._rows, self._attempts = [], []
+
+        for start in range(0, len(rows), self.max_rows):
+            batch = rows[start:start + self.max_rows]
+            batch_attempts = attempts[start:start + self.max_rows]
+            try:
+                await self.client.table(self.table).insert(batch, returning="minimal").execute()
+                self.stats["rows_written"] += len(batch)
+                self.stats["batches"] += 1
+                written.update(str(row.get("session_id")) for row in batch)
+            except asyncio.CancelledError:
+                # Don't lose rows if the timer is cancelled mid-flush
+                self._rows = rows[start:] + self._rows
+                self._attempts = attempts[start:] + self._attempts
+                raise
+            except Exception as e:
+                logger.error(f"Bulk insert of {len(batch)} rows into {self.table} failed: {e}")
+                for row, n in zip(batch, batch_attempts):
+                    if n + 1 >= self.max_retries:
+                        self.stats["dropped"] += 1
+                        logger.error(f"Dropping row after {n + 1} failed attempts: {row.get('professor_name')}")
+                        continue
+                    self.stats["retries"] += 1
+                    self._rows.append(row)
+                    self._attempts.append(n + 1)
+        return written
+
+    async def _flush_statuses(self) -> Set[str]:
+        written = set()
+        statuses, self._statuses = self._statuses, {}
+        for session_id, data in statuses.items():
+            try:
+                await self.client.table("scrape_sessions").update(data, returning="minimal").eq("id", session_id).execute()
+                self.stats["status_writes"] += 1
+                written.add(session_id)
+            except Exception as e:
+                logger.error(f"Failed to update session status for {session_id}: {e}")
+                # Keep it unless a newer update arrived meanwhile
+                self._statuses.setdefault(session_id, data)
+        return written
+
+    def _ensure_timer(self) -> None:
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.get_running_loop().create_task(self._run_timer())
+
+    async def _run_timer(self) -> None:
+        while self._rows or self._statuses:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Write-behind flush failed: {e}")
+
+    async def close(self) -> None:
+        """Flush everything and stop the timer (call on shutdown)."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self.flush()
@@ -0,0 +1,27 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from services.sqlite_store import SQLiteStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteStore(str(tmp_path / "labmatch.db"))
+    yield store
+    asyncio.run(store.aclose())
+
+
+@pytest.fixture
+def add_session(store):
+    """`await add_session(user_id, status=..., age_seconds=...)` inserts a scrape_sessions row and returns its id."""
+
+    async def add(user_id, status="queued", age_seconds=0.0, **fields):
+        created = datetime.now(timezone.utc) - timedelta(seconds=age_seconds)
+        row = {"user_id": str(user_id), "status": status, "root_urls": ["https://example.edu/faculty"],
+               "created_at": created.isoformat(), **fields}
+        res = await store.table("scrape_sessions").insert(row).execute()
+        return res.data[0]["id"]
+
+    return add
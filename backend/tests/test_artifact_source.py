@@ -0,0 +1,73 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from services.artifact_source import ArtifactPageSource
+
+BASE = datetime(2026, 10, 1, tzinfo=timezone.utc)
+
+
+class CountingClient:
+    """Passes queries through to the store and records the rows each one returned."""
+
+    def __init__(self, store):
+        self.store = store
+        self.reads = []
+
+    def table(self, name):
+        builder = self.store.table(name)
+        execute = builder.execute
+
+        async def counted():
+            res = await execute()
+            self.reads.append([row["url"] for row in res.data])
+            return res
+
+        builder.execute = counted
+        return builder
+
+
+def test_lookup_miss_reads_only_new_captures(store, add_session):
+    async def capture(session_id, url, seconds, html):
+        await store.table("scrape_artifacts").insert({
+            "session_id": session_id, "source": "chrome_extension", "url": url,
+            "captured_at": (BASE + timedelta(seconds=seconds)).isoformat(), "raw_metadata": {"html": html},
+        }).execute()
+
+    async def main():
+        session_id = await add_session("aaaaaaaa-0000-0000-0000-000000000001")
+        await capture(session_id, "https://example.edu/faculty", 0, "<p>directory</p>")
+        await capture(session_id, "https://example.edu/people/ada", 10, "<p>ada</p>")
+        client = CountingClient(store)
+        source = ArtifactPageSource(client, session_id, refresh_interval=0)
+
+        assert await source.load() == 2
+        assert await source.get("https://example.edu/people/ada/") == "<p>ada</p>"
+
+        # Captured while the crawl runs: one at the same instant as the newest row read, one later
+        await capture(session_id, "https://example.edu/people/grace", 10, "<p>grace</p>")
+        await capture(session_id, "https://example.edu/people/alan", 20, "<p>alan</p>")
+        assert await source.get("https://example.edu/people/grace") == "<p>grace</p>"
+        assert client.reads[-1] == ["https://example.edu/people/ada", "https://example.edu/people/grace",
+                                    "https://example.edu/people/alan"]
+        assert await source.get("https://example.edu/people/alan") == "<p>alan</p>"
+
+        # Nothing new: the miss reads only the rows at the newest capture time
+        assert await source.get("https://example.edu/people/nobody") is None
+        assert client.reads[-1] == ["https://example.edu/people/alan"]
+        assert source.urls[0] == "https://example.edu/faculty"
+        assert len(source) == 4 and source.hits == 3
+
+    asyncio.run(main())
+
+
+def test_misses_are_rate_limited(store, add_session):
+    async def main():
+        session_id = await add_session("aaaaaaaa-0000-0000-0000-000000000001")
+        client = CountingClient(store)
+        source = ArtifactPageSource(client, session_id, refresh_interval=60)
+        await source.load()
+        for _ in range(3):
+            assert await source.get("https://example.edu/people/ada") is None
+        assert len(client.reads) == 1
+
+    asyncio.run(main())
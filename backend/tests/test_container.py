@@ -0,0 +1,27 @@
+import asyncio
+import threading
+
+from services import resume_parser, supabase_client
+from services.container import ServiceContainer
+
+
+def test_aclose_does_not_build_services_that_were_never_used(monkeypatch):
+    def build(*args):
+        raise AssertionError("aclose built a service")
+
+    monkeypatch.setattr(supabase_client, "_clients", None)
+    monkeypatch.setattr(supabase_client, "_create_clients", build)
+    monkeypatch.setattr(resume_parser, "_resume_parser", None)
+    monkeypatch.setattr(resume_parser, "ResumeParser", build)
+    asyncio.run(ServiceContainer(warmup=False).aclose())
+
+
+def test_llm_client_is_built_on_the_event_loop(monkeypatch):
+    monkeypatch.setenv("LLM_API_KEY", "test")
+    container = ServiceContainer(warmup=False)
+    llm = container.llm
+    built_on = []
+    monkeypatch.setattr(type(llm), "client", property(lambda self: built_on.append(threading.current_thread())))
+
+    asyncio.run(container._warm_llm_client())
+    assert built_on == [threading.main_thread()]
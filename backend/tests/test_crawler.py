@@ -0,0 +1,89 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+from services import crawler as crawler_module
+from services import feed
+from services.crawler import DiscoveryBudget
+from services.feed import FeedIndexer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+import harness  # noqa: E402
+
+USER = "aaaaaaaa-0000-0000-0000-000000000001"
+
+
+@pytest.fixture
+def crawler(store, monkeypatch):
+    monkeypatch.setenv("LLM_API_KEY", "test")
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1,localhost")
+    monkeypatch.setattr(crawler_module, "get_async_supabase_client", lambda: store)
+    monkeypatch.setattr(crawler_module, "PROFESSOR_DELAY_SECONDS", 0)
+    monkeypatch.setattr(feed, "_feed_indexer", FeedIndexer(store))
+    return crawler_module.CrawlerService()
+
+
+def test_rerun_keeps_saved_cards_instead_of_duplicating_them(store, add_session, crawler):
+    corpus = harness.generate_corpus(15)
+    fake = harness.FakeLLM(corpus, latency=0, seconds_per_token=0)
+    harness.install_fake_llm(crawler.llm_service, fake)
+
+    async def cards(session_id):
+        res = await store.table("professor_cards").select("professor_name").eq("session_id", session_id).execute()
+        return sorted(r["professor_name"] for r in res.data)
+
+    async def main():
+        with harness.StubSite(corpus, latency=0) as site:
+            root = site.url(corpus.root)
+            session_id = await add_session(USER, status="running", root_urls=[root])
+            await crawler.run_session(session_id, [root])
+            first = await cards(session_id)
+            first_calls = fake.total_calls
+            assert first and len(first) == len(set(first))
+
+            # The worker died after saving some cards; the job is re-queued and runs again
+            await store.table("scrape_sessions").update({"status": "running"}).eq("id", session_id).execute()
+            fake.reset_counts()
+            await crawler.run_session(session_id, [root])
+            assert await cards(session_id) == first
+            assert fake.total_calls < first_calls  # saved professors aren't investigated again
+        await crawler.write_buffer.close()
+        status = await store.table("scrape_sessions").select("status").eq("id", session_id).execute()
+        assert status.data[0]["status"] == "done"
+
+    asyncio.run(main())
+
+
+def test_budget_hands_a_finished_roots_pages_to_a_waiting_root():
+    async def main():
+        budget = DiscoveryBudget(["a", "b"], 4)
+        assert await budget.take("a") and await budget.take("a")
+        waiting = asyncio.create_task(budget.take("a"))
+        await asyncio.sleep(0)
+        assert not waiting.done()  # b might still leave pages
+
+        assert await budget.take("b")
+        await budget.release("b")
+        assert await asyncio.wait_for(waiting, timeout=1)
+        assert not await budget.take("a")
+
+    asyncio.run(main())
+
+
+def test_budget_returns_an_unread_spare_page_and_wakes_waiters():
+    async def main():
+        budget = DiscoveryBudget(["a", "b", "c", "d"], 4)
+        await budget.release("d")
+        assert await budget.take("a") and await budget.take("b")
+        assert await budget.take("a")  # d's page
+        waiting = asyncio.create_task(budget.take("b"))  # c hasn't used its share yet
+        await asyncio.sleep(0)
+        assert not waiting.done()
+
+        await budget.give_back("a")  # the fetch failed: d's page goes back, and b gets it
+        assert await asyncio.wait_for(waiting, timeout=1)
+        assert budget.spare == 0 and budget.used == {"a": 1, "b": 2, "c": 0, "d": 0}
+
+    asyncio.run(main())
@@ -0,0 +1,130 @@
+import asyncio
+import json
+from typing import Dict, List
+
+from services import event_bus
+from services.event_broker import InMemoryBroker, decode_event
+from services.event_bus import EventBusRegistry
+
+SESSION = "11111111-1111-1111-1111-111111111111"
+
+
+class BacklogBroker(InMemoryBroker):
+    """In-memory stand-in for RedisBroker: also keeps every published event for late subscribers."""
+
+    def __init__(self):
+        super().__init__(shared=True)
+        self.published: Dict[str, List[str]] = {}
+
+    async def publish(self, session_id: str, message: str, backlog: bool = True) -> None:
+        if backlog:
+            self.published.setdefault(str(session_id), []).append(message)
+        await super().publish(session_id, message)
+
+    async def backlog(self, session_id: str) -> List[str]:
+        return list(self.published.get(str(session_id), []))
+
+
+async def read_until_end(bus, timeout: float = 2.0):
+    async def collect():
+        return [event async for event in bus.subscribe()]
+    return await asyncio.wait_for(collect(), timeout=timeout)
+
+
+def test_shared_memory_broker_mirrors_events_between_registries(monkeypatch):
+    monkeypatch.setattr(event_bus, "MIRROR_LINGER", 0)
+
+    async def main():
+        broker = InMemoryBroker(shared=True)
+        crawl_worker, stream_worker = EventBusRegistry(broker), EventBusRegistry(broker)
+        bus = crawl_worker.create(SESSION)
+        mirror = await stream_worker.attach(SESSION)
+        assert mirror is not None and mirror is not bus
+
+        await bus.publish({"type": "phase", "phase": "discovery"})
+        await bus.publish("plain log line")
+        await bus.close()
+
+        events = await read_until_end(mirror)
+        assert [(e.id, e.type) for e in events] == [(1, "phase"), (2, "log"), (3, "end")]
+        assert [e.data for e in events] == [e.data for e in bus._events]
+        assert mirror.closed
+
+    asyncio.run(main())
+
+
+def test_unshared_broker_does_not_attach():
+    async def main():
+        registry = EventBusRegistry(InMemoryBroker())
+        assert await registry.attach(SESSION) is None
+
+    asyncio.run(main())
+
+
+def test_attach_replays_backlog_then_follows_live_events(monkeypatch):
+    monkeypatch.setattr(event_bus, "MIRROR_LINGER", 0)
+
+    async def main():
+        broker = BacklogBroker()
+        crawl_worker, stream_worker = EventBusRegistry(broker), EventBusRegistry(broker)
+        bus = crawl_worker.create(SESSION)
+        for i in range(3):
+            await bus.publish({"type": "card", "n": i})
+
+        mirror = await stream_worker.attach(SESSION)
+        assert mirror.last_id == 3
+
+        await bus.publish({"type": "card", "n": 3})
+        await bus.close()
+
+        events = await read_until_end(mirror)
+        assert [e.id for e in events] == [1, 2, 3, 4, 5]
+        assert [json.loads(e.data).get("n") for e in events[:4]] == [0, 1, 2, 3]
+        assert events[-1].type == "end"
+
+    asyncio.run(main())
+
+
+def test_mirror_ignores_events_it_already_has(monkeypatch):
+    monkeypatch.setattr(event_bus, "MIRROR_LINGER", 0)
+
+    async def main():
+        broker = BacklogBroker()
+        registry = EventBusRegistry(broker)
+        bus = EventBusRegistry(broker).create(SESSION)
+        await bus.publish({"type": "card", "n": 0})
+        mirror = await registry.attach(SESSION)
+
+        # A live copy of an event already replayed from the backlog is dropped
+        await broker.publish(SESSION, broker.published[SESSION][0])
+        await bus.close()
+
+        events = await read_until_end(mirror)
+        assert [e.id for e in events] == [1, 2]
+
+    asyncio.run(main())
+
+
+def test_idle_mirror_closes_after_timeout(monkeypatch):
+    monkeypatch.setattr(event_bus, "MIRROR_LINGER", 0)
+
+    async def main():
+        broker = InMemoryBroker(shared=True)
+        registry = EventBusRegistry(broker, idle_timeout=0.05)
+        mirror = await registry.attach(SESSION)
+
+        events = await read_until_end(mirror)
+        assert [e.type for e in events] == ["end"]
+        assert json.loads(events[0].data)["message"] == "Lost contact with the crawl worker"
+
+        await asyncio.sleep(0.01)
+        assert SESSION not in registry
+        assert not broker._subscribers
+
+    asyncio.run(main())
+
+
+def test_decode_event_rejects_foreign_payloads():
+    assert decode_event(b'{"id": 4, "type": "card", "data": "{}"}')["id"] == 4
+    assert decode_event("not json") is None
+    assert decode_event('{"type": "card"}') is None
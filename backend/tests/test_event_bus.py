@@ -0,0 +1,160 @@
+import asyncio
+import json
+
+from services.event_bus import SessionEvent, SessionEventBus, format_sse_batch, to_event_payload
+
+
+async def collect(stream, timeout: float = 2.0):
+    async def run():
+        return [item async for item in stream]
+    return await asyncio.wait_for(run(), timeout=timeout)
+
+
+def test_resume_after_last_event_id():
+    async def main():
+        bus = SessionEventBus("s")
+        for i in range(5):
+            await bus.publish({"type": "card", "n": i})
+        await bus.close()
+
+        events = await collect(bus.subscribe(last_event_id=3))
+        assert [e.id for e in events] == [4, 5, 6]
+        assert [e.type for e in events] == ["card", "card", "end"]
+
+    asyncio.run(main())
+
+
+def test_subscribers_have_independent_cursors_and_see_live_events():
+    async def main():
+        bus = SessionEventBus("s")
+        await bus.publish({"type": "phase"})
+        first = asyncio.create_task(collect(bus.subscribe()))
+        second = asyncio.create_task(collect(bus.subscribe(last_event_id=1)))
+        await asyncio.sleep(0.01)
+        assert bus.subscribers == 2
+
+        await bus.publish({"type": "card"})
+        await bus.close()
+        assert [e.id for e in await first] == [1, 2, 3]
+        assert [e.id for e in await second] == [2, 3]
+        assert bus.subscribers == 0
+
+    asyncio.run(main())
+
+
+def test_gap_event_after_ring_overwrite():
+    async def main():
+        bus = SessionEventBus("s", capacity=3)
+        for i in range(6):
+            await bus.publish({"type": "card", "n": i})
+        await bus.close()
+
+        events = await collect(bus.subscribe(last_event_id=1))
+        gap = events[0]
+        assert gap.type == "gap"
+        assert json.loads(gap.data)["missed"] == 3  # ids 2-4 were overwritten
+        assert [e.id for e in events[1:]] == [5, 6, 7]
+
+    asyncio.run(main())
+
+
+def test_resume_inside_ring_has_no_gap():
+    async def main():
+        bus = SessionEventBus("s", capacity=3)
+        for i in range(4):
+            await bus.publish({"type": "card", "n": i})
+        await bus.close()
+        events = await collect(bus.subscribe(last_event_id=2))
+        assert [e.type for e in events] == ["card", "card", "end"]
+
+    asyncio.run(main())
+
+
+def test_slow_consumer_sheds_droppable_events():
+    async def main():
+        bus = SessionEventBus("s", slow_lag=5)
+        for i in range(10):
+            await bus.publish({"type": "info", "message": f"step {i}"})
+            await bus.publish({"type": "card", "n": i})
+        await bus.close()
+
+        batches = await collect(bus.subscribe_batches(level="debug", window=0))
+        events = [e for batch in batches for e in batch]
+        assert not any(e.type == "info" for e in events)
+        assert [json.loads(e.data)["n"] for e in events if e.type == "card"] == list(range(10))
+        assert events[-1].type == "end"
+
+    asyncio.run(main())
+
+
+def test_consumer_keeping_up_gets_every_event():
+    async def main():
+        bus = SessionEventBus("s", slow_lag=5)
+        reader = asyncio.create_task(collect(bus.subscribe_batches(level="debug", window=0)))
+        for i in range(10):
+            await bus.publish({"type": "info", "message": f"step {i}"})
+            await asyncio.sleep(0)
+        await bus.close()
+        events = [e for batch in await reader for e in batch]
+        assert sum(e.type == "info" for e in events) == 10
+
+    asyncio.run(main())
+
+
+def test_verbosity_filter_and_scanning_coalescing():
+    async def main():
+        bus = SessionEventBus("s")
+        await bus.publish("raw log line")
+        await bus.publish({"type": "info", "message": "step"})
+        for page in range(3):
+            await bus.publish({"type": "scanning", "page": page})
+        await bus.publish({"type": "card"})
+        await bus.close()
+
+        progress = [e for b in await collect(bus.subscribe_batches(level="progress", window=0)) for e in b]
+        assert [e.type for e in progress] == ["scanning", "card", "end"]
+        scanning = json.loads(progress[0].data)
+        assert scanning == {"type": "scanning", "page": 2, "merged": 3}
+
+        info = [e for b in await collect(bus.subscribe_batches(level="info", window=0)) for e in b]
+        assert [e.type for e in info] == ["info", "scanning", "card", "end"]
+
+    asyncio.run(main())
+
+
+def test_batch_window_groups_a_burst():
+    async def main():
+        bus = SessionEventBus("s")
+        reader = asyncio.create_task(collect(bus.subscribe_batches(level="debug", window=0.2)))
+        await asyncio.sleep(0)
+        for i in range(3):
+            await bus.publish({"type": "card", "n": i})
+        await bus.close()
+        batches = await reader
+        assert [len(b) for b in batches] == [4]
+        frame = format_sse_batch(batches[0])
+        assert frame.startswith("id: 4\n")
+        assert [e["type"] for e in json.loads(frame.split("data: ", 1)[1])["events"]] == ["card"] * 3 + ["end"]
+
+    asyncio.run(main())
+
+
+def test_append_keeps_mirrored_ids_and_closes_on_end():
+    async def main():
+        bus = SessionEventBus("s")
+        await bus.append(SessionEvent(7, "card", "{}"))
+        await bus.append(SessionEvent(7, "card", "{}"))
+        await bus.append(SessionEvent(8, "end", '{"type": "end"}'))
+        assert bus.last_id == 8 and bus.closed
+        # Events before the first mirrored one were never seen here: reported as a gap
+        events = await collect(bus.subscribe())
+        assert [(e.id, e.type) for e in events] == [(6, "gap"), (7, "card"), (8, "end")]
+        assert json.loads(events[0].data)["missed"] == 6
+
+    asyncio.run(main())
+
+
+def test_to_event_payload():
+    assert to_event_payload('{"type": "card", "n": 1}') == ("card", '{"type": "card", "n": 1}')
+    assert to_event_payload("hello")[0] == "log"
+    assert to_event_payload({"message": "x"})[0] == "log"
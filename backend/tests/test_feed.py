@@ -0,0 +1,105 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from services.feed import FeedIndexer, professor_key
+from services.write_buffer import WriteBehindBuffer
+
+USER = "aaaaaaaa-0000-0000-0000-000000000001"
+BASE = datetime(2026, 10, 1, tzinfo=timezone.utc)
+
+
+async def add_card(store, session_id, name, score, seconds):
+    res = await store.table("professor_cards").insert({
+        "session_id": session_id, "professor_name": name, "match_score": score,
+        "created_at": (BASE + timedelta(seconds=seconds)).isoformat(),
+    }).execute()
+    return res.data[0]["id"]
+
+
+async def feed(store):
+    res = await store.table("user_feed").select("professor_key,professor_card_id,swiped_at").eq("user_id", USER).execute()
+    return {row["professor_key"]: row for row in res.data}
+
+
+def test_professor_key_ignores_titles_and_punctuation():
+    assert professor_key("Dr. Ada  Lovelace, PhD") == professor_key("ada lovelace") == "ada lovelace"
+
+
+def test_indexing_resumes_from_the_stored_mark_after_a_restart(store, add_session):
+    async def main():
+        session_id = await add_session(USER)
+        ada = await add_card(store, session_id, "Ada Lovelace", 70, 0)
+        await add_card(store, session_id, "Grace Hopper", 60, 1)
+        indexer = FeedIndexer(store)
+        assert await indexer.index_user(USER) == 2
+
+        restarted = FeedIndexer(store)
+        assert await restarted.index_user(USER) == 0
+        assert restarted.stats["cards_seen"] == 1  # only the card at the mark's own timestamp
+
+        alan = await add_card(store, session_id, "Alan Turing", 50, 2)
+        better_ada = await add_card(store, session_id, "Prof. Ada Lovelace", 90, 3)
+        await restarted.index_sessions([session_id])
+        assert restarted.stats["cards_seen"] == 1 + 3
+        rows = await feed(store)
+        assert rows["alan turing"]["professor_card_id"] == alan
+        assert rows["ada lovelace"]["professor_card_id"] == better_ada != ada
+
+    asyncio.run(main())
+
+
+def test_status_only_flushes_do_not_index(store, add_session):
+    async def main():
+        session_id = await add_session(USER)
+        calls = []
+
+        async def on_write(session_ids, row_session_ids):
+            calls.append((set(session_ids), set(row_session_ids)))
+
+        buffer = WriteBehindBuffer(store, on_write=on_write)
+        buffer.defer_status(session_id, {"status": "running"})
+        await buffer.flush()
+        await buffer.add({"session_id": session_id, "professor_name": "Ada Lovelace"})
+        await buffer.flush()
+        await buffer.write_status(session_id, {"status": "done"})
+        await buffer.close()
+        assert calls == [({session_id}, set()), ({session_id}, {session_id}), ({session_id}, set())]
+
+    asyncio.run(main())
+
+
+def test_retired_card_is_replaced_by_a_live_card_from_another_session(store, add_session):
+    async def main():
+        old_session = await add_session(USER, age_seconds=60)
+        new_session = await add_session(USER)
+        older = await add_card(store, old_session, "Ada Lovelace", 40, 0)
+        newer = await add_card(store, new_session, "Dr. Ada Lovelace", 80, 1)
+        grace = await add_card(store, new_session, "Grace Hopper", 60, 2)
+        indexer = FeedIndexer(store)
+        await indexer.index_user(USER)
+        assert (await feed(store))["ada lovelace"]["professor_card_id"] == newer
+
+        await store.table("professor_cards").update({"retired_at": BASE.isoformat()}).in_("id", [newer, grace]).execute()
+        await indexer.retire_cards([newer, grace])
+        rows = await feed(store)
+        assert rows["ada lovelace"]["professor_card_id"] == older
+        assert "grace hopper" not in rows
+
+    asyncio.run(main())
+
+
+def test_swiped_professor_stays_hidden_when_its_card_is_retired(store, add_session):
+    async def main():
+        session_id = await add_session(USER)
+        other = await add_session(USER)
+        card = await add_card(store, session_id, "Ada Lovelace", 80, 0)
+        await add_card(store, other, "Ada Lovelace", 40, 1)
+        indexer = FeedIndexer(store)
+        await indexer.index_user(USER)
+        await indexer.mark_swiped(USER, {"id": card, "session_id": session_id, "professor_name": "Ada Lovelace"})
+
+        await indexer.retire_cards([card])
+        row = (await feed(store))["ada lovelace"]
+        assert row["professor_card_id"] == card and row["swiped_at"]
+
+    asyncio.run(main())
@@ -0,0 +1,175 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from services import job_queue
+from services.job_queue import CrawlJobQueue, CrawlWorkerPool, QueueFull, fair_order
+
+ALICE = "aaaaaaaa-0000-0000-0000-000000000001"
+BOB = "bbbbbbbb-0000-0000-0000-000000000002"
+CAROL = "cccccccc-0000-0000-0000-000000000003"
+
+
+def job(job_id, user_id, created_at):
+    return {"id": job_id, "user_id": user_id, "created_at": created_at, "status": "queued"}
+
+
+async def statuses(store):
+    res = await store.table("scrape_sessions").select("id,status,attempts,worker_id").execute()
+    return {row["id"]: row for row in res.data}
+
+
+def test_fair_order_round_robins_across_users():
+    queued = [job("a1", ALICE, "01"), job("a2", ALICE, "02"), job("a3", ALICE, "03"),
+              job("b1", BOB, "04"), job("c1", CAROL, "05"), job("b2", BOB, "06")]
+    assert [j["id"] for j in fair_order(queued, {})] == ["a1", "b1", "c1", "a2", "b2", "a3"]
+
+
+def test_fair_order_counts_running_jobs():
+    queued = [job("a1", ALICE, "01"), job("a2", ALICE, "02"), job("b1", BOB, "03")]
+    assert [j["id"] for j in fair_order(queued, {ALICE: 2})] == ["b1", "a1", "a2"]
+    assert fair_order([], {ALICE: 1}) == []
+
+
+def test_claim_is_won_by_one_worker(store, add_session):
+    async def main():
+        queue = CrawlJobQueue(store)
+        session_id = await add_session(ALICE)
+        first, second = await asyncio.gather(queue.claim(session_id, "w1"), queue.claim(session_id, "w2"))
+        assert (first is None) != (second is None)
+        row = (await statuses(store))[session_id]
+        assert row["status"] == "running"
+        assert row["worker_id"] == (first or second)["worker_id"]
+
+    asyncio.run(main())
+
+
+def test_claim_next_is_fair_and_honours_per_user_limit(store, add_session):
+    async def main():
+        queue = CrawlJobQueue(store, max_running_per_user=1)
+        a1 = await add_session(ALICE, age_seconds=30)
+        await add_session(ALICE, age_seconds=20)
+        b1 = await add_session(BOB, age_seconds=10)
+
+        claimed = []
+        rows = await queue.claim_next(3, "w1", on_claim=lambda row: claimed.append(row["id"]))
+        assert [r["id"] for r in rows] == claimed == [a1, b1]
+        assert await queue.claim_next(3, "w1") == []
+        assert await queue.claim_next(0, "w1") == []
+
+    asyncio.run(main())
+
+
+def test_position_and_eta(store, add_session):
+    async def main():
+        queue = CrawlJobQueue(store, concurrency=2)
+        queue.avg_job_seconds = 60
+        ids = [await add_session(user, age_seconds=age) for user, age in ((ALICE, 30), (ALICE, 20), (BOB, 10))]
+        positions = [await queue.position(i) for i in ids]
+        assert [p["position"] for p in positions] == [1, 3, 2]
+        assert [p["eta_seconds"] for p in positions] == [60, 120, 60]
+        await queue.claim(ids[0], "w1")
+        queue.invalidate()
+        assert await queue.position(ids[0]) is None
+
+    asyncio.run(main())
+
+
+def test_heartbeat_keeps_jobs_and_stale_jobs_are_requeued_then_failed(store, add_session, monkeypatch):
+    monkeypatch.setattr(job_queue, "CRAWL_MAX_ATTEMPTS", 2)
+    old = (datetime.now(timezone.utc) - timedelta(seconds=600)).isoformat()
+
+    async def main():
+        queue = CrawlJobQueue(store)
+        alive = await add_session(ALICE, status="running", heartbeat_at=old, worker_id="w1")
+        dead = await add_session(BOB, status="running", heartbeat_at=old, worker_id="w2")
+
+        await queue.heartbeat([alive])
+        assert await queue.requeue_stale(stale_seconds=300) == 1
+        rows = await statuses(store)
+        assert rows[alive]["status"] == "running"
+        assert rows[dead]["status"] == "queued" and rows[dead]["attempts"] == 1 and rows[dead]["worker_id"] is None
+
+        await queue.claim(dead, "w3")
+        await store.table("scrape_sessions").update({"heartbeat_at": old}).eq("id", dead).execute()
+        assert await queue.requeue_stale(stale_seconds=300) == 1
+        assert (await statuses(store))[dead]["status"] == "error"
+
+    asyncio.run(main())
+
+
+def test_release_and_resume_blocked(store, add_session):
+    async def main():
+        queue = CrawlJobQueue(store)
+        running = await add_session(ALICE, status="running", worker_id="w1")
+        blocked = await add_session(BOB, status="blocked", blocked_reason="403")
+        await queue.release([running])
+        assert await queue.resume_blocked([blocked, running]) == [blocked]
+        rows = await statuses(store)
+        assert rows[running]["status"] == rows[blocked]["status"] == "queued"
+
+    asyncio.run(main())
+
+
+def test_admit_refuses_with_eta(store, add_session):
+    async def main():
+        queue = CrawlJobQueue(store, concurrency=1, max_queued_per_user=2, queue_max=3)
+        queue.avg_job_seconds = 100
+        await add_session(ALICE)
+        await queue.admit(ALICE)
+        await add_session(ALICE)
+        queue.invalidate()
+        with pytest.raises(QueueFull) as exc:
+            await queue.admit(ALICE)
+        assert exc.value.eta_seconds == 300
+
+        await add_session(BOB)
+        queue.invalidate()
+        with pytest.raises(QueueFull) as exc:
+            await queue.admit(CAROL)
+        assert "full" in str(exc.value) and exc.value.eta_seconds == 100
+
+    asyncio.run(main())
+
+
+def test_create_session_returns_429_with_retry_after(store, add_session, monkeypatch):
+    import main
+
+    queue = CrawlJobQueue(store, concurrency=1, max_queued_per_user=1)
+    queue.avg_job_seconds = 42
+    asyncio.run(add_session(ALICE))
+    monkeypatch.setattr(main.container, "_job_queue", queue)
+
+    response = TestClient(main.app).post("/sessions", json={"user_id": ALICE, "root_urls": ["https://example.edu"]})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "84"
+    assert response.json()["detail"]["eta_seconds"] == 84
+
+
+def test_worker_pool_runs_claimed_jobs_and_releases_on_stop(store, add_session, monkeypatch):
+    monkeypatch.setattr(job_queue, "CRAWL_POLL_SECONDS", 0.01)
+
+    async def main():
+        queue = CrawlJobQueue(store)
+        done = await add_session(ALICE, age_seconds=10)
+        stuck = await add_session(BOB)
+        started, finished = asyncio.Event(), []
+
+        async def run_job(job):
+            if job["id"] == stuck:
+                started.set()
+                await asyncio.sleep(60)
+            finished.append(job["id"])
+
+        pool = CrawlWorkerPool(queue, run_job, concurrency=2, worker_id="w1")
+        pool.start()
+        await asyncio.wait_for(started.wait(), timeout=2)
+        await asyncio.sleep(0.05)
+        await pool.stop()
+
+        assert finished == [done]
+        assert (await statuses(store))[stuck]["status"] == "queued"
+
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+import json
+
+from services.json_stream import JSONArrayStreamParser, parse_json_content
+
+RESPONSE = {
+    "professors": [
+        {"name": "Ada Lovelace", "profile_url": "/people/ada", "areas": ["analysis", ["nested", "list"]]},
+        {"name": "Grace \"Amazing\" Hopper", "profile_url": "/people/grace", "note": "braces } and ] in text"},
+        {"name": "Alan Turing", "profile_url": "/people/alan", "note": "back\\slash \\\" end"},
+    ],
+    "next_page": "/people?page=2",
+}
+
+
+def feed_in_chunks(parser, text, size):
+    items = []
+    for i in range(0, len(text), size):
+        items.extend(parser.feed(text[i:i + size]))
+    return items
+
+
+def test_elements_are_emitted_as_they_complete():
+    text = json.dumps(RESPONSE)
+    parser = JSONArrayStreamParser("professors")
+    first_end = text.index("}, {") + 1
+
+    assert parser.feed(text[:first_end - 1]) == []
+    assert parser.feed(text[first_end - 1:first_end]) == [RESPONSE["professors"][0]]
+    assert parser.feed(text[first_end:]) == RESPONSE["professors"][1:]
+    assert parser.done
+    assert parser.items_emitted == 3
+    assert parser.result() == RESPONSE
+
+
+def test_any_chunking_gives_the_same_elements():
+    text = json.dumps(RESPONSE, indent=2)
+    for size in (1, 2, 3, 7, 64, len(text)):
+        parser = JSONArrayStreamParser("professors")
+        assert feed_in_chunks(parser, text, size) == RESPONSE["professors"], size
+
+
+def test_code_fence_and_preamble_are_ignored():
+    text = "Here you go:\n```json\n" + json.dumps(RESPONSE) + "\n```\n"
+    parser = JSONArrayStreamParser("professors")
+    assert feed_in_chunks(parser, text, 5) == RESPONSE["professors"]
+    assert parser.result() == RESPONSE
+
+
+def test_escaped_quotes_do_not_end_strings():
+    professors = [{"name": 'Quote " and [bracket', "bio": '{"not": "an element"}'}]
+    parser = JSONArrayStreamParser("professors")
+    assert feed_in_chunks(parser, json.dumps({"professors": professors}), 1) == professors
+
+
+def test_nested_arrays_and_other_keys_are_not_elements():
+    text = json.dumps({
+        "links": [{"name": "not a professor"}],
+        "meta": {"professors": [{"name": "nested, not top level"}]},
+        "professors": [{"name": "Ada", "groups": [[1, 2], [3]]}, ["legacy", "pair"]],
+    })
+    parser = JSONArrayStreamParser("professors")
+    assert parser.feed(text) == [{"name": "Ada", "groups": [[1, 2], [3]]}, ["legacy", "pair"]]
+
+
+def test_bare_top_level_array():
+    parser = JSONArrayStreamParser("professors")
+    assert feed_in_chunks(parser, '[{"name": "Ada"}, {"name": "Grace"}]', 4) == [{"name": "Ada"}, {"name": "Grace"}]
+    assert parser.done
+
+
+def test_truncated_stream_keeps_completed_elements():
+    text = json.dumps(RESPONSE)
+    cut = text.index("Alan Turing")
+    parser = JSONArrayStreamParser("professors")
+    assert feed_in_chunks(parser, text[:cut], 10) == RESPONSE["professors"][:2]
+    assert not parser.done
+    assert parser.result() is None
+
+
+def test_reset_discards_partial_state():
+    parser = JSONArrayStreamParser("professors")
+    parser.feed('{"professors": [{"name": "Half')
+    parser.reset()
+    assert parser.feed('{"professors": [{"name": "Ada"}]}') == [{"name": "Ada"}]
+
+
+def test_parse_json_content_tolerates_fences():
+    assert parse_json_content('```json\n{"a": 1}\n```') == {"a": 1}
+    assert parse_json_content('```\n[1, 2]\n```') == [1, 2]
+    assert parse_json_content("no json here") is None
+    assert parse_json_content("") is None
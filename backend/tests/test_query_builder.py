@@ -0,0 +1,38 @@
+import asyncio
+
+from services.supabase_client import BaseQueryBuilder
+
+USER = "aaaaaaaa-0000-0000-0000-000000000001"
+
+
+def test_keyset_is_anded_with_other_or_filters():
+    query = BaseQueryBuilder("http://db", {}, "professor_cards")
+    query.filters.append(("or", "(match_score.gt.50,keywords.is.null)"))
+    query.select("id").keyset(("2026-10-01", "c1"))
+    assert query.query_params() == [
+        ("select", "id"), ("order", "created_at.asc,id.asc"),
+        ("or", "(match_score.gt.50,keywords.is.null)"),
+        ("or", "(created_at.gt.2026-10-01,and(created_at.eq.2026-10-01,id.gt.c1))"),
+    ]
+
+
+def test_keyset_pages_through_sqlite(store, add_session):
+    async def main():
+        session_id = await add_session(USER)
+        for i, created in enumerate(["01", "01", "02", "03"]):
+            await store.table("professor_cards").insert({
+                "id": f"c{i}", "session_id": session_id, "match_score": i * 30,
+                "created_at": f"2026-10-{created}",
+            }).execute()
+
+        async def page(after):
+            query = store.table("professor_cards").select("id,created_at")
+            query.filters.append(("or", "(match_score.lt.10,match_score.gt.50)"))
+            res = await query.keyset(after).limit(2).execute()
+            return [(r["created_at"], r["id"]) for r in res.data]
+
+        first = await page(None)
+        assert [i for _, i in first] == ["c0", "c2"]
+        assert [i for _, i in await page(first[-1])] == ["c3"]
+
+    asyncio.run(main())
@@ -0,0 +1,55 @@
+import asyncio
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+from services import supabase_client
+from services.refresh import SessionRefresher
+
+USER = "aaaaaaaa-0000-0000-0000-000000000001"
+REFRESHED = "2026-10-01T00:00:00+00:00"
+
+
+async def refreshed_at(store, session_id):
+    res = await store.table("scrape_sessions").select("refreshed_at").eq("id", session_id).execute()
+    return res.data[0]["refreshed_at"]
+
+
+def test_claim_is_won_by_one_process(store, add_session):
+    async def main():
+        first, second = SessionRefresher(SimpleNamespace(supabase=store)), SessionRefresher(SimpleNamespace(supabase=store))
+        session_id = await add_session(USER, status="done", refreshed_at=REFRESHED)
+        won = await asyncio.gather(first.claim(session_id, REFRESHED), second.claim(session_id, REFRESHED))
+        assert sorted(won) == [False, True]
+        assert await refreshed_at(store, session_id) > REFRESHED
+
+        never_refreshed = await add_session(USER, status="done")
+        assert await first.claim(never_refreshed, None)
+        running = await add_session(USER, status="running", refreshed_at=REFRESHED)
+        assert not await first.claim(running, REFRESHED)
+
+    asyncio.run(main())
+
+
+def test_refresh_endpoint_claims_the_session(store, add_session, monkeypatch):
+    import main
+
+    refresher = SessionRefresher(SimpleNamespace(supabase=store))
+    started = []
+    monkeypatch.setattr(refresher, "start", lambda session_id, event_buses: started.append(str(session_id)))
+    monkeypatch.setattr(main.container, "_refresher", refresher)
+    monkeypatch.setattr(supabase_client, "get_async_supabase_client", lambda: store)
+    session_id = asyncio.run(add_session(USER, status="done", refreshed_at=REFRESHED))
+    client = TestClient(main.app)
+
+    assert client.post(f"/sessions/{session_id}/refresh").status_code == 202
+    assert started == [session_id]
+    assert asyncio.run(refreshed_at(store, session_id)) > REFRESHED
+
+    # Another process claimed it between the read and the claim
+    async def lose(session_id, refreshed_at):
+        return False
+
+    monkeypatch.setattr(refresher, "claim", lose)
+    assert client.post(f"/sessions/{session_id}/refresh").status_code == 409
+    assert started == [session_id]
@@ -0,0 +1,23 @@
+import asyncio
+import time
+
+from services.resume_parser import ResumeParser
+
+
+def test_close_joins_the_pool_and_kills_a_stuck_worker():
+    parser = ResumeParser(workers=1)
+
+    async def main():
+        await parser.warm()
+        processes = list(parser._pool._processes.values())
+        asyncio.get_running_loop().run_in_executor(parser._pool, time.sleep, 60)
+        await asyncio.sleep(0.2)
+        return processes
+
+    processes = asyncio.run(main())
+    started = time.monotonic()
+    parser.close(timeout=0.5)
+    assert time.monotonic() - started < 10
+    assert processes and not any(p.is_alive() for p in processes)
+    assert parser._pool is None
+    parser.close()  # already closed
@@ -0,0 +1,71 @@
+import asyncio
+
+from services.event_broker import InMemoryBroker
+from services.session_cache import SessionCache, etag_matches
+
+SESSION = "11111111-1111-1111-1111-111111111111"
+
+
+def test_set_get_and_etag():
+    async def main():
+        cache = SessionCache()
+        assert await cache.get(SESSION, "full") is None
+        etag = await cache.set(SESSION, "full", b'{"cards": []}', "done")
+        assert await cache.get(SESSION, "full") == (b'{"cards": []}', etag)
+        assert await cache.get(SESSION, "list") is None
+        assert etag_matches(f'W/{etag}, "other"', etag) and etag_matches("*", etag)
+        assert not etag_matches(None, etag)
+
+    asyncio.run(main())
+
+
+def test_body_read_before_an_invalidation_is_not_cached():
+    async def main():
+        cache = SessionCache()
+        generation = cache.generation(SESSION)
+        await cache.invalidate([SESSION])  # a card lands while the request reads the DB
+        etag = await cache.set(SESSION, "full", b"stale", "running", generation)
+        assert etag
+        assert await cache.get(SESSION, "full") is None
+
+        await cache.set(SESSION, "full", b"fresh", "running", cache.generation(SESSION))
+        assert (await cache.get(SESSION, "full"))[0] == b"fresh"
+
+    asyncio.run(main())
+
+
+def test_invalidations_reach_other_workers():
+    async def main():
+        broker = InMemoryBroker(shared=True)
+        api_a, api_b = SessionCache(broker=broker), SessionCache(broker=broker)
+        crawl_worker = SessionCache(broker=broker)
+        await api_a.start()
+        await api_b.start()
+        for cache in (api_a, api_b):
+            await cache.set(SESSION, "full", b"old", "done")
+        in_flight = api_b.generation(SESSION)
+
+        await crawl_worker.invalidate([SESSION])
+        await asyncio.sleep(0.01)
+        assert await api_a.get(SESSION, "full") is None
+        assert await api_b.get(SESSION, "full") is None
+        await api_b.set(SESSION, "full", b"old", "done", in_flight)
+        assert await api_b.get(SESSION, "full") is None
+
+        for cache in (api_a, api_b):
+            await cache.aclose()
+        assert not broker._subscribers
+
+    asyncio.run(main())
+
+
+def test_unshared_broker_only_invalidates_locally():
+    async def main():
+        cache = SessionCache(broker=InMemoryBroker())
+        await cache.start()
+        await cache.set(SESSION, "list", b"x", "running")
+        await cache.invalidate([SESSION])
+        assert await cache.get(SESSION, "list") is None
+        await cache.aclose()
+
+    asyncio.run(main())
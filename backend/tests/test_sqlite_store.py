@@ -0,0 +1,77 @@
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+from services.sqlite_store import SQLiteStore
+
+USER = "aaaaaaaa-0000-0000-0000-000000000001"
+
+
+def test_failed_is_a_valid_session_status(store, add_session):
+    async def main():
+        session_id = await add_session(USER)
+        await store.table("scrape_sessions").update({"status": "failed"}).eq("id", session_id).execute()
+        res = await store.table("scrape_sessions").select("status").eq("id", session_id).execute()
+        assert res.data[0]["status"] == "failed"
+
+    asyncio.run(main())
+
+
+def test_old_status_check_is_rebuilt_keeping_rows(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        create table scrape_sessions (
+          id text primary key,
+          user_id text not null,
+          status text check (status in ('queued', 'running', 'done', 'error', 'blocked')) default 'queued',
+          created_at text not null,
+          finished_at text
+        );
+        create index scrape_sessions_user_created_idx on scrape_sessions (user_id, created_at);
+        insert into scrape_sessions (id, user_id, status, created_at) values ('s1', 'u1', 'done', '2026-01-01');
+    """)
+    conn.close()
+
+    store = SQLiteStore(path)
+    try:
+        store.conn.execute("update scrape_sessions set status = 'failed' where id = 's1'")
+        row = store.conn.execute("select user_id, status, attempts from scrape_sessions").fetchone()
+        assert tuple(row) == ("u1", "failed", 0)
+        indexes = {r[0] for r in store.conn.execute("select name from sqlite_master where tbl_name = 'scrape_sessions'")}
+        assert {"scrape_sessions_user_created_idx", "scrape_sessions_status_idx"} <= indexes
+    finally:
+        asyncio.run(store.aclose())
+
+
+def test_queries_run_off_the_event_loop_and_aclose_closes_the_connection(tmp_path):
+    store = SQLiteStore(str(tmp_path / "labmatch.db"))
+    threads = []
+    original = store.decode_row
+
+    def decode_row(table, row):
+        threads.append(threading.current_thread())
+        return original(table, row)
+
+    store.decode_row = decode_row
+
+    async def main():
+        await store.table("scrape_sessions").insert({"user_id": USER, "status": "queued"}).execute()
+        await store.aclose()
+
+    asyncio.run(main())
+    assert threads and threading.main_thread() not in threads
+    with pytest.raises(sqlite3.ProgrammingError):
+        store.conn.execute("select 1")
+
+
+def test_live_card_reads_use_the_partial_session_index(store):
+    plan = store.conn.execute(
+        "explain query plan select * from professor_cards where session_id = ? and retired_at is null "
+        "order by created_at, id", ["s1"]
+    ).fetchall()
+    assert "professor_cards_session_live_idx" in " ".join(r["detail"] for r in plan)
+    indexes = {r[0] for r in store.conn.execute("select name from sqlite_master where tbl_name = 'professor_cards'")}
+    assert "professor_cards_session_created_idx" not in indexes
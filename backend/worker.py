@@ -0,0 +1,65 @@
+"""
+Standalone crawl worker: claims queued sessions from scrape_sessions and runs
+them, publishing log events through the shared event broker.
+
+Run the API with CRAWL_WORKER_MODE=external and a shared EVENT_BROKER_URL
+(redis:// or postgresql://), then start as many of these as you like:
+
+    python worker.py
+"""
+import asyncio
+import logging
+import signal
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from services.crawler import CrawlerService
+from services.event_broker import get_event_broker
+from services.event_bus import EventBusRegistry
+from services.job_queue import CrawlJobQueue, create_crawl_pool
+from services.refresh import REFRESH_INTERVAL_HOURS, RefreshScheduler, SessionRefresher
+from services.session_cache import SESSION_CACHE_URL, SessionCache
+from services.supabase_client import get_async_supabase_client
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("worker")
+
+
+async def main():
+    broker = get_event_broker()
+    if not broker.shared:
+        logger.warning("EVENT_BROKER_URL is not shared between processes; API clients won't see this worker's logs")
+
+    supabase = get_async_supabase_client()
+    # Serves no reads; only broadcasts invalidations to the API workers' caches
+    session_cache = SessionCache(redis_url=SESSION_CACHE_URL, broker=broker)
+    crawler_service = CrawlerService(session_cache=session_cache)
+    event_buses = EventBusRegistry(broker=broker)
+    pool = create_crawl_pool(CrawlJobQueue(supabase), crawler_service, event_buses)
+    refresher = SessionRefresher(crawler_service)
+    scheduler = RefreshScheduler(refresher, event_buses) if REFRESH_INTERVAL_HOURS > 0 else None
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    pool.start()
+    if scheduler is not None:
+        scheduler.start()
+    await stop.wait()
+    logger.info("Shutting down: re-queueing running crawls")
+    if scheduler is not None:
+        await scheduler.stop()
+    await refresher.aclose()
+    await pool.stop()
+    await crawler_service.write_buffer.close()
+    await session_cache.aclose()
+    await event_buses.shutdown()
+    await supabase.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -12,6 +12,9 @@ import { LiveScanVisualizer } from '@/components/LiveScanVisualizer';
 import { useLikedProfessors } from '@/context/LikedProfessorsContext';
 
 import { API_BASE_URL } from '@/constants/Config';
+import { apiService } from '@/services/api';
+
+const USER_ID = "d6ed9bed-5e3e-41c0-85fd-d6bf925f150c";
 
 export default function DiscoverScreen() {
   const [professors, setProfessors] = useState<Professor[]>([]);
@@ -87,8 +90,15 @@ export default function DiscoverScreen() {
     }
   };
 
+  const saveSwipe = (professor: Professor | undefined, decision: 'like' | 'pass') => {
+    if (!professor?.id) return;
+    apiService.recordSwipe(USER_ID, professor.id, decision)
+      .catch((error) => console.error('Failed to record swipe', error));
+  };
+
   const handleSwipeLeft = useCallback(() => {
     console.log('Passed on:', currentProfessor?.professor_name);
+    saveSwipe(currentProfessor, 'pass');
     setCurrentIndex((prev) => prev + 1);
   }, [currentProfessor]);
 
@@ -96,6 +106,7 @@ export default function DiscoverScreen() {
     if (currentProfessor) {
       console.log('Liked:', currentProfessor.professor_name);
       addLikedProfessor(currentProfessor);
+      saveSwipe(currentProfessor, 'like');
     }
     setCurrentIndex((prev) => prev + 1);
   }, [currentProfessor, addLikedProfessor]);
@@ -121,7 +132,7 @@ export default function DiscoverScreen() {
           'Content-Type': 'application/json',
         },
         body: JSON.stringify({
-          user_id: "d6ed9bed-5e3e-41c0-85fd-d6bf925f150c",
+          user_id: USER_ID,
           root_urls: [sessionUrl],
           objective_prompt: customPrompt.trim(),
           custom_prompt: customPrompt.trim()
@@ -157,14 +168,20 @@ export default function DiscoverScreen() {
       try {
         if (event.data) {
           const payload = JSON.parse(event.data);
+          // The server coalesces bursts into one `batch` frame
+          const events = payload.type === 'batch' ? payload.events : [payload];
+          const done = events.some((e: any) => e.type === 'end' || e.type === 'complete');
+          const visible = events.filter((e: any) => e.type !== 'end');
 
-          if (event.data === "STREAM_DONE" || payload.type === 'end' || payload.type === 'complete') {
+          if (visible.length > 0) {
+            setScanEvents(prev => [...prev, ...visible]);
+          }
+
+          if (event.data === "STREAM_DONE" || done) {
             es.close();
             fetchResults(id);
             return;
           }
-
-          setScanEvents(prev => [...prev, payload]);
         }
       } catch (e) {
         console.log("Error parsing SSE", e);
@@ -12,6 +12,7 @@ interface LiveScanEvent {
     summary?: string;
     depth?: number;
     pages_crawled?: number;
+    merged?: number;
     total_cards?: number;
     details?: string;
     phase?: string;
@@ -40,7 +41,8 @@ export function LiveScanVisualizer({ events }: LiveScanVisualizerProps) {
 
     // Derive stats from latest events
     const professorsFound = events.filter(e => e.type === 'found_card').length;
-    const pagesScanned = events.filter(e => e.type === 'scanning').length;
+    // Coalesced scanning updates carry how many page visits they stand for
+    const pagesScanned = events.filter(e => e.type === 'scanning').reduce((n, e) => n + (e.merged ?? 1), 0);
     const currentAction = events[events.length - 1];
 
     const renderEvent = (event: LiveScanEvent, index: number) => {
@@ -18,6 +18,12 @@ export interface SessionResponse {
     cards: Professor[];
 }
 
+export interface CardPage {
+    cards: Professor[];
+    next_cursor: string | null;
+    total: number | null;
+}
+
 export interface CreateSessionRequest {
     user_id: string;
     root_urls: string[];
@@ -57,10 +63,40 @@ class ApiService {
         return response.json();
     }
 
+    async getSessionCards(sessionId: string, cursor?: string, limit = 25): Promise<CardPage> {
+        const params = new URLSearchParams({ limit: String(limit) });
+        if (cursor) params.set('cursor', cursor);
+        const response = await fetch(`${this.baseUrl}/sessions/${sessionId}/cards?${params}`);
+
+        if (!response.ok) {
+            throw new Error(`Failed to get cards: ${response.statusText}`);
+        }
+
+        return response.json();
+    }
+
+    async getFeed(userId: string, cursor?: string, limit = 25): Promise<CardPage> {
+        const params = new URLSearchParams({ limit: String(limit) });
+        if (cursor) params.set('cursor', cursor);
+        const response = await fetch(`${this.baseUrl}/users/${userId}/feed?${params}`);
+
+        if (!response.ok) {
+            throw new Error(`Failed to get feed: ${response.statusText}`);
+        }
+
+        return response.json();
+    }
+
     async recordSwipe(userId: string, professorCardId: string, decision: 'like' | 'pass'): Promise<void> {
-        // Note: This endpoint would need to be added to the backend
-        // For now, we'll just log it
-        console.log(`Swipe recorded: ${decision} for professor ${professorCardId}`);
+        const response = await fetch(`${this.baseUrl}/swipes`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ user_id: userId, professor_card_id: professorCardId, decision }),
+        });
+
+        if (!response.ok) {
+            throw new Error(`Failed to record swipe: ${response.statusText}`);
+        }
     }
 
     async checkHealth(): Promise<'healthy' | 'down' | 'supabase_down'> {